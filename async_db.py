@@ -0,0 +1,34 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Скільки потоків одночасно працюють з базою (кожен має своє з'єднання)
+DB_WORKERS = int(os.getenv('DB_WORKERS', '4'))
+
+
+def create_db_executor(max_workers: int = DB_WORKERS) -> ThreadPoolExecutor:
+    """Обмежений пул потоків для запитів до SQLite"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+
+
+class AsyncFacade:
+    """Асинхронна обгортка: методи об'єкта виконуються в пулі потоків і повертають awaitable"""
+
+    def __init__(self, target, executor: ThreadPoolExecutor):
+        self._target = target
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(attr, *args, **kwargs)
+            )
+
+        return call
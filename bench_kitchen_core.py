@@ -0,0 +1,128 @@
+"""Вимірювання kitchen_core на fake_sheets: виклики API і час на операцію
+
+    python bench_kitchen_core.py --rows 1000 10000 100000 --latency 0.02
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import kitchen_core
+from consumption import ConsumptionLog
+from database import SHEET_HEADERS, Database, KitchenDatabase
+from fake_sheets import FakeClient
+from sheets_client import SheetsClient
+
+SPREADSHEET_ID = 'bench'
+ROWS_PER_USER = 50
+HAUL_SIZE = 20
+
+
+def seed(client: FakeClient, rows: int):
+    """Заповнює таблицю: rows продуктів і стільки ж записів журналу"""
+    spreadsheet = client.open_by_key(SPREADSHEET_ID)
+    users = max(rows // ROWS_PER_USER, 1)
+    today = date.today()
+    products = [SHEET_HEADERS['products']]
+    logs = [SHEET_HEADERS['logs']]
+    for i in range(rows):
+        user_id = i % users
+        name = f"продукт{i // users}"
+        expiry = (today + timedelta(days=i % 30)).isoformat() if i % 3 == 0 else ''
+        products.append([user_id, name, 500, 'г', expiry, today.isoformat()])
+        logs.append([f"{today.isoformat()} 12:00:00", user_id, name, 500, 'г', 'add'])
+    spreadsheet.seed_worksheet('products', products)
+    spreadsheet.seed_worksheet('shopping', [SHEET_HEADERS['shopping']])
+    spreadsheet.seed_worksheet('logs', logs)
+    return spreadsheet
+
+
+def operations():
+    user_id = 0
+
+    def grocery_haul():
+        for i in range(HAUL_SIZE):
+            kitchen_core.add_product(user_id, f"покупка{i}", 1, 'шт')
+
+    return [
+        # Перенесення йде у фоновому потоці; чекаємо на нього, щоб виміряти повністю
+        ("перенесення з таблиці", lambda: (kitchen_core.get_store(), kitchen_core.wait_for_import())),
+        ("list_products", lambda: kitchen_core.list_products(user_id)),
+        ("find_product", lambda: kitchen_core.find_product(user_id, "продукт1")),
+        ("add_product (існуючий)", lambda: kitchen_core.add_product(user_id, "продукт2", 100, 'г')),
+        ("add_product (новий)", lambda: kitchen_core.add_product(user_id, "новий продукт", 1, 'шт')),
+        ("remove_product (частково)", lambda: kitchen_core.remove_product(user_id, "продукт2", 100, 'г')),
+        ("remove_product (повністю)", lambda: kitchen_core.remove_product(user_id, "продукт3", 1, 'кг')),
+        (f"закупівля ({HAUL_SIZE} продуктів)", grocery_haul),
+        ("add_to_shopping_list", lambda: kitchen_core.add_to_shopping_list(user_id, "хліб", 1, 'шт')),
+        ("remove_from_shopping_list", lambda: kitchen_core.remove_from_shopping_list(user_id, "хліб")),
+        ("get_expiring_products", lambda: kitchen_core.get_expiring_products(user_id)),
+        ("get_all_expiring_products", kitchen_core.get_all_expiring_products),
+        ("get_consumption_stats", lambda: kitchen_core.get_consumption_stats(user_id)),
+        ("compact_sheets", kitchen_core.compact_sheets),
+    ]
+
+
+def run(rows: int, client: FakeClient, sheets: SheetsClient, workdir: str):
+    seed(client, rows)
+    local_db = Database(os.path.join(workdir, f"bench_{rows}.db"))
+    consumption_log = ConsumptionLog(local_db, os.path.join(workdir, f"segments_{rows}"))
+    kitchen_core.use_database(KitchenDatabase(SPREADSHEET_ID, client=client, sheets=sheets),
+                              local_db, consumption_log)
+    client.reset_counters()
+
+    results = []
+    for name, operation in operations():
+        before = dict(client.calls)
+        started = time.perf_counter()
+        error = None
+        try:
+            operation()
+            # Записи рахуємо разом з операцією, що їх спричинила
+            if not kitchen_core.flush_writes():
+                error = "зміни лишились у журналі"
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+        calls = {method: count - before.get(method, 0)
+                 for method, count in client.calls.items() if count != before.get(method, 0)}
+        results.append((name, calls, elapsed, error))
+
+    kitchen_core.close()
+    consumption_log.close()
+    local_db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Виклики Sheets API і час операцій kitchen_core")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.02, help="Затримка виклику API, с")
+    parser.add_argument('--quota', type=int, default=None, help="Викликів на хвилину")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            client = FakeClient(latency=args.latency, quota_per_minute=args.quota,
+                                error_rate=args.error_rate, seed=args.seed)
+            # Клієнт обмежує себе тією ж квотою, що й сервер; без квоти не обмежує
+            sheets = SheetsClient(quota_per_minute=args.quota)
+            print(f"\n📊 {rows} рядків")
+            print(f"{'операція':<34}{'виклики':>8}{'мс':>10}  деталі")
+            for name, calls, elapsed, error in run(rows, client, sheets, workdir):
+                details = ', '.join(f"{method}={count}" for method, count in sorted(calls.items()))
+                if error is not None:
+                    details += f"  ❌ {error}"
+                print(f"{name:<34}{sum(calls.values()):>8}{elapsed * 1000:>10.1f}  {details}")
+            print(f"{'усього':<34}{client.total_calls():>8}")
+            stats = sheets.stats()
+            print(f"повтори: {stats['retries']}, відмови: {stats['failures']}, "
+                  f"макс. черга: {stats['max_queue_depth']}, "
+                  f"середнє очікування: {stats['avg_wait_seconds']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from database import Database
+
+# Каталог сирих записів журналу: по одному файлу JSONL на місяць
+CONSUMPTION_LOG_DIR = os.getenv('CONSUMPTION_LOG_DIR', 'consumption_logs')
+LOG_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Позначка в import_progress, що історію з аркуша логів вже перенесено
+BACKFILL_SOURCE = 'logs_sheet'
+
+_UPSERT_SQL = '''
+    INSERT INTO consumption_daily (user_id, day, product_name, added, consumed)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, day, product_name) DO UPDATE SET
+        added = added + excluded.added,
+        consumed = consumed + excluded.consumed
+'''
+
+
+def _bucket(user_id, product_name: str, delta_qty: float, action: str, timestamp: datetime):
+    delta_qty = float(delta_qty)
+    added = delta_qty if action == 'add' else 0.0
+    consumed = abs(delta_qty) if action == 'remove' else 0.0
+    return (str(user_id), timestamp.date().isoformat(), product_name, added, consumed)
+
+
+class ConsumptionLog:
+    """Журнал споживання з денними агрегатами
+
+    Сирі записи дописуються в щомісячні сегменти JSONL і ніколи не
+    переписуються. Кожен запис одразу додається до денної суми в
+    consumption_daily, тому статистика за 7 чи 90 днів читає кілька
+    агрегатів, а не всю історію. У сегмент запис потрапляє лише після
+    коміту агрегату, щоб rebuild() не відновив дію, яку відкотили.
+    """
+
+    def __init__(self, db: Database, segment_dir: str = CONSUMPTION_LOG_DIR):
+        self.db = db
+        self.segment_dir = segment_dir
+        self._lock = threading.Lock()
+        self._segment_name: Optional[str] = None
+        self._segment = None
+        self._local = threading.local()
+
+    def _segment_path(self, month: str) -> str:
+        return os.path.join(self.segment_dir, f"{month}.jsonl")
+
+    def _append_segment(self, entries: List[Dict]):
+        """Дописує записи в сегменти їхніх місяців"""
+        with self._lock:
+            for entry in entries:
+                month = entry['timestamp'][:7]
+                if month != self._segment_name:
+                    if self._segment is not None:
+                        self._segment.close()
+                    os.makedirs(self.segment_dir, exist_ok=True)
+                    self._segment = open(self._segment_path(month), 'a', encoding='utf-8')
+                    self._segment_name = month
+                self._segment.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            if self._segment is not None:
+                self._segment.flush()
+
+    def _add_buckets(self, buckets: List[tuple], commit: bool = True):
+        conn = self.db.get_connection()
+        if not commit:
+            # Транзакцією керує викликач, він її і відкотить
+            conn.executemany(_UPSERT_SQL, buckets)
+            return
+        try:
+            conn.executemany(_UPSERT_SQL, buckets)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _pending(self) -> List[Dict]:
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = []
+        return pending
+
+    def commit_pending(self):
+        """Дописує в сегменти записи, відкладені record(commit=False), після коміту транзакції"""
+        pending = self._pending()
+        if pending:
+            self._local.pending = []
+            self._append_segment(pending)
+
+    def discard_pending(self):
+        """Забуває відкладені записи, коли транзакцію відкотили"""
+        self._local.pending = []
+
+    def record(self, user_id, product_name: str, delta_qty: float, unit: str, action: str,
+               timestamp: Optional[datetime] = None, commit: bool = True):
+        """Додає дію до денного агрегату і після коміту дописує її в сегмент
+
+        commit=False лишає агрегат у відкритій транзакції викликача, а запис
+        відкладає: після коміту викликач викликає commit_pending(), після
+        відкату - discard_pending().
+        """
+        timestamp = timestamp or datetime.now()
+        entry = {
+            'timestamp': timestamp.strftime(LOG_TIMESTAMP_FORMAT),
+            'user_id': str(user_id),
+            'product_name': product_name,
+            'delta_qty': float(delta_qty),
+            'unit': unit,
+            'action': action,
+        }
+        self._add_buckets([_bucket(user_id, product_name, delta_qty, action, timestamp)], commit)
+        if commit:
+            self._append_segment([entry])
+        else:
+            self._pending().append(entry)
+
+    def get_stats(self, user_id, days: int = 7) -> Dict[str, List[Dict]]:
+        """Додане і спожите за останні дні, сумарно по продуктах"""
+        since = (date.today() - timedelta(days=days)).isoformat()
+        rows = self.db.get_connection().execute('''
+            SELECT product_name, SUM(added), SUM(consumed)
+            FROM consumption_daily
+            WHERE user_id = ? AND day >= ?
+            GROUP BY product_name
+            ORDER BY product_name
+        ''', (str(user_id), since)).fetchall()
+
+        stats = {"consumed": [], "added": []}
+        for product, added, consumed in rows:
+            if consumed:
+                stats["consumed"].append({"product": product, "quantity": consumed})
+            if added:
+                stats["added"].append({"product": product, "quantity": added})
+        return stats
+
+    # Перенесення історії та відновлення
+
+    def is_backfilled(self) -> bool:
+        row = self.db.get_connection().execute(
+            'SELECT completed FROM import_progress WHERE source = ?', (BACKFILL_SOURCE,)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def backfill(self, records: Iterable[Dict]) -> int:
+        """Одноразово переносить історію з аркуша логів у сегменти й агрегати"""
+        entries = []
+        buckets = []
+        for record in records:
+            try:
+                timestamp = datetime.strptime(record.get("timestamp", ""), LOG_TIMESTAMP_FORMAT)
+                bucket = _bucket(record.get("user_id", ""), record.get("product_name", ""),
+                                 record.get("delta_qty", 0) or 0, record.get("action", ""), timestamp)
+            except ValueError:
+                continue
+            entries.append({
+                'timestamp': record["timestamp"],
+                'user_id': bucket[0],
+                'product_name': bucket[2],
+                'delta_qty': float(record.get("delta_qty", 0) or 0),
+                'unit': record.get("unit", ""),
+                'action': record.get("action", ""),
+            })
+            buckets.append(bucket)
+
+        entries.sort(key=lambda entry: entry['timestamp'])
+        conn = self.db.get_connection()
+        try:
+            conn.executemany(_UPSERT_SQL, buckets)
+            conn.execute('''
+                INSERT OR REPLACE INTO import_progress (source, records, completed, updated_at)
+                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+            ''', (BACKFILL_SOURCE, len(buckets)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self._append_segment(entries)
+        return len(buckets)
+
+    def rebuild(self) -> int:
+        """Перераховує агрегати з сегментів, наприклад після втрати бази"""
+        with self._lock:
+            if self._segment is not None:
+                self._segment.flush()
+            names = sorted(name for name in os.listdir(self.segment_dir)
+                           if name.endswith('.jsonl')) if os.path.isdir(self.segment_dir) else []
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        count = 0
+        try:
+            cursor.execute('DELETE FROM consumption_daily')
+            for name in names:
+                with open(os.path.join(self.segment_dir, name), encoding='utf-8') as segment:
+                    buckets = []
+                    for line in segment:
+                        if not line.strip():
+                            continue
+                        entry = json.loads(line)
+                        timestamp = datetime.strptime(entry['timestamp'], LOG_TIMESTAMP_FORMAT)
+                        buckets.append(_bucket(entry['user_id'], entry['product_name'],
+                                               entry['delta_qty'], entry['action'], timestamp))
+                    cursor.executemany(_UPSERT_SQL, buckets)
+                    count += len(buckets)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return count
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+                self._segment_name = None
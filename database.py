@@ -1,112 +1,139 @@
 import sqlite3
 import os
-from datetime import datetime
+import threading
+
+import migrations
+import ua_stemmer
+from sheets_client import SheetsClient
+
+# Налаштування SQLite для частого читання з кількох потоків
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+STATEMENT_CACHE_SIZE = 256
+MAX_SQL_PARAMS = 900
+
+# Ваги колонок для bm25: name, category, description, instructions, ingredients
+FTS_RANK = 'bm25(recipes_fts, 10.0, 4.0, 2.0, 1.0, 3.0)'
+
+# Категорії продуктів: kitchen_core додає їх префіксом до назви
+PRODUCT_CATEGORIES = {
+    "морозилка": "[МОРОЗИЛКА]",
+    "готова_їжа": "[ГОТОВА_ЇЖА]", 
+    "морозилка_готова": "[МОРОЗИЛКА_ГОТОВА]"
+}
+
+
+def normalize_product_name(name):
+    """Нормалізує назву продукту для пошуку (products.name_norm)"""
+    if not name:
+        return ""
+    s = name.strip().lower()
+    # Прибираємо префікси категорій
+    for cat in PRODUCT_CATEGORIES.values():
+        s = s.replace(cat.lower(), "").strip()
+    return " ".join(s.split())
+
+
+def build_fts_query(search_term):
+    """Перетворює запит користувача на префіксний FTS5-запит"""
+    # Закінчення відкидаємо, щоб 'борщу' та 'вареників' знаходили 'борщ' та 'вареники'
+    return " ".join(f'"{ua_stemmer.stem(word)}"*' for word in ua_stemmer.words(search_term))
+
+
+class ConnectionManager:
+    """Тримає одне постійне з'єднання на потік замість нового на кожен запит"""
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def get(self):
+        """Повертає з'єднання поточного потоку, створюючи його за потреби"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        """Закриває всі відкриті з'єднання"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
 
 class Database:
     def __init__(self, db_name="kitchen_bot.db"):
         self.db_name = db_name
+        self.connections = ConnectionManager(db_name)
+        self.write_generation = 0
+        self._version_conn = None
+        self._version_lock = threading.Lock()
         self.init_database()
     
     def get_connection(self):
-        return sqlite3.connect(self.db_name)
+        return self.connections.get()
+    
+    def close(self):
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+        self.connections.close_all()
+    
+    def data_changed(self):
+        """Позначає, що дані змінено в цьому процесі (для інвалідації кешів)"""
+        self.write_generation += 1
+    
+    def data_version(self):
+        """Версія даних: змінюється після будь-якого коміту в базу"""
+        # PRAGMA data_version змінюється лише від комітів інших з'єднань,
+        # тому читаємо його через окреме з'єднання, яке нічого не пише
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            version = self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+        return version, self.write_generation
     
     def init_database(self):
+        """Доводить схему до актуальної версії; якщо вона вже актуальна - нічого не робить"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Таблиця продуктів
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                quantity REAL DEFAULT 0,
-                unit TEXT DEFAULT 'шт',
-                expiry_date TEXT,
-                category TEXT DEFAULT 'інше',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблиця рецептів
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recipes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                instructions TEXT NOT NULL,
-                prep_time INTEGER DEFAULT 0,
-                cook_time INTEGER DEFAULT 0,
-                servings INTEGER DEFAULT 1,
-                difficulty TEXT DEFAULT 'легко',
-                category TEXT DEFAULT 'основні страви',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблиця інгредієнтів для рецептів
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recipe_ingredients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                recipe_id INTEGER,
-                ingredient_name TEXT NOT NULL,
-                quantity REAL NOT NULL,
-                unit TEXT NOT NULL,
-                FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-            )
-        ''')
-        
-        # Таблиця замін інгредієнтів
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS substitutions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                original_ingredient TEXT NOT NULL,
-                substitute TEXT NOT NULL,
-                ratio REAL DEFAULT 1.0,
-                notes TEXT
-            )
-        ''')
-        
-        # Таблиця планів харчування
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS meal_plans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                meal_type TEXT NOT NULL,
-                recipe_id INTEGER,
-                servings INTEGER DEFAULT 1,
-                FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-            )
-        ''')
-        
-        # Таблиця нагадувань
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reminders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                message TEXT NOT NULL,
-                reminder_date TEXT NOT NULL,
-                is_completed INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблиця харчової цінності
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS nutrition (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ingredient_name TEXT NOT NULL UNIQUE,
-                calories_per_100g REAL DEFAULT 0,
-                protein_per_100g REAL DEFAULT 0,
-                carbs_per_100g REAL DEFAULT 0,
-                fat_per_100g REAL DEFAULT 0,
-                fiber_per_100g REAL DEFAULT 0
-            )
-        ''')
-        
+        if migrations.migrate(conn):
+            # Додаємо базові дані
+            self.add_sample_data()
+        # Імпорт, що впав посеред роботи, лишив базу без індексів і пошуку - повертаємо їх
+        migrations.restore_suspended_indexes(conn)
+        # Рядки, вставлені в обхід бота, отримують нормальні форми назв тут
+        migrations.fill_missing_lemmas(conn)
+    
+    def rebuild_search_index(self):
+        """Повністю перебудовує повнотекстовий індекс рецептів"""
+        conn = self.get_connection()
+        for statement in migrations.FTS_REBUILD:
+            conn.execute(statement)
         conn.commit()
-        conn.close()
-        
-        # Додаємо базові дані
-        self.add_sample_data()
     
     def add_sample_data(self):
         """Додає базові рецепти та дані"""
@@ -116,7 +143,6 @@ class Database:
         # Перевіряємо чи є вже рецепти
         cursor.execute("SELECT COUNT(*) FROM recipes")
         if cursor.fetchone()[0] > 0:
-            conn.close()
             return
         
         # Додаємо базові рецепти
@@ -134,9 +160,10 @@ class Database:
         
         for recipe in recipes:
             cursor.execute('''
-                INSERT INTO recipes (name, description, instructions, prep_time, cook_time, servings, difficulty, category)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', recipe)
+                INSERT INTO recipes (name, description, instructions, prep_time, cook_time, servings, difficulty, category,
+                                     name_lemma)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', recipe + (ua_stemmer.lemma(recipe[0]),))
         
         # Додаємо інгредієнти для борщу
         cursor.execute("SELECT id FROM recipes WHERE name = 'Борщ'")
@@ -154,9 +181,9 @@ class Database:
         
         for ingredient in borsch_ingredients:
             cursor.execute('''
-                INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity, unit)
-                VALUES (?, ?, ?, ?)
-            ''', ingredient)
+                INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity, unit, ingredient_lemma)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ingredient + (ua_stemmer.lemma(ingredient[1]),))
         
         # Додаємо базові заміни
         substitutions = [
@@ -168,9 +195,9 @@ class Database:
         
         for sub in substitutions:
             cursor.execute('''
-                INSERT INTO substitutions (original_ingredient, substitute, ratio, notes)
-                VALUES (?, ?, ?, ?)
-            ''', sub)
+                INSERT INTO substitutions (original_ingredient, substitute, ratio, notes, original_lemma)
+                VALUES (?, ?, ?, ?, ?)
+            ''', sub + (ua_stemmer.lemma(sub[0]),))
         
         # Додаємо базову харчову цінність
         nutrition_data = [
@@ -183,43 +210,44 @@ class Database:
         
         for nutrition in nutrition_data:
             cursor.execute('''
-                INSERT INTO nutrition (ingredient_name, calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', nutrition)
+                INSERT INTO nutrition (ingredient_name, calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g,
+                                       ingredient_lemma)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', nutrition + (ua_stemmer.lemma(nutrition[0]),))
         
         conn.commit()
-        conn.close()
     
     # Методи для роботи з продуктами
-    def add_product(self, name, quantity=0, unit='шт', expiry_date=None, category='інше'):
+    # Запаси користувачів з дзеркалом у Google Sheets веде inventory_store.InventoryStore;
+    # ці методи працюють з тією ж таблицею напряму, без дзеркала
+    def add_product(self, name, quantity=0, unit='шт', expiry_date=None, category='інше', user_id=''):
         conn = self.get_connection()
         cursor = conn.cursor()
-        try:
-            cursor.execute('''
-                INSERT INTO products (name, quantity, unit, expiry_date, category)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (name, quantity, unit, expiry_date, category))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+        cursor.execute('''
+            INSERT INTO products (name, quantity, unit, expiry_date, category, user_id, name_norm)
+            SELECT ?, ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM products WHERE user_id = ? AND name = ?)
+        ''', (name, quantity, unit, expiry_date, category, str(user_id), normalize_product_name(name),
+              str(user_id), name))
+        conn.commit()
+        return cursor.rowcount > 0
     
-    def get_products(self):
+    def get_products(self, user_id=None):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM products ORDER BY name')
+        if user_id is None:
+            cursor.execute('SELECT * FROM products ORDER BY name')
+        else:
+            cursor.execute('SELECT * FROM products WHERE user_id = ? ORDER BY name', (str(user_id),))
         products = cursor.fetchall()
-        conn.close()
         return products
     
-    def update_product_quantity(self, name, quantity):
+    def update_product_quantity(self, name, quantity, user_id=''):
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('UPDATE products SET quantity = ? WHERE name = ?', (quantity, name))
+        cursor.execute('UPDATE products SET quantity = ? WHERE user_id = ? AND name = ?',
+                       (quantity, str(user_id), name))
         conn.commit()
-        conn.close()
         return cursor.rowcount > 0
     
     # Методи для роботи з рецептами
@@ -228,16 +256,19 @@ class Database:
         cursor = conn.cursor()
         
         if search_term:
-            cursor.execute('''
-                SELECT * FROM recipes 
-                WHERE name LIKE ? OR category LIKE ? OR description LIKE ?
-                ORDER BY name
-            ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
+            fts_query = build_fts_query(search_term)
+            if not fts_query:
+                return []
+            cursor.execute(f'''
+                SELECT r.* FROM recipes_fts
+                JOIN recipes r ON r.id = recipes_fts.rowid
+                WHERE recipes_fts MATCH ?
+                ORDER BY {FTS_RANK}, r.name
+            ''', (fts_query,))
         else:
             cursor.execute('SELECT * FROM recipes ORDER BY name')
         
         recipes = cursor.fetchall()
-        conn.close()
         return recipes
     
     def get_recipe_by_id(self, recipe_id):
@@ -245,7 +276,6 @@ class Database:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM recipes WHERE id = ?', (recipe_id,))
         recipe = cursor.fetchone()
-        conn.close()
         return recipe
     
     def get_recipe_ingredients(self, recipe_id):
@@ -257,17 +287,197 @@ class Database:
             WHERE recipe_id = ?
         ''', (recipe_id,))
         ingredients = cursor.fetchall()
-        conn.close()
         return ingredients
     
     def get_substitutions(self, ingredient):
         conn = self.get_connection()
         cursor = conn.cursor()
+        ingredient_lemma = ua_stemmer.lemma(ingredient)
+        # Точний збіг нормальних форм по індексу: 'молока' знаходить 'молоко'
+        cursor.execute('''
+            SELECT substitute, ratio, notes 
+            FROM substitutions 
+            WHERE original_lemma = ?
+            ORDER BY id
+        ''', (ingredient_lemma,))
+        result = cursor.fetchall()
+        if result or not ingredient_lemma:
+            return result
+        # Інакше - частина назви: 'паста' знаходить 'томатна паста'
         cursor.execute('''
             SELECT substitute, ratio, notes 
             FROM substitutions 
-            WHERE original_ingredient LIKE ?
-        ''', (f'%{ingredient}%',))
-        substitutions = cursor.fetchall()
-        conn.close()
-        return substitutions
+            WHERE instr(original_lemma, ?) > 0
+            ORDER BY id
+        ''', (ingredient_lemma,))
+        return cursor.fetchall()
+    
+    def find_recipe_id_by_name(self, name):
+        """Рецепт, назва якого в нормальній формі збігається з name, або None"""
+        row = self.get_connection().execute(
+            'SELECT id FROM recipes WHERE name_lemma = ? ORDER BY id LIMIT 1', (ua_stemmer.lemma(name),)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def get_recipes_with_ingredients(self, search_term=None, recipe_ids=None,
+                                     category=None, difficulty=None,
+                                     limit=None, offset=0, random_order=False):
+        """Повертає рецепти разом з інгредієнтами за два запити"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        sql = 'SELECT r.* FROM recipes r'
+        conditions = []
+        args = []
+        order = 'r.name'
+        if search_term:
+            fts_query = build_fts_query(search_term)
+            if not fts_query:
+                return []
+            sql += ' JOIN recipes_fts ON recipes_fts.rowid = r.id'
+            conditions.append('recipes_fts MATCH ?')
+            args.append(fts_query)
+            order = f'{FTS_RANK}, r.name'
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return []
+            conditions.append(f"r.id IN ({','.join('?' * len(recipe_ids))})")
+            args.extend(recipe_ids)
+        if category:
+            conditions.append('r.category = ?')
+            args.append(category)
+        if difficulty:
+            conditions.append('r.difficulty = ?')
+            args.append(difficulty)
+        
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ' + ('RANDOM()' if random_order else order)
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            args.extend([limit, offset])
+        
+        cursor.execute(sql, args)
+        recipes = cursor.fetchall()
+        if not recipes:
+            return []
+        
+        # Інгредієнти для всіх знайдених рецептів одним запитом
+        # (великі вибірки ділимо на частини через ліміт параметрів SQLite)
+        ids = [recipe[0] for recipe in recipes]
+        ingredients = {recipe_id: [] for recipe_id in ids}
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            chunk = ids[start:start + MAX_SQL_PARAMS]
+            cursor.execute(f'''
+                SELECT recipe_id, ingredient_name, quantity, unit
+                FROM recipe_ingredients
+                WHERE recipe_id IN ({','.join('?' * len(chunk))})
+                ORDER BY id
+            ''', chunk)
+            for recipe_id, name, quantity, unit in cursor.fetchall():
+                ingredients[recipe_id].append((name, quantity, unit))
+        
+        return [(recipe, ingredients[recipe[0]]) for recipe in recipes]
+    
+    def count_recipes(self, search_term=None):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if search_term:
+            fts_query = build_fts_query(search_term)
+            if not fts_query:
+                return 0
+            cursor.execute(
+                'SELECT COUNT(*) FROM recipes_fts WHERE recipes_fts MATCH ?', (fts_query,)
+            )
+        else:
+            cursor.execute('SELECT COUNT(*) FROM recipes')
+        return cursor.fetchone()[0]
+
+
+# Аркуші Google Sheets із запасами та їхні заголовки
+SHEET_HEADERS = {
+    'products': ['user_id', 'product_name', 'quantity', 'unit', 'expiry_date', 'added_date'],
+    'shopping': ['user_id', 'item', 'quantity', 'unit', 'note', 'added_date'],
+    'logs': ['timestamp', 'user_id', 'product_name', 'delta_qty', 'unit', 'action'],
+}
+GOOGLE_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive',
+]
+
+
+def _worksheet_not_found():
+    try:
+        from gspread.exceptions import WorksheetNotFound
+    except ImportError:
+        return KeyError
+    return (WorksheetNotFound, KeyError)
+
+
+class KitchenDatabase:
+    """Запаси, список покупок і журнал дій у Google Sheets
+
+    Підключення ліниве: таблиця відкривається при першому зверненні до аркуша.
+    Усі виклики API йдуть через SheetsClient, який тримає їх у межах квоти.
+    """
+
+    def __init__(self, spreadsheet_id=None, credentials_json=None, client=None, sheets=None):
+        self.spreadsheet_id = spreadsheet_id or os.getenv('SPREADSHEET_ID')
+        self.credentials_json = credentials_json or os.getenv('GOOGLE_CREDENTIALS')
+        self._client = client
+        self.sheets = sheets or SheetsClient()
+        self._spreadsheet = None
+        self._worksheets = {}
+        # RLock: get_worksheet відкриває таблицю, вже тримаючи замок
+        self._lock = threading.RLock()
+
+    def is_configured(self):
+        return bool(self.spreadsheet_id and (self._client or self.credentials_json))
+
+    def _get_client(self):
+        if self._client is None:
+            import json
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            credentials = Credentials.from_service_account_info(
+                json.loads(self.credentials_json), scopes=GOOGLE_SCOPES
+            )
+            self._client = gspread.authorize(credentials)
+        return self._client
+
+    def get_spreadsheet(self):
+        with self._lock:
+            if self._spreadsheet is None:
+                self._spreadsheet = self.sheets.call(self._get_client().open_by_key, self.spreadsheet_id)
+            return self._spreadsheet
+
+    def get_worksheet(self, name):
+        """Повертає аркуш, створюючи його із заголовками, якщо його ще немає
+
+        Замок не дає двом потокам одночасно створити той самий аркуш.
+        """
+        with self._lock:
+            if name not in self._worksheets:
+                spreadsheet = self.get_spreadsheet()
+                headers = SHEET_HEADERS[name]
+                try:
+                    worksheet = self.sheets.call(spreadsheet.worksheet, name)
+                except _worksheet_not_found():
+                    worksheet = self.sheets.call(spreadsheet.add_worksheet, title=name, rows=1000, cols=len(headers))
+                    worksheet = self.sheets.wrap(worksheet)
+                    worksheet.append_row(headers)
+                else:
+                    worksheet = self.sheets.wrap(worksheet)
+                self._worksheets[name] = worksheet
+            return self._worksheets[name]
+
+    def get_products_sheet(self):
+        return self.get_worksheet('products')
+
+    def get_shopping_sheet(self):
+        return self.get_worksheet('shopping')
+
+    def get_logs_sheet(self):
+        return self.get_worksheet('logs')
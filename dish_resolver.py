@@ -0,0 +1,325 @@
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+from collections import Counter
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from database import Database, MAX_SQL_PARAMS
+
+# Мінімальна подібність (коефіцієнт Дайса за триграмами), з якою кандидат повертається
+DISH_MIN_SCORE = 0.45
+DISH_TOP_K = 5
+# Пороги, з якими пошук пробує спершу: вищий поріг - менше кандидатів
+SCORE_TIERS = (0.8, 0.65)
+# Кандидати, слабші за цю частку найкращого збігу, не шукаються
+RELATIVE_SCORE = 0.8
+# Збіг з окремим словом назви важить менше, ніж з назвою цілком
+WORD_WEIGHT = 0.9
+# Окремі слова назви коротші за це не індексуються: «з», «на», «по» збігаються з усім
+MIN_WORD_LENGTH = 4
+# Якщо з останнього оновлення змінилось більше рецептів, індекс будується заново
+REBUILD_THRESHOLD = 5000
+# Як часто (секунди) фонове завдання бота підтягує змінені рецепти й чистить recipe_changes
+DISH_REFRESH_SECONDS = int(os.getenv('DISH_REFRESH_SECONDS', '60'))
+
+
+def normalize_dish(text: str) -> str:
+    """Нижній регістр, лише літери й цифри; апостроф відкидаємо - його часто пропускають"""
+    text = text.lower()
+    for apostrophe in ("'", "’", "`", "ʼ"):
+        text = text.replace(apostrophe, "")
+    return " ".join(re.findall(r"\w+", text))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграми кожного слова з відступами, як у pg_trgm: «  сир »"""
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class TrigramIndex:
+    """Нечіткий пошук за триграмами: елемент має кілька ключів (назва, псевдоніми, слова)
+
+    Однакові ключі різних елементів зберігаються один раз, тож часте слово
+    («вареники») - це один ключ, а не тисячі. Ключі розкладено за кількістю
+    триграм: ключі з довжиною, близькою до запиту, перевіряються першими,
+    і пошук зупиняється, щойно довші чи коротші ключі вже не можуть
+    обійти знайдені. Кандидатів дають лише найрідші триграми запиту -
+    ключ без жодної з них не набере потрібної кількості спільних.
+    """
+
+    def __init__(self):
+        # Триграма -> {кількість триграм ключа: ключі}
+        self._postings: Dict[str, Dict[int, Set[int]]] = {}
+        self._lengths: Counter = Counter()
+        self._key_ids: Dict[str, int] = {}
+        self._key_strings: Dict[int, str] = {}
+        self._key_grams: Dict[int, FrozenSet[str]] = {}
+        # Ключ -> [(-вага, довжина назви, елемент)], відсортовано: найкращі спершу
+        self._key_items: Dict[int, List[Tuple[float, int, int]]] = {}
+        self._item_keys: Dict[int, List[Tuple[int, Tuple[float, int, int]]]] = {}
+        self._names: Dict[int, str] = {}
+        self._next_key = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, item_id: int, name: str, keys: Iterable[Tuple[str, float]]):
+        """Додає (або замінює) елемент з назвою name і ключами пошуку (ключ, вага)"""
+        self.remove(item_id)
+        self._names[item_id] = name
+        weights: Dict[str, float] = {}
+        for key, weight in keys:
+            key = normalize_dish(key)
+            if key and weight > weights.get(key, 0.0):
+                weights[key] = weight
+
+        item_keys = []
+        for key, weight in weights.items():
+            key_id = self._key_ids.get(key)
+            if key_id is None:
+                key_id = self._add_key(key)
+            entry = (-weight, len(name), item_id)
+            bisect.insort(self._key_items[key_id], entry)
+            item_keys.append((key_id, entry))
+        self._item_keys[item_id] = item_keys
+
+    def _add_key(self, key: str) -> int:
+        grams = frozenset(trigrams(key))
+        key_id = self._next_key
+        self._next_key += 1
+        self._key_ids[key] = key_id
+        self._key_strings[key_id] = key
+        self._key_grams[key_id] = grams
+        self._key_items[key_id] = []
+        self._lengths[len(grams)] += 1
+        for gram in grams:
+            self._postings.setdefault(gram, {}).setdefault(len(grams), set()).add(key_id)
+        return key_id
+
+    def remove(self, item_id: int):
+        for key_id, entry in self._item_keys.pop(item_id, ()):
+            items = self._key_items[key_id]
+            del items[bisect.bisect_left(items, entry)]
+            if not items:
+                self._remove_key(key_id)
+        self._names.pop(item_id, None)
+
+    def _remove_key(self, key_id: int):
+        """Прибирає ключ, що більше нікому не належить"""
+        del self._key_items[key_id]
+        del self._key_ids[self._key_strings.pop(key_id)]
+        grams = self._key_grams.pop(key_id)
+        length = len(grams)
+        self._lengths[length] -= 1
+        if not self._lengths[length]:
+            del self._lengths[length]
+        for gram in grams:
+            buckets = self._postings[gram]
+            buckets[length].discard(key_id)
+            if not buckets[length]:
+                del buckets[length]
+                if not buckets:
+                    del self._postings[gram]
+
+    def search(self, query: str, k: int = DISH_TOP_K,
+               min_score: float = DISH_MIN_SCORE) -> List[Tuple[float, int, str]]:
+        """До k найкращих (подібність, елемент, назва), за спаданням подібності"""
+        grams = frozenset(trigrams(normalize_dish(query)))
+        if not grams or k <= 0:
+            return []
+
+        best: Dict[int, Tuple[float, int]] = {}
+        kth = []  # k найкращих оцінок (мінімальна купа)
+        # Строгий поріг дає мало кандидатів; нижчі пробуємо, лише якщо збігів не вистачило.
+        # Кандидати набагато гірші за вже знайдений найкращий не потрібні
+        searched = None
+        for tier in sorted({*(score for score in SCORE_TIERS if score > min_score), min_score}, reverse=True):
+            floor = max(tier, max(kth, default=0.0) * RELATIVE_SCORE)
+            if searched is not None and (floor >= searched or (len(kth) >= k and kth[0] >= searched)):
+                break
+            self._search(grams, k, floor, best, kth)
+            searched = floor
+
+        top = heapq.nsmallest(k, best.items(), key=lambda item: (-item[1][0], item[1][1]))
+        return [(round(score, 3), item_id, self._names[item_id]) for item_id, (score, _) in top]
+
+    def _search(self, grams, k, floor, best, kth):
+        """Шукає ключі з подібністю не нижче floor, від найперспективніших довжин"""
+        size = len(grams)
+
+        # Найбільша можлива подібність ключа з length триграм: коли одна множина містить іншу
+        def bound(length):
+            return 2 * min(size, length) / (size + length)
+
+        gram_buckets = [self._postings[gram] for gram in grams if gram in self._postings]
+        for length in sorted(self._lengths, key=bound, reverse=True):
+            if bound(length) < floor or (len(kth) >= k and kth[0] >= bound(length)):
+                break
+            threshold = max(floor, kth[0]) if len(kth) >= k else floor
+            # Дайс = 2*o/(|q|+|d|) >= t  <=>  o >= t*(|q|+|d|)/2
+            need = max(1, math.ceil(threshold * (size + length) / 2 - 1e-9))
+            postings = sorted((buckets[length] for buckets in gram_buckets if length in buckets), key=len)
+            if len(postings) < need:
+                continue
+            # Ключ, що не має жодної з |q|-need+1 найрідших триграм, не набере need спільних.
+            # Рахуємо ще й наступні триграми, поки це недорого: кожна з них підвищує
+            # мінімум збігів серед порахованих і відсіює кандидатів без перетину множин
+            probe = len(postings) - need + 1
+            budget = 2 * sum(len(posting) for posting in postings[:probe])
+            spent = 0
+            while probe < len(postings) and spent + len(postings[probe]) <= budget:
+                spent += len(postings[probe])
+                probe += 1
+            hits = Counter(chain.from_iterable(postings[:probe]))
+            least = need - (len(postings) - probe)
+            key_grams = self._key_grams
+            for key_id in [key_id for key_id, count in hits.items() if count >= least]:
+                common = len(grams & key_grams[key_id])
+                if common >= need:
+                    self._collect(key_id, 2 * common / (size + length), k, floor, best, kth)
+
+    def _collect(self, key_id, key_score, k, floor, best, kth):
+        """Додає до найкращих елементи ключа; їх упорядковано, тож досить перших k нових"""
+        taken = 0
+        for neg_weight, length, item_id in self._key_items[key_id]:
+            score = -neg_weight * key_score
+            if score < floor or (len(kth) >= k and score < kth[0]):
+                break
+            previous = best.get(item_id)
+            if previous is not None and score <= previous[0]:
+                continue
+            best[item_id] = (score, length)
+            if previous is None:
+                heapq.heappush(kth, score)
+                if len(kth) > k:
+                    heapq.heappop(kth)
+            taken += 1
+            if taken >= k:
+                break
+
+
+def dish_keys(name: str, aliases: Iterable[str] = ()) -> List[Tuple[str, float]]:
+    """Ключі пошуку страви: назва й псевдоніми повністю, довгі слова назви - з меншою вагою"""
+    keys = [(name, 1.0)] + [(alias, 1.0) for alias in aliases]
+    keys.extend((word, WORD_WEIGHT) for word in normalize_dish(name).split() if len(word) >= MIN_WORD_LENGTH)
+    return keys
+
+
+class DishResolver:
+    """Назви страв з таблиці recipes (разом із псевдонімами) у триграмному індексі
+
+    Індекс будується при першому зверненні, а далі оновлюється лише для
+    рецептів, записаних тригерами в recipe_changes після попереднього
+    оновлення. refresh() лише читає базу; застосовані записи журналу
+    видаляє prune(), яку викликає фонове завдання, щоб пошук ніколи не
+    чекав на блокування запису, яке тримає імпорт.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.index = TrigramIndex()
+        # Зростає з кожною зміною індексу (для інвалідації залежних кешів)
+        self.generation = 0
+        self._last_change: Optional[int] = None
+        # _lock коротко захищає індекс від пошуку, _refresh_lock не дає двом оновленням іти разом
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _load(self, recipe_ids: Optional[List[int]] = None) -> Dict[int, Tuple[str, List[str]]]:
+        """{id: (назва, псевдоніми)} для вказаних рецептів або для всіх"""
+        conn = self.db.get_connection()
+        if recipe_ids is None:
+            recipes = conn.execute('SELECT id, name FROM recipes').fetchall()
+            aliases = conn.execute('SELECT recipe_id, alias FROM recipe_aliases').fetchall()
+        else:
+            placeholders = ','.join('?' * len(recipe_ids))
+            recipes = conn.execute(
+                f'SELECT id, name FROM recipes WHERE id IN ({placeholders})', recipe_ids
+            ).fetchall()
+            aliases = conn.execute(
+                f'SELECT recipe_id, alias FROM recipe_aliases WHERE recipe_id IN ({placeholders})', recipe_ids
+            ).fetchall()
+        result = {recipe_id: (name, []) for recipe_id, name in recipes}
+        for recipe_id, alias in aliases:
+            if recipe_id in result:
+                result[recipe_id][1].append(alias)
+        return result
+
+    def _build(self) -> TrigramIndex:
+        index = TrigramIndex()
+        for recipe_id, (name, aliases) in self._load().items():
+            index.add(recipe_id, name, dish_keys(name, aliases))
+        return index
+
+    def refresh(self):
+        """Застосовує зміни рецептів, що з'явились після попереднього оновлення
+
+        Читання бази й побудова ключів ідуть без блокування пошуку: новий
+        повний індекс лише підміняється під ним, а інкрементальні зміни
+        застосовуються порціями.
+        """
+        with self._refresh_lock:
+            conn = self.db.get_connection()
+            last_change = conn.execute('SELECT COALESCE(MAX(id), 0) FROM recipe_changes').fetchone()[0]
+            if self._last_change is not None and last_change == self._last_change:
+                return
+            changed = None
+            if self._last_change is not None:
+                changed = [row[0] for row in conn.execute(
+                    'SELECT DISTINCT recipe_id FROM recipe_changes WHERE id > ? AND id <= ?',
+                    (self._last_change, last_change)
+                )]
+            if changed is None or len(changed) > REBUILD_THRESHOLD:
+                index = self._build()
+                with self._lock:
+                    self.index = index
+            else:
+                for start in range(0, len(changed), MAX_SQL_PARAMS):
+                    chunk = changed[start:start + MAX_SQL_PARAMS]
+                    loaded = self._load(chunk)
+                    updates = [
+                        (recipe_id, loaded[recipe_id][0], dish_keys(*loaded[recipe_id]))
+                        if recipe_id in loaded else (recipe_id, None, None)
+                        for recipe_id in chunk
+                    ]
+                    with self._lock:
+                        for recipe_id, name, keys in updates:
+                            if keys is None:
+                                self.index.remove(recipe_id)
+                            else:
+                                self.index.add(recipe_id, name, keys)
+            with self._lock:
+                self._last_change = last_change
+                self.generation += 1
+
+    def prune(self) -> int:
+        """Видаляє з recipe_changes записи, які індекс уже застосував; повертає їх кількість"""
+        with self._lock:
+            last_change = self._last_change
+        if not last_change:
+            return 0
+        conn = self.db.get_connection()
+        # Останній запис лишаємо: за ним наступне оновлення бачить, що нового немає
+        deleted = conn.execute('DELETE FROM recipe_changes WHERE id < ?', (last_change,)).rowcount
+        conn.commit()
+        return deleted
+
+    def resolve(self, text: str, k: int = DISH_TOP_K,
+                min_score: float = DISH_MIN_SCORE) -> List[Tuple[float, int, str]]:
+        """До k рецептів, схожих на text: (подібність від 0 до 1, id рецепта, назва)
+
+        Шукає лише в пам'яті. Бот будує індекс під час запуску й оновлює його
+        фоновим завданням; поза ботом індекс будується при першому пошуку.
+        """
+        if self._last_change is None:
+            self.refresh()
+        with self._lock:
+            return self.index.search(text, k, min_score)
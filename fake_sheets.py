@@ -0,0 +1,225 @@
+"""Локальна заміна gspread для вимірювань kitchen_core без справжньої таблиці
+
+Реалізує ту частину API клієнта, таблиці та аркуша, якою користуються
+KitchenDatabase і SheetWriter. Кожен виклик API рахується, може мати
+штучну затримку, а також відмову 429 за перевищення квоти або випадкову.
+"""
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+class FakeAPIError(Exception):
+    """Помилка API з відповіддю, як у gspread.exceptions.APIError"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code}: {message}")
+        self.response = FakeResponse(status_code)
+
+
+class FakeWorksheetNotFound(KeyError):
+    pass
+
+
+def _parse_a1(address: str):
+    """'B12' -> (12, 2)"""
+    letters = ''.join(ch for ch in address if ch.isalpha())
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + ord(ch) - ord('A') + 1
+    return int(address[len(letters):]), col
+
+
+class FakeClient:
+    """Клієнт із лічильниками викликів, затримкою та відмовами
+
+    latency - затримка кожного виклику (с); quota_per_minute - скільки
+    викликів дозволено за останні 60 с, решта отримує 429; error_rate -
+    ймовірність випадкової відмови з кодом error_status.
+    """
+
+    def __init__(self, latency: float = 0.0, quota_per_minute: Optional[int] = None,
+                 error_rate: float = 0.0, error_status: int = 429, seed: Optional[int] = None):
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls = Counter()
+        self.errors = Counter()
+        self._recent = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._spreadsheets: Dict[str, 'FakeSpreadsheet'] = {}
+
+    def api_call(self, method: str):
+        """Рахує виклик, чекає затримку і за потреби кидає FakeAPIError"""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self.quota_per_minute is not None and len(self._recent) >= self.quota_per_minute:
+                self.errors[method] += 1
+                raise FakeAPIError(429, 'Quota exceeded for quota metric')
+            self._recent.append(now)
+            self.calls[method] += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            with self._lock:
+                self.errors[method] += 1
+            raise FakeAPIError(self.error_status, 'Injected error')
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def open_by_key(self, key: str) -> 'FakeSpreadsheet':
+        self.api_call('open_by_key')
+        if key not in self._spreadsheets:
+            self._spreadsheets[key] = FakeSpreadsheet(self, key)
+        return self._spreadsheets[key]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client: FakeClient, key: str):
+        self.client = client
+        self.id = key
+        self.revision = 0
+        self._worksheets: Dict[str, 'FakeWorksheet'] = {}
+
+    def touch(self):
+        self.revision += 1
+
+    def get_lastUpdateTime(self) -> str:
+        self.client.api_call('get_lastUpdateTime')
+        return str(self.revision)
+
+    def worksheet(self, title: str) -> 'FakeWorksheet':
+        self.client.api_call('worksheet')
+        if title not in self._worksheets:
+            raise FakeWorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26) -> 'FakeWorksheet':
+        self.client.api_call('add_worksheet')
+        worksheet = self._worksheets[title] = FakeWorksheet(self, title, rows)
+        self.touch()
+        return worksheet
+
+    def seed_worksheet(self, title: str, values: List[List]) -> 'FakeWorksheet':
+        """Заповнює аркуш без виклику API (для підготовки даних)"""
+        worksheet = self._worksheets.setdefault(title, FakeWorksheet(self, title))
+        worksheet.values = [[str(value) for value in row] for row in values]
+        worksheet.row_count = max(worksheet.row_count, len(values))
+        self.touch()
+        return worksheet
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: FakeSpreadsheet, title: str, rows: int = 1000):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.row_count = rows
+        self.values: List[List[str]] = []
+
+    def _call(self, method: str, write: bool = False):
+        self.spreadsheet.client.api_call(method)
+        if write:
+            self.spreadsheet.touch()
+
+    def _set(self, row: int, col: int, value):
+        while len(self.values) < row:
+            self.values.append([])
+        cells = self.values[row - 1]
+        if len(cells) < col:
+            cells.extend([''] * (col - len(cells)))
+        cells[col - 1] = '' if value is None else str(value)
+
+    def _last_data_row(self) -> int:
+        # Як і Sheets, порожні рядки в кінці не віддаються
+        last = len(self.values)
+        while last and not any(self.values[last - 1]):
+            last -= 1
+        return last
+
+    # Читання
+
+    def get_all_values(self) -> List[List[str]]:
+        self._call('get_all_values')
+        return [list(row) for row in self.values[:self._last_data_row()]]
+
+    def get_all_records(self) -> List[Dict]:
+        self._call('get_all_records')
+        if not self.values:
+            return []
+        headers = self.values[0]
+        return [dict(zip(headers, list(row) + [''] * (len(headers) - len(row))))
+                for row in self.values[1:self._last_data_row()]]
+
+    # Записи
+
+    def update_cell(self, row: int, col: int, value):
+        self._call('update_cell', write=True)
+        self._set(row, col, value)
+
+    def batch_update(self, data: List[Dict], value_input_option: str = 'RAW'):
+        self._call('batch_update', write=True)
+        # Як і Sheets, запис за межі сітки аркуша відхиляється цілком
+        for item in data:
+            row, _ = _parse_a1(item['range'].split(':')[0])
+            if row + len(item['values']) - 1 > self.row_count:
+                raise FakeAPIError(400, f"Range ({item['range']}) exceeds grid limits")
+        for item in data:
+            row, col = _parse_a1(item['range'].split(':')[0])
+            for i, values in enumerate(item['values']):
+                for j, value in enumerate(values):
+                    self._set(row + i, col + j, value)
+
+    def batch_clear(self, ranges: List[str]):
+        self._call('batch_clear', write=True)
+        for address in ranges:
+            start, _, end = address.partition(':')
+            row1, col1 = _parse_a1(start)
+            row2, col2 = _parse_a1(end or start)
+            for row in range(row1, min(row2, len(self.values)) + 1):
+                for col in range(col1, col2 + 1):
+                    if col <= len(self.values[row - 1]):
+                        self.values[row - 1][col - 1] = ''
+
+    def _append(self, method: str, rows: List[List]):
+        self._call(method, write=True)
+        start = self._last_data_row()
+        self.values[start:start] = [[str(value) for value in row] for row in rows]
+        self.row_count = max(self.row_count, len(self.values))
+
+    def append_row(self, values: List):
+        self._append('append_row', [values])
+
+    def append_rows(self, rows: List[List]):
+        self._append('append_rows', rows)
+
+    def add_rows(self, rows: int):
+        self._call('add_rows', write=True)
+        self.row_count += rows
+
+    def delete_rows(self, start: int, end: Optional[int] = None):
+        self._call('delete_rows', write=True)
+        del self.values[start - 1:(end or start)]
+
+    def resize(self, rows: Optional[int] = None, cols: Optional[int] = None):
+        self._call('resize', write=True)
+        if rows is not None:
+            del self.values[rows:]
+            self.row_count = rows
@@ -0,0 +1,385 @@
+"""Статистичний класифікатор намірів: наївний Баєс за символьними n-грамами
+
+Модель навчається офлайн з розміченого корпусу JSONL ({"text": ..., "intent": ...})
+і зберігається як стиснені масиви NumPy. NumPy імпортується лише під час
+навчання чи першого завантаження моделі.
+
+Сирий наївний Баєс майже завжди впевнений на 99%, навіть щодо повідомлень
+не про кухню, тож поріг довіри нічого б не відсіював. Тому оцінка класу
+ділиться на кількість ознак повідомлення (невідомі моделі n-грами важать 0,
+але рахуються), а температура підбирається на відкладеній частині корпусу.
+
+Приклади:
+    python intent_classifier.py train intents.jsonl intent_model.npz
+    python intent_classifier.py predict "склад борщу" "план на вечір"
+    python intent_classifier.py bench intents.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import ua_stemmer
+
+logger = logging.getLogger(__name__)
+
+INTENT_MODEL_PATH = os.getenv('INTENT_MODEL', 'intent_model.npz')
+# Кількість ознак після хешування n-грам
+FEATURE_DIM = 2 ** 13
+NGRAM_RANGE = (2, 4)
+# Згладжування Лапласа
+ALPHA = 0.3
+# Скільки повідомлень оцінювати одним множенням матриць
+BATCH_ROWS = 512
+FEATURE_CACHE_SIZE = 16384
+# Кожен N-й приклад корпусу відкладається для підбору температури
+CALIBRATION_EVERY = 5
+# Температури, серед яких шукається найкраща (логарифмічна сітка)
+TEMPERATURE_RANGE = (1e-3, 10.0)
+TEMPERATURE_STEPS = 200
+# Пороги довіри, для яких bench рахує відступи до ключових слів
+BENCH_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+# Написані вручну повідомлення, не з шаблонів корпусу: перевірка на живій мові
+# і на запитах не про кухню, які класифікатор не повинен впевнено кудись віднести
+HANDWRITTEN_MESSAGES = [
+    ("зроби мені каву", "unknown"),
+    ("скільки коштує хліб", "unknown"),
+    ("яйця", "unknown"),
+    ("а що там по погоді на вихідних", "unknown"),
+    ("дякую, було смачно", "unknown"),
+    ("увімкни музику", "unknown"),
+    ("хочу щось смачненьке з курячим філе на вечерю", "recipe"),
+    ("як правильно засолити огірки", "recipe"),
+    ("покажи як печуть пиріг з вишнями", "recipe"),
+    ("що можна зробити з кабачків", "recipe"),
+    ("а що треба купити на олівʼє", "ingredients"),
+    ("з яких продуктів роблять сирники", "ingredients"),
+    ("перелік інгредієнтів на піцу маргариту", "ingredients"),
+    ("в мене скінчилися яйця, що покласти в тісто натомість", "substitution"),
+    ("можна замість вершкового масла взяти олію?", "substitution"),
+    ("нема сметани для борщу", "substitution"),
+    ("скільки ккал у двох млинцях", "nutrition"),
+    ("чи багато цукру в шарлотці", "nutrition"),
+    ("наскільки калорійний плов", "nutrition"),
+    ("що там лежить у морозилці", "inventory"),
+    ("запиши що я купила пів кіло сиру", "inventory"),
+    ("які продукти в мене скоро зіпсуються", "inventory"),
+    ("розпиши обіди до пʼятниці", "meal_plan"),
+    ("придумай меню на свято для шести гостей", "meal_plan"),
+    ("що нам їсти наступного тижня", "meal_plan"),
+]
+
+
+def _numpy():
+    import numpy
+    return numpy
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def _word_features(word: str, dim: int, ngram_range: Tuple[int, int]) -> Tuple[int, ...]:
+    """Хеші слова та його символьних n-грам (з пробілами по краях)"""
+    low, high = ngram_range
+    padded = f" {word} "
+    result = {zlib.crc32(f"w:{word}".encode()) % dim}
+    for n in range(low, high + 1):
+        for start in range(len(padded) - n + 1):
+            result.add(zlib.crc32(padded[start:start + n].encode()) % dim)
+    return tuple(result)
+
+
+def features(text: str, dim: int = FEATURE_DIM, ngram_range: Tuple[int, int] = NGRAM_RANGE) -> List[int]:
+    """Номери ознак повідомлення: символьні n-грами слів і самі слова, без повторів"""
+    result = set()
+    for word in ua_stemmer.words(text):
+        result.update(_word_features(word, dim, ngram_range))
+    return sorted(result)
+
+
+def read_corpus(path: str) -> Tuple[List[str], List[str]]:
+    """Тексти й мітки з JSONL-корпусу"""
+    texts, labels = [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                texts.append(record['text'])
+                labels.append(record['intent'])
+    return texts, labels
+
+
+class IntentClassifier:
+    """Мультиноміальний наївний Баєс над бінарними ознаками n-грам
+
+    Модель - це апріорні логарифми ймовірностей класів, матриця логарифмів
+    ймовірностей ознак (класи x ознаки) і температура. Пакет повідомлень
+    оцінюється одним добутком бінарної матриці ознак на цю матрицю.
+    """
+
+    def __init__(self, labels: Sequence[str], log_prior, log_likelihood,
+                 ngram_range: Tuple[int, int] = NGRAM_RANGE, temperature: float = 1.0):
+        self.labels = list(labels)
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood
+        self.ngram_range = tuple(ngram_range)
+        self.temperature = temperature
+
+    @property
+    def dim(self) -> int:
+        return self.log_likelihood.shape[1]
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], dim: int = FEATURE_DIM,
+              alpha: float = ALPHA, ngram_range: Tuple[int, int] = NGRAM_RANGE,
+              calibrate_every: int = CALIBRATION_EVERY) -> 'IntentClassifier':
+        """Навчає модель на всьому корпусі; температуру підбирає модель без кожного calibrate_every-го прикладу"""
+        classifier = cls._fit(texts, labels, dim, alpha, ngram_range)
+        if calibrate_every > 1:
+            (fit_texts, fit_labels), (held_texts, held_labels) = _split(list(texts), list(labels), calibrate_every)
+            if held_texts and set(fit_labels) == set(classifier.labels):
+                probe = cls._fit(fit_texts, fit_labels, dim, alpha, ngram_range)
+                classifier.temperature = probe.fit_temperature(held_texts, held_labels)
+        return classifier
+
+    @classmethod
+    def _fit(cls, texts: Sequence[str], labels: Sequence[str], dim: int, alpha: float,
+             ngram_range: Tuple[int, int]) -> 'IntentClassifier':
+        np = _numpy()
+        classes = sorted(set(labels))
+        index = {label: i for i, label in enumerate(classes)}
+        counts = np.zeros((len(classes), dim), dtype=np.float64)
+        class_sizes = np.zeros(len(classes), dtype=np.float64)
+        for text, label in zip(texts, labels):
+            counts[index[label], features(text, dim, ngram_range)] += 1
+            class_sizes[index[label]] += 1
+
+        smoothed = counts + alpha
+        log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        # Ознаки, яких не було в корпусі, нічого не кажуть про клас
+        log_likelihood[:, counts.sum(axis=0) == 0] = 0.0
+        log_prior = np.log(class_sizes / class_sizes.sum())
+        return cls(classes, log_prior.astype(np.float32), log_likelihood.astype(np.float32), ngram_range)
+
+    def fit_temperature(self, texts: Sequence[str], labels: Sequence[str]) -> float:
+        """Температура з найменшою середньою помилкою (мінус логарифм ймовірності правильного класу)"""
+        np = _numpy()
+        index = {label: i for i, label in enumerate(self.labels)}
+        known = [(text, index[label]) for text, label in zip(texts, labels) if label in index]
+        if not known:
+            return 1.0
+        scores = self._scores([text for text, _ in known])
+        expected = np.array([i for _, i in known])
+        rows = np.arange(len(known))
+        best_loss, best_temperature = None, 1.0
+        for temperature in np.geomspace(*TEMPERATURE_RANGE, TEMPERATURE_STEPS):
+            probabilities = _softmax(np, scores / temperature + self.log_prior)
+            loss = -np.log(probabilities[rows, expected] + 1e-12).mean()
+            if best_loss is None or loss < best_loss:
+                best_loss, best_temperature = loss, float(temperature)
+        return best_temperature
+
+    def save(self, path: str):
+        np = _numpy()
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            log_prior=self.log_prior,
+            log_likelihood=self.log_likelihood,
+            ngram_range=np.array(self.ngram_range),
+            temperature=np.array(self.temperature),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'IntentClassifier':
+        np = _numpy()
+        with np.load(path) as data:
+            return cls(
+                [str(label) for label in data['labels']],
+                data['log_prior'],
+                data['log_likelihood'],
+                tuple(int(n) for n in data['ngram_range']),
+                float(data['temperature']) if 'temperature' in data.files else 1.0,
+            )
+
+    def _scores(self, texts: Sequence[str]):
+        """Логарифми правдоподібності класів, поділені на кількість ознак повідомлення"""
+        np = _numpy()
+        result = np.empty((len(texts), len(self.labels)), dtype=np.float32)
+        weights = self.log_likelihood.T
+        for start in range(0, len(texts), BATCH_ROWS):
+            chunk = texts[start:start + BATCH_ROWS]
+            matrix = np.zeros((len(chunk), self.dim), dtype=np.float32)
+            for row, text in enumerate(chunk):
+                matrix[row, features(text, self.dim, self.ngram_range)] = 1.0
+            sizes = np.maximum(matrix.sum(axis=1, keepdims=True), 1.0)
+            result[start:start + len(chunk)] = (matrix @ weights) / sizes
+        return result
+
+    def predict_proba(self, texts: Sequence[str]):
+        """Матриця ймовірностей (повідомлення x класи), рядки в порядку texts"""
+        np = _numpy()
+        return _softmax(np, self._scores(texts) / self.temperature + self.log_prior)
+
+    def classify(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        """Ймовірності намірів для кожного повідомлення"""
+        return [
+            dict(zip(self.labels, (float(p) for p in row)))
+            for row in self.predict_proba(texts)
+        ]
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """Найімовірніший намір і його ймовірність для кожного повідомлення"""
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+
+def _softmax(np, scores):
+    # Зсув на максимум рядка, щоб не переповнити exp
+    scores = scores - scores.max(axis=1, keepdims=True)
+    probabilities = np.exp(scores)
+    return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def load_model(path: str = INTENT_MODEL_PATH) -> Optional[IntentClassifier]:
+    """Модель з файлу або None, якщо файлу чи NumPy немає (тоді працюють ключові слова)"""
+    if not os.path.exists(path):
+        logger.info("Модель намірів %s не знайдена, наміри визначають ключові слова", path)
+        return None
+    try:
+        return IntentClassifier.load(path)
+    except ImportError:
+        logger.warning("NumPy не встановлено, наміри визначають ключові слова")
+        return None
+
+
+def _split(texts: List[str], labels: List[str], every: int) -> Tuple[Tuple[List, List], Tuple[List, List]]:
+    """Детермінований поділ корпусу: кожен every-й приклад - у перевірку"""
+    train = ([t for i, t in enumerate(texts) if i % every], [l for i, l in enumerate(labels) if i % every])
+    test = ([t for i, t in enumerate(texts) if not i % every], [l for i, l in enumerate(labels) if not i % every])
+    return train, test
+
+
+def _accuracy(predicted: Iterable[str], expected: Sequence[str]) -> float:
+    return sum(p == e for p, e in zip(predicted, expected)) / len(expected) if expected else 0.0
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:,.0f} повідомлень/с" if seconds else "∞"
+
+
+def _fallbacks(classifier: 'IntentClassifier', messages: Sequence[str], threshold: float) -> int:
+    """Скільки повідомлень класифікатор віддасть ключовим словам за цього порогу"""
+    return sum(confidence < threshold for _, confidence in classifier.predict(messages))
+
+
+def bench(corpus: str, every: int = 5, repeat: int = 20):
+    """Точність і швидкість класифікатора проти ключових слів NLPProcessor
+
+    Точність рахується на відкладеній частині корпусу і на HANDWRITTEN_MESSAGES;
+    для кількох порогів довіри видно, як часто намір вирішують ключові слова.
+    """
+    from nlp_processor import INTENT_CONFIDENCE, NLPProcessor, normalize_message
+
+    texts, labels = read_corpus(corpus)
+    (train_texts, train_labels), (test_texts, test_labels) = _split(texts, labels, every)
+    classifier = IntentClassifier.train(train_texts, train_labels)
+    keywords = NLPProcessor(intent_model=None)
+    messages = [normalize_message(text) for text in test_texts] * repeat
+    handwritten = [normalize_message(text) for text, _ in HANDWRITTEN_MESSAGES]
+    handwritten_labels = [label for _, label in HANDWRITTEN_MESSAGES]
+
+    def combined(threshold):
+        processor = NLPProcessor(intent_model=None, intent_confidence=threshold)
+        processor.intent_classifier = classifier
+        return processor
+
+    started = time.perf_counter()
+    keyword_intents = [keywords._detect_intent(message) for message in messages]
+    keyword_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for message in messages:
+        classifier.predict([message])
+    single_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predicted = classifier.predict(messages)
+    batch_seconds = time.perf_counter() - started
+
+    default = combined(INTENT_CONFIDENCE)
+    rows = [
+        ('ключові слова (_detect_intent)', keyword_intents,
+         [keywords._detect_intent(message) for message in handwritten],
+         _rate(len(messages), keyword_seconds)),
+        ('класифікатор, по одному', [intent for intent, _ in predicted],
+         [intent for intent, _ in classifier.predict(handwritten)], _rate(len(messages), single_seconds)),
+        ('класифікатор, пакетом', [intent for intent, _ in predicted],
+         [intent for intent, _ in classifier.predict(handwritten)], _rate(len(messages), batch_seconds)),
+        (f'класифікатор + ключові слова ({INTENT_CONFIDENCE})',
+         [default._detect_intent(message) for message in messages],
+         [default._detect_intent(message) for message in handwritten], ''),
+    ]
+
+    print(f"корпус: {len(texts)}, навчання: {len(train_texts)}, перевірка: {len(test_texts)}, "
+          f"вручну: {len(handwritten)}, температура: {classifier.temperature:.3f}")
+    print(f"{'метод':<40}{'перевірка':>10}{'вручну':>8}  швидкість")
+    for name, intents, handwritten_intents, rate in rows:
+        print(f"{name:<40}{_accuracy(intents, test_labels * repeat):>10.3f}"
+              f"{_accuracy(handwritten_intents, handwritten_labels):>8.3f}  {rate}")
+
+    unique = messages[:len(test_texts)]
+    print(f"\n{'поріг':<7}{'до ключових слів (перевірка)':>30}{'точність':>10}"
+          f"{'до ключових слів (вручну)':>28}{'точність':>10}")
+    for threshold in BENCH_THRESHOLDS:
+        processor = combined(threshold)
+        print(f"{threshold:<7}{_fallbacks(classifier, unique, threshold):>24}/{len(unique):<5}"
+              f"{_accuracy([processor._detect_intent(m) for m in unique], test_labels):>10.3f}"
+              f"{_fallbacks(classifier, handwritten, threshold):>22}/{len(handwritten):<5}"
+              f"{_accuracy([processor._detect_intent(m) for m in handwritten], handwritten_labels):>10.3f}")
+
+    print("\nнаписані вручну: очікуваний намір -> класифікатор (ймовірність) -> підсумок")
+    for (text, label), (intent, confidence), message in zip(
+            HANDWRITTEN_MESSAGES, classifier.predict(handwritten), handwritten):
+        print(f"  {text:<55}{label:<13}{intent:<13}{confidence:>5.2f}  {default._detect_intent(message)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Навчання та перевірка класифікатора намірів")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    train_parser = subparsers.add_parser('train', help="Навчити модель на корпусі JSONL")
+    train_parser.add_argument('corpus')
+    train_parser.add_argument('model', nargs='?', default=INTENT_MODEL_PATH)
+    train_parser.add_argument('--dim', type=int, default=FEATURE_DIM)
+    train_parser.add_argument('--alpha', type=float, default=ALPHA)
+    predict_parser = subparsers.add_parser('predict', help="Ймовірності намірів для повідомлень")
+    predict_parser.add_argument('messages', nargs='+')
+    predict_parser.add_argument('--model', default=INTENT_MODEL_PATH)
+    bench_parser = subparsers.add_parser('bench', help="Порівняти з ключовими словами")
+    bench_parser.add_argument('corpus')
+    bench_parser.add_argument('--every', type=int, default=5, help="Кожен N-й приклад - у перевірку")
+    bench_parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.action == 'train':
+        texts, labels = read_corpus(args.corpus)
+        classifier = IntentClassifier.train(texts, labels, dim=args.dim, alpha=args.alpha)
+        classifier.save(args.model)
+        print(f"✅ {len(texts)} прикладів, наміри: {', '.join(classifier.labels)}, "
+              f"температура {classifier.temperature:.3f} -> {args.model} ({os.path.getsize(args.model) // 1024} КБ)")
+    elif args.action == 'predict':
+        classifier = IntentClassifier.load(args.model)
+        for message, probabilities in zip(args.messages, classifier.classify(args.messages)):
+            ranked = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)
+            print(f"{message}: " + ", ".join(f"{label} {p:.2f}" for label, p in ranked[:3]))
+    else:
+        bench(args.corpus, args.every, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
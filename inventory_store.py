@@ -0,0 +1,353 @@
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from consumption import LOG_TIMESTAMP_FORMAT, ConsumptionLog
+from database import SHEET_HEADERS, Database, normalize_product_name
+from sheets_cache import FIRST_DATA_ROW, SheetWriter
+
+# Таблиця SQLite і її колонки в порядку заголовків аркуша-дзеркала
+MIRROR_TABLES = {'products': 'products', 'shopping': 'shopping_items'}
+MIRROR_COLUMNS = {
+    'products': ['user_id', 'name', 'quantity', 'unit', 'expiry_date', 'added_date'],
+    'shopping': ['user_id', 'item', 'quantity', 'unit', 'note', 'added_date'],
+}
+# Колонка, порожнє значення якої в аркуші позначає видалений рядок
+TOMBSTONE_COLUMN = 'user_id'
+EXPIRY_DATE_FORMAT = '%Y-%m-%d'
+
+_PRODUCT_SELECT = '''
+    SELECT id, user_id, name, quantity, unit, coalesce(expiry_date, ''), coalesce(added_date, ''),
+           category, name_norm
+    FROM products
+'''
+_SHOPPING_SELECT = '''
+    SELECT id, user_id, item, quantity, unit, coalesce(note, ''), coalesce(added_date, '')
+    FROM shopping_items
+'''
+
+
+def _product(row: Tuple) -> Dict:
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "product_name": row[2],
+        "quantity": row[3],
+        "unit": row[4],
+        "expiry_date": row[5],
+        "added_date": row[6],
+        "category": row[7],
+        "name_norm": row[8],
+    }
+
+
+def _shopping_item(row: Tuple) -> Dict:
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "item": row[2],
+        "quantity": row[3],
+        "unit": row[4],
+        "note": row[5],
+        "added_date": row[6],
+    }
+
+
+def _quantity(value) -> float:
+    try:
+        return float(str(value).replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+class InventoryStore:
+    """Запаси, список покупок і журнал дій користувачів
+
+    Основне сховище - SQLite, тож кожне читання є запитом по індексу.
+    Google Sheets, якщо його налаштовано, - дзеркало для людей: кожна
+    зміна комітиться разом зі своїм записом у журналі SheetWriter, а в
+    аркуш потрапляє асинхронно. Рядки в аркуші мають сталі номера
+    (sheet_row); видалені стають надгробками, поки compact_mirror() не
+    перепише аркуш.
+    """
+
+    def __init__(self, db: Database, consumption_log: ConsumptionLog,
+                 writer: Optional[SheetWriter] = None,
+                 normalize: Callable[[str], str] = normalize_product_name):
+        self.db = db
+        self.consumption_log = consumption_log
+        self.writer = writer
+        self.normalize = normalize
+        self._local = threading.local()
+        # Аркуші, у які вже можна писати: до першого імпорту номери рядків у них ще чужі
+        self._mirror_ready = set()
+
+    @contextmanager
+    def transaction(self):
+        """Зміни в блоці (у поточному потоці) разом із записами для дзеркала комітяться однією транзакцією
+
+        Записи журналу споживання потрапляють у сегменти лише після коміту.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        conn = self.db.get_connection()
+        try:
+            if self.writer is not None:
+                with self.writer.atomic():
+                    yield
+            else:
+                yield
+                if depth == 0:
+                    conn.commit()
+        except Exception:
+            if depth == 0:
+                if self.writer is None:
+                    conn.rollback()
+                self.consumption_log.discard_pending()
+            raise
+        else:
+            if depth == 0:
+                self.consumption_log.commit_pending()
+        finally:
+            self._local.depth = depth
+
+    # Дзеркало в Google Sheets
+
+    def _allocate_row(self, sheet: str) -> int:
+        conn = self.db.get_connection()
+        row = conn.execute(
+            'UPDATE sheet_mirror SET next_row = next_row + 1 WHERE sheet = ? RETURNING next_row - 1',
+            (sheet,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        conn.execute('INSERT INTO sheet_mirror (sheet, next_row) VALUES (?, ?)', (sheet, FIRST_DATA_ROW + 1))
+        return FIRST_DATA_ROW
+
+    def _is_mirror_ready(self, sheet: str) -> bool:
+        """Чи перенесено вже аркуш; до того локальні зміни в нього не йдуть, їх допише імпорт
+
+        Викликається після запису в тій самій транзакції, тож з імпортом,
+        що йде в іншому потоці, перевірка не розминеться.
+        """
+        if self.writer is None:
+            return False
+        if sheet not in self._mirror_ready:
+            done = self.consumption_log.is_backfilled() if sheet == 'logs' else self.is_imported(sheet)
+            if not done:
+                return False
+            self._mirror_ready.add(sheet)
+        return True
+
+    def _mirror_insert(self, sheet: str, row_id: int):
+        """Дописує рядок таблиці в аркуш-дзеркало, якщо той уже перенесено"""
+        if self._is_mirror_ready(sheet):
+            self._append_mirror_row(sheet, row_id)
+
+    def _append_mirror_row(self, sheet: str, row_id: int):
+        """Дописує рядок таблиці в аркуш-дзеркало під новим номером"""
+        table = MIRROR_TABLES[sheet]
+        sheet_row = self._allocate_row(sheet)
+        conn = self.db.get_connection()
+        conn.execute(f'UPDATE {table} SET sheet_row = ? WHERE id = ?', (sheet_row, row_id))
+        values = conn.execute(
+            f"SELECT {', '.join(MIRROR_COLUMNS[sheet])} FROM {table} WHERE id = ?", (row_id,)
+        ).fetchone()
+        self.writer.append_row(sheet, sheet_row, ['' if value is None else value for value in values])
+
+    def _mirror_update(self, sheet: str, sheet_row: Optional[int], column: str, value):
+        if self.writer is None or sheet_row is None:
+            return
+        self.writer.update_cell(sheet, sheet_row, MIRROR_COLUMNS[sheet].index(column) + 1, value)
+
+    def _sheet_row(self, sheet: str, row_id: int) -> Optional[int]:
+        row = self.db.get_connection().execute(
+            f'SELECT sheet_row FROM {MIRROR_TABLES[sheet]} WHERE id = ?', (row_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def is_imported(self, sheet: str) -> bool:
+        row = self.db.get_connection().execute(
+            'SELECT completed FROM import_progress WHERE source = ?', (f'{sheet}_sheet',)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def import_mirror(self, sheet: str, worksheet) -> int:
+        """Одноразово переносить рядки з аркуша, який до цього був основним сховищем
+
+        Рядки зберігають свої номери в аркуші. Локальні рядки, яких в
+        аркуші ще немає, дописуються в нього. Повертає кількість
+        перенесених рядків.
+        """
+        if self.writer is None or self.is_imported(sheet):
+            return 0
+        values = worksheet.get_all_values()
+        headers = values[0] if values else list(SHEET_HEADERS[sheet])
+        table = MIRROR_TABLES[sheet]
+        columns = MIRROR_COLUMNS[sheet]
+
+        records = []
+        for sheet_row, row in enumerate(values[1:], start=FIRST_DATA_ROW):
+            record = dict(zip(headers, row))
+            if not str(record.get(TOMBSTONE_COLUMN, '')).strip():
+                continue
+            record = [record.get(header, '') for header in SHEET_HEADERS[sheet]]
+            record[2] = _quantity(record[2])
+            records.append(record + [sheet_row])
+
+        conn = self.db.get_connection()
+        with self.transaction():
+            if sheet == 'products':
+                conn.executemany(f'''
+                    INSERT INTO products ({', '.join(columns)}, sheet_row, name_norm)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [record + [self.normalize(record[1])] for record in records])
+            else:
+                conn.executemany(f'''
+                    INSERT INTO {table} ({', '.join(columns)}, sheet_row)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', records)
+            conn.execute('INSERT OR REPLACE INTO sheet_mirror (sheet, next_row) VALUES (?, ?)',
+                         (sheet, max(len(values) + 1, FIRST_DATA_ROW)))
+            # Аркуш з іншим порядком колонок переписуємо в очікуваному
+            if headers[:len(SHEET_HEADERS[sheet])] != SHEET_HEADERS[sheet]:
+                self._rewrite_mirror(sheet)
+            for (row_id,) in conn.execute(f'SELECT id FROM {table} WHERE sheet_row IS NULL ORDER BY id').fetchall():
+                self._append_mirror_row(sheet, row_id)
+            conn.execute('''
+                INSERT OR REPLACE INTO import_progress (source, records, completed, updated_at)
+                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+            ''', (f'{sheet}_sheet', len(records)))
+        return len(records)
+
+    def _rewrite_mirror(self, sheet: str) -> int:
+        """Нумерує рядки дзеркала підряд і ставить у журнал повний перезапис аркуша"""
+        table = MIRROR_TABLES[sheet]
+        conn = self.db.get_connection()
+        rows = conn.execute(f'''
+            SELECT id, {', '.join(MIRROR_COLUMNS[sheet])} FROM {table}
+            WHERE sheet_row IS NOT NULL ORDER BY sheet_row
+        ''').fetchall()
+        conn.executemany(f'UPDATE {table} SET sheet_row = ? WHERE id = ?',
+                         [(n, row[0]) for n, row in enumerate(rows, start=FIRST_DATA_ROW)])
+        conn.execute('INSERT OR REPLACE INTO sheet_mirror (sheet, next_row) VALUES (?, ?)',
+                     (sheet, FIRST_DATA_ROW + len(rows)))
+        self.writer.rewrite(sheet, [SHEET_HEADERS[sheet]] + [
+            ['' if value is None else value for value in row[1:]] for row in rows
+        ])
+        return len(rows)
+
+    def compact_mirror(self, sheet: str) -> int:
+        """Прибирає надгробки з аркуша-дзеркала; повертає кількість прибраних рядків"""
+        if self.writer is None or not self.writer.flush(sheet):
+            return 0
+        conn = self.db.get_connection()
+        with self.transaction():
+            row = conn.execute('SELECT next_row FROM sheet_mirror WHERE sheet = ?', (sheet,)).fetchone()
+            used = (row[0] if row else FIRST_DATA_ROW) - FIRST_DATA_ROW
+            live = conn.execute(
+                f'SELECT COUNT(*) FROM {MIRROR_TABLES[sheet]} WHERE sheet_row IS NOT NULL'
+            ).fetchone()[0]
+            if used <= live:
+                return 0
+            self._rewrite_mirror(sheet)
+        self.writer.flush(sheet)
+        return used - live
+
+    # Запаси
+
+    def find_product(self, user_id, name_norm: str) -> Optional[Dict]:
+        """Перший продукт користувача з такою нормалізованою назвою"""
+        row = self.db.get_connection().execute(
+            _PRODUCT_SELECT + ' WHERE user_id = ? AND name_norm = ? ORDER BY id LIMIT 1',
+            (str(user_id), name_norm)
+        ).fetchone()
+        return _product(row) if row else None
+
+    def list_products(self, user_id) -> List[Dict]:
+        rows = self.db.get_connection().execute(
+            _PRODUCT_SELECT + ' WHERE user_id = ? ORDER BY id', (str(user_id),)
+        ).fetchall()
+        return [_product(row) for row in rows]
+
+    def add_product(self, user_id, name: str, quantity: float, unit: str, expiry_date: str = '',
+                    added_date: Optional[str] = None, category: str = 'інше') -> int:
+        with self.transaction():
+            cursor = self.db.get_connection().execute('''
+                INSERT INTO products (user_id, name, name_norm, quantity, unit, expiry_date, added_date, category)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (str(user_id), name, self.normalize(name), quantity, unit, expiry_date or '',
+                  added_date or date.today().isoformat(), category))
+            self._mirror_insert('products', cursor.lastrowid)
+        return cursor.lastrowid
+
+    def update_product_quantity(self, product_id: int, quantity: float):
+        with self.transaction():
+            self.db.get_connection().execute(
+                'UPDATE products SET quantity = ? WHERE id = ?', (quantity, product_id)
+            )
+            self._mirror_update('products', self._sheet_row('products', product_id), 'quantity', quantity)
+
+    def delete_product(self, product_id: int):
+        with self.transaction():
+            sheet_row = self._sheet_row('products', product_id)
+            self.db.get_connection().execute('DELETE FROM products WHERE id = ?', (product_id,))
+            self._mirror_update('products', sheet_row, TOMBSTONE_COLUMN, '')
+
+    def expiring_products(self, until: date, user_id=None) -> List[Tuple[date, Dict]]:
+        """(дата, продукт) з терміном придатності до until включно, за датою"""
+        sql = _PRODUCT_SELECT + " WHERE expiry_date > '' AND expiry_date <= ?"
+        args = [until.isoformat()]
+        if user_id is not None:
+            sql += ' AND user_id = ?'
+            args.append(str(user_id))
+        result = []
+        for row in self.db.get_connection().execute(sql + ' ORDER BY expiry_date, id', args):
+            try:
+                expiry = datetime.strptime(row[5], EXPIRY_DATE_FORMAT).date()
+            except ValueError:
+                continue
+            result.append((expiry, _product(row)))
+        return result
+
+    # Список покупок
+
+    def list_shopping(self, user_id) -> List[Dict]:
+        rows = self.db.get_connection().execute(
+            _SHOPPING_SELECT + ' WHERE user_id = ? ORDER BY id', (str(user_id),)
+        ).fetchall()
+        return [_shopping_item(row) for row in rows]
+
+    def add_shopping_item(self, user_id, item: str, quantity: float, unit: str, note: str = '',
+                          added_date: Optional[str] = None) -> int:
+        with self.transaction():
+            cursor = self.db.get_connection().execute('''
+                INSERT INTO shopping_items (user_id, item, quantity, unit, note, added_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (str(user_id), item, quantity, unit, note, added_date or date.today().isoformat()))
+            self._mirror_insert('shopping', cursor.lastrowid)
+        return cursor.lastrowid
+
+    def delete_shopping_item(self, item_id: int):
+        with self.transaction():
+            sheet_row = self._sheet_row('shopping', item_id)
+            self.db.get_connection().execute('DELETE FROM shopping_items WHERE id = ?', (item_id,))
+            self._mirror_update('shopping', sheet_row, TOMBSTONE_COLUMN, '')
+
+    # Журнал дій
+
+    def log_action(self, user_id, product_name: str, delta_qty: float, unit: str, action: str,
+                   timestamp: Optional[datetime] = None):
+        """Записує дію в журнал споживання і дописує її в аркуш логів"""
+        timestamp = timestamp or datetime.now()
+        with self.transaction():
+            self.consumption_log.record(user_id, product_name, delta_qty, unit, action, timestamp, commit=False)
+            # Дії до перенесення історії в аркуш не потрапляють: інакше перенесення порахувало б їх удруге
+            if self._is_mirror_ready('logs'):
+                self.writer.append_end('logs', [
+                    timestamp.strftime(LOG_TIMESTAMP_FORMAT), str(user_id), product_name, delta_qty, unit, action
+                ])
+
+    def consumption_stats(self, user_id, days: int = 7) -> Dict[str, List[Dict]]:
+        return self.consumption_log.get_stats(user_id, days)
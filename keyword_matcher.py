@@ -0,0 +1,79 @@
+from collections import deque, namedtuple
+from typing import Dict, List, Optional, Tuple
+
+# Входження терміна в текст: text[start:end] == term
+Match = namedtuple('Match', 'start end term label weight')
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасік для словників ключових слів
+
+    Усі терміни компілюються в один автомат, тож пошук усіх входжень
+    робить один прохід по тексту: його вартість залежить від довжини
+    повідомлення і кількості збігів, а не від розміру словників. Один
+    термін може належати кільком міткам (наприклад, двом намірам).
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, float]]] = [[]]
+        self._built = True
+
+    def add(self, term: str, label: str, weight: Optional[float] = None):
+        """Додає термін з міткою; вага за замовчуванням - довжина терміна"""
+        if not term:
+            return
+        node = 0
+        for ch in term:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append((term, label, float(len(term) if weight is None else weight)))
+        self._built = False
+
+    def build(self):
+        """Будує переходи за невдачі обходом у ширину"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # Вузол успадковує терміни, що є його суфіксами
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+        self._built = True
+
+    def find(self, text: str) -> List[Match]:
+        """Усі входження всіх термінів у порядку їхнього кінця в тексті"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for term, label, weight in out[node]:
+                matches.append(Match(i + 1 - len(term), i + 1, term, label, weight))
+        return matches
+
+    @staticmethod
+    def scores(matches: List[Match]) -> Dict[str, float]:
+        """Сумарна вага збігів для кожної мітки"""
+        result: Dict[str, float] = {}
+        for match in matches:
+            result[match.label] = result.get(match.label, 0.0) + match.weight
+        return result
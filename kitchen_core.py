@@ -1,15 +1,29 @@
-from database import KitchenDatabase
+from database import PRODUCT_CATEGORIES, Database, KitchenDatabase, normalize_product_name
+from consumption import ConsumptionLog
+from sheets_cache import SheetWriter
+from sheet_journal import SheetJournal
+from inventory_store import InventoryStore
+import sheets_client
 from datetime import datetime, timedelta
+import atexit
+import logging
+import os
 import re
+import threading
 
-db = KitchenDatabase()
+logger = logging.getLogger(__name__)
+
+# Година (UTC), коли аркуші стискаються: видалені рядки прибираються фізично
+SHEETS_COMPACT_HOUR = int(os.getenv("SHEETS_COMPACT_HOUR", "4"))
+# Година (UTC) щоденних сповіщень про продукти, що скоро зіпсуються
+EXPIRY_ALERT_HOUR = int(os.getenv("EXPIRY_ALERT_HOUR", "8"))
+EXPIRY_ALERT_DAYS = int(os.getenv("EXPIRY_ALERT_DAYS", "3"))
+# Пауза між спробами першого перенесення даних з Google Sheets (секунди, подвоюється до максимуму)
+SHEETS_IMPORT_RETRY = float(os.getenv("SHEETS_IMPORT_RETRY", "30"))
+SHEETS_IMPORT_MAX_RETRY = float(os.getenv("SHEETS_IMPORT_MAX_RETRY", "900"))
 
 # Категорії продуктів
-CATEGORIES = {
-    "морозилка": "[МОРОЗИЛКА]",
-    "готова_їжа": "[ГОТОВА_ЇЖА]", 
-    "морозилка_готова": "[МОРОЗИЛКА_ГОТОВА]"
-}
+CATEGORIES = PRODUCT_CATEGORIES
 
 def normalize_quantity_and_unit(quantity, unit):
     """Приводить кількість і одиниці до стандартного вигляду"""
@@ -46,21 +60,120 @@ def detect_category(product_name):
     
     return ""  # без категорії
 
-def _normalize_name(name: str) -> str:
-    """Нормалізує назву продукту для пошуку"""
-    if not name:
-        return ""
-    s = name.strip().lower()
-    # Прибираємо префікси категорій
-    for cat in CATEGORIES.values():
-        s = s.replace(cat.lower(), "").strip()
-    return " ".join(s.split())
+def use_database(database, local=None, consumption_log=None):
+    """Підключає модуль до сховища: SQLite як основне і, якщо налаштовано, дзеркало в таблиці
+
+    Дозволяє підставити іншу таблицю, наприклад fake_sheets для вимірювань.
+    local - SQLite-база із запасами, журналом змін і агрегатами споживання.
+    """
+    global db, local_db, writer, store, _consumption_log, _import_stop
+    # Перенесення для попереднього сховища більше не потрібне
+    _import_stop.set()
+    _import_stop = threading.Event()
+    if writer is not None:
+        writer.close()
+    db = database
+    local_db = local or Database()
+    store = None
+    _consumption_log = consumption_log
+    
+    writer = None
+    if db.is_configured():
+        # Зміни для дзеркала спершу пишуться в локальний журнал, а в аркуші йдуть пакетами у фоні
+        writer = SheetWriter(SheetJournal(local_db))
+        writer.register("products", db.get_products_sheet)
+        writer.register("shopping", db.get_shopping_sheet)
+        writer.register("logs", db.get_logs_sheet)
+        # Відтворюємо зміни, які не встигли записатись до перезапуску
+        writer.start()
+
+def _ensure_database():
+    """Підключає типове сховище при першому зверненні, а не під час імпорту модуля
+
+    Викликається під _store_lock.
+    """
+    if db is None:
+        use_database(KitchenDatabase())
+
+def is_sheets_configured():
+    """Чи ведеться дзеркало в Google Sheets"""
+    with _store_lock:
+        _ensure_database()
+        return db.is_configured()
+
+def get_store():
+    """Сховище запасів; дані, що досі жили в Google Sheets, переносяться у фоні"""
+    global store, _consumption_log, _import_thread
+    with _store_lock:
+        _ensure_database()
+        if store is None:
+            if _consumption_log is None:
+                _consumption_log = ConsumptionLog(local_db)
+                atexit.register(_consumption_log.close)
+            store = InventoryStore(local_db, _consumption_log, writer, normalize_product_name)
+            if writer is not None and not _is_mirror_imported(store):
+                _import_thread = threading.Thread(
+                    target=_import_mirror, args=(store, db, _import_stop), name="sheets-import", daemon=True
+                )
+                _import_thread.start()
+        return store
+
+def wait_for_import(timeout=None):
+    """Чекає на перше перенесення аркушів; True, якщо воно завершилось (або не потрібне)"""
+    thread = _import_thread
+    if thread is not None:
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+def _is_mirror_imported(inventory):
+    return (inventory.consumption_log.is_backfilled()
+            and inventory.is_imported("products") and inventory.is_imported("shopping"))
+
+def _import_mirror(inventory, sheets, stop):
+    """Одноразово переносить аркуші в SQLite, повторюючи спроби, поки Google недоступний
+
+    Сховище тим часом уже працює: локальні зміни потрапляють у дзеркало,
+    щойно відповідний аркуш перенесено.
+    """
+    delay = SHEETS_IMPORT_RETRY
+    while not stop.is_set():
+        try:
+            if not inventory.consumption_log.is_backfilled():
+                inventory.consumption_log.backfill(sheets.get_logs_sheet().get_all_records())
+            inventory.import_mirror("products", sheets.get_products_sheet())
+            inventory.import_mirror("shopping", sheets.get_shopping_sheet())
+            return
+        except Exception as e:
+            logger.warning(f"Не вдалося перенести дані з Google Sheets, повтор через {delay:.0f} с: {e}")
+            stop.wait(delay)
+            delay = min(delay * 2, SHEETS_IMPORT_MAX_RETRY)
+
+def get_consumption_log():
+    return get_store().consumption_log
+
+def flush_writes():
+    """Відправляє всі зміни з журналу в аркуші; False, якщо Google недоступний"""
+    return writer.flush() if writer is not None else True
+
+def close():
+    """Відправляє журнал змін перед завершенням"""
+    _import_stop.set()
+    if writer is not None:
+        writer.close()
+
+_store_lock = threading.Lock()
+_import_stop = threading.Event()
+_import_thread = None
+db = local_db = writer = store = None
+atexit.register(close)
+
+def log_action(user_id, product_name, delta_qty, unit, action):
+    """Записує дію в журнал"""
+    get_store().log_action(user_id, product_name, delta_qty, unit, action)
 
 def add_product(user_id, product_name, quantity, unit, expiry_date=None, category=None):
     """Додає продукт до кухні"""
-    ws = db.get_products_sheet()
-    data = ws.get_all_records()
-    
     # Нормалізуємо кількість і одиниці
     norm_qty, norm_unit = normalize_quantity_and_unit(quantity, unit)
     
@@ -70,184 +183,145 @@ def add_product(user_id, product_name, quantity, unit, expiry_date=None, categor
     
     # Додаємо категорію до назви
     full_name = f"{category} {product_name}".strip()
-    target_name_norm = _normalize_name(full_name)
+    target_name_norm = normalize_product_name(full_name)
     
-    # Шукаємо існуючий продукт
-    for idx, row in enumerate(data, start=2):
-        if str(row.get("user_id", "")) != str(user_id):
-            continue
-            
-        row_name = row.get("product_name", "")
-        if _normalize_name(row_name) == target_name_norm:
+    store = get_store()
+    with store.transaction():
+        # Шукаємо існуючий продукт
+        product = store.find_product(user_id, target_name_norm)
+        if product:
             # Оновлюємо кількість
-            current_qty = float(str(row.get("quantity", "0")).replace(",", "."))
-            new_qty = current_qty + norm_qty
-            ws.update_cell(idx, 3, new_qty)  # колонка quantity
-            db.log_action(user_id, full_name, norm_qty, norm_unit, "add")
+            new_qty = float(product["quantity"] or 0) + norm_qty
+            store.update_product_quantity(product["id"], new_qty)
+            store.log_action(user_id, full_name, norm_qty, norm_unit, "add")
             return f"✅ Додав {quantity}{unit} {product_name}. Тепер всього: {new_qty}{norm_unit}"
-    
-    # Створюємо новий продукт
-    if not expiry_date:
-        expiry_date = ""
-    
-    added_date = datetime.now().strftime("%Y-%m-%d")
-    new_row = [str(user_id), full_name, norm_qty, norm_unit, expiry_date, added_date]
-    ws.append_row(new_row)
-    db.log_action(user_id, full_name, norm_qty, norm_unit, "add")
+        
+        # Створюємо новий продукт
+        added_date = datetime.now().strftime("%Y-%m-%d")
+        store.add_product(user_id, full_name, norm_qty, norm_unit, expiry_date or "", added_date)
+        store.log_action(user_id, full_name, norm_qty, norm_unit, "add")
     return f"✅ Додав новий продукт: {quantity}{unit} {product_name}"
 
 def remove_product(user_id, product_name, quantity, unit):
     """Віднімає продукт з кухні"""
-    ws = db.get_products_sheet()
-    data = ws.get_all_records()
-    
     # Нормалізуємо кількість і одиниці
     norm_qty, norm_unit = normalize_quantity_and_unit(quantity, unit)
-    target_name_norm = _normalize_name(product_name)
+    target_name_norm = normalize_product_name(product_name)
     
-    # Шукаємо продукт
-    for idx, row in enumerate(data, start=2):
-        if str(row.get("user_id", "")) != str(user_id):
-            continue
-            
-        row_name = row.get("product_name", "")
-        if _normalize_name(row_name) == target_name_norm:
-            current_qty = float(str(row.get("quantity", "0")).replace(",", "."))
-            new_qty = current_qty - norm_qty
-            
-            if new_qty > 0:
-                ws.update_cell(idx, 3, new_qty)
-                db.log_action(user_id, row_name, -norm_qty, norm_unit, "remove")
-                return f"➖ Відняв {quantity}{unit} {product_name}. Залишок: {new_qty}{norm_unit}"
-            else:
-                ws.delete_rows(idx)
-                db.log_action(user_id, row_name, -current_qty, norm_unit, "remove")
-                return f"❌ {product_name} закінчився, видалив із списку"
-    
-    return f"❌ Не знайшов {product_name} у списку"
+    store = get_store()
+    with store.transaction():
+        # Шукаємо продукт
+        product = store.find_product(user_id, target_name_norm)
+        if not product:
+            return f"❌ Не знайшов {product_name} у списку"
+        
+        row_name = product["product_name"]
+        current_qty = float(product["quantity"] or 0)
+        new_qty = current_qty - norm_qty
+        
+        if new_qty > 0:
+            store.update_product_quantity(product["id"], new_qty)
+            store.log_action(user_id, row_name, -norm_qty, norm_unit, "remove")
+            return f"➖ Відняв {quantity}{unit} {product_name}. Залишок: {new_qty}{norm_unit}"
+        
+        store.delete_product(product["id"])
+        store.log_action(user_id, row_name, -current_qty, norm_unit, "remove")
+    return f"❌ {product_name} закінчився, видалив із списку"
+
+def _product_dict(product):
+    return {
+        "user_id": product["user_id"],
+        "product_name": product["product_name"],
+        "quantity": product["quantity"],
+        "unit": product["unit"],
+        "expiry_date": product["expiry_date"],
+        "added_date": product["added_date"]
+    }
 
 def list_products(user_id, category=None):
     """Показує список продуктів"""
-    ws = db.get_products_sheet()
-    data = ws.get_all_records()
-    
     result = []
-    for row in data:
-        if str(row.get("user_id", "")) != str(user_id):
-            continue
-            
+    for product in get_store().list_products(user_id):
         # Фільтр по категорії
-        if category:
-            product_name = row.get("product_name", "")
-            if category.lower() not in product_name.lower():
-                continue
-        
-        result.append({
-            "user_id": row.get("user_id", ""),
-            "product_name": row.get("product_name", ""),
-            "quantity": row.get("quantity", ""),
-            "unit": row.get("unit", ""),
-            "expiry_date": row.get("expiry_date", ""),
-            "added_date": row.get("added_date", "")
-        })
+        if category and category.lower() not in product["product_name"].lower():
+            continue
+        result.append(_product_dict(product))
     
     return result
 
 def find_product(user_id, search_name):
     """Шукає продукт за назвою"""
-    products = list_products(user_id)
-    search_norm = _normalize_name(search_name)
+    search_norm = normalize_product_name(search_name)
     
     found = []
-    for product in products:
-        product_norm = _normalize_name(product["product_name"])
+    for product in get_store().list_products(user_id):
+        product_norm = product["name_norm"]
         if search_norm in product_norm or product_norm in search_norm:
-            found.append(product)
+            found.append(_product_dict(product))
     
     return found
 
+def _expiring_product(product, expiry_date, today):
+    product = _product_dict(product)
+    product["days_left"] = (expiry_date - today).days
+    return product
+
 def get_expiring_products(user_id, days=3):
     """Повертає продукти, що скоро псуються"""
-    products = list_products(user_id)
-    expiring = []
+    today = datetime.now().date()
+    threshold = today + timedelta(days=days)
     
+    return [_expiring_product(product, expiry_date, today)
+            for expiry_date, product in get_store().expiring_products(threshold, user_id)]
+
+def get_all_expiring_products(days=EXPIRY_ALERT_DAYS):
+    """Продукти, що скоро псуються, для всіх користувачів: {user_id: [продукти]}"""
     today = datetime.now().date()
     threshold = today + timedelta(days=days)
     
-    for product in products:
-        expiry_str = product.get("expiry_date", "")
-        if not expiry_str:
-            continue
-            
-        try:
-            expiry_date = datetime.strptime(expiry_str, "%Y-%m-%d").date()
-            if expiry_date <= threshold:
-                days_left = (expiry_date - today).days
-                product["days_left"] = days_left
-                expiring.append(product)
-        except ValueError:
-            continue
+    result = {}
+    for expiry_date, product in get_store().expiring_products(threshold):
+        result.setdefault(product["user_id"], []).append(_expiring_product(product, expiry_date, today))
     
-    return sorted(expiring, key=lambda x: x["days_left"])
+    return result
 
 def add_to_shopping_list(user_id, item, quantity, unit, note=""):
     """Додає товар до списку покупок"""
-    ws = db.get_shopping_sheet()
     added_date = datetime.now().strftime("%Y-%m-%d")
     norm_qty, norm_unit = normalize_quantity_and_unit(quantity, unit)
     
-    new_row = [str(user_id), item, norm_qty, norm_unit, note, added_date]
-    ws.append_row(new_row)
+    get_store().add_shopping_item(user_id, item, norm_qty, norm_unit, note, added_date)
     return f"✅ Додав до списку покупок: {quantity}{unit} {item}"
 
 def get_shopping_list(user_id):
     """Повертає список покупок"""
-    ws = db.get_shopping_sheet()
-    data = ws.get_all_records()
-    
     result = []
-    for row in data:
-        if str(row.get("user_id", "")) == str(user_id):
-            result.append(row)
+    for row in get_store().list_shopping(user_id):
+        row = dict(row)
+        del row["id"]
+        result.append(row)
     
     return result
 
 def remove_from_shopping_list(user_id, item):
     """Видаляє товар зі списку покупок"""
-    ws = db.get_shopping_sheet()
-    data = ws.get_all_records()
-    
-    for idx, row in enumerate(data, start=2):
-        if str(row.get("user_id", "")) == str(user_id) and item.lower() in row.get("item", "").lower():
-            ws.delete_rows(idx)
+    store = get_store()
+    for row in store.list_shopping(user_id):
+        if item.lower() in row["item"].lower():
+            store.delete_shopping_item(row["id"])
             return f"✅ Видалив {item} зі списку покупок"
     
     return f"❌ Не знайшов {item} у списку покупок"
 
 def get_consumption_stats(user_id, days=7):
     """Статистика споживання за останні дні"""
-    logs_ws = db.get_logs_sheet()
-    data = logs_ws.get_all_records()
-    
-    cutoff_date = datetime.now() - timedelta(days=days)
-    stats = {"consumed": [], "added": []}
-    
-    for row in data:
-        if str(row.get("user_id", "")) != str(user_id):
-            continue
-            
-        try:
-            log_date = datetime.strptime(row.get("timestamp", ""), "%Y-%m-%d %H:%M:%S")
-            if log_date >= cutoff_date:
-                action = row.get("action", "")
-                product = row.get("product_name", "")
-                qty = row.get("delta_qty", 0)
-                
-                if action == "remove":
-                    stats["consumed"].append({"product": product, "quantity": abs(float(qty))})
-                elif action == "add":
-                    stats["added"].append({"product": product, "quantity": float(qty)})
-        except ValueError:
-            continue
-    
-    return stats
+    return get_store().consumption_stats(user_id, days)
+
+def compact_sheets():
+    """Прибирає видалені рядки з аркушів-дзеркал продуктів і покупок"""
+    store = get_store()
+    with sheets_client.priority(sheets_client.BACKGROUND):
+        return {
+            "products": store.compact_mirror("products"),
+            "shopping": store.compact_mirror("shopping"),
+        }
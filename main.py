@@ -1,10 +1,19 @@
 import os
+import re
+import asyncio
 import logging
+from datetime import date, datetime, time, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 from database import Database
-from nlp_processor import NLPProcessor
+from dish_resolver import DISH_REFRESH_SECONDS, DishResolver
+from nlp_processor import NLPProcessor, DEFAULT_SUGGESTIONS
 from recipe_manager import RecipeManager
+from nutrition import NutritionCalculator
+from meal_planner import MealPlanner, create_planner_pool, solve_meal_plan
+from reminders import ReminderScheduler
+from async_db import AsyncFacade, create_db_executor
+import kitchen_core
 
 # Налаштування логування
 logging.basicConfig(
@@ -13,15 +22,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class KitchenBot:
-    def __init__(self):
-        self.db = Database()
-        self.nlp = NLPProcessor()
-        self.recipe_manager = RecipeManager(self.db)
-        
-    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Команда /start"""
-        welcome_message = """
+WELCOME_MESSAGE = """
 🍳 **Привіт! Я твій кухонний помічник!**
 
 Я розумію звичайну мову, тому можеш писати мені як другу:
@@ -50,8 +51,109 @@ class KitchenBot:
 • "як краще готувати?"
 
 Просто пиши мені природною мовою! 😊
-        """
-        
+"""
+
+EXAMPLES_MESSAGE = """
+💡 **Приклади команд:**
+
+🔍 **Рецепти:**
+• "рецепт борщу"
+• "борщ на 8 порцій"
+• "що приготувати з курки"
+• "випадковий рецепт"
+
+🛒 **Продукти:**
+• "мої запаси"
+• "що є вдома"
+• "додай молоко 2 літри"
+
+🔄 **Заміни:**
+• "чим замінити молоко"
+• "немає цукру"
+
+📊 **Харчування:**
+• "калорії борщу"
+• "поживність м'яса"
+
+Пиши природною мовою! 😊
+"""
+
+# Кнопки популярних рецептів: (підпис, фраза, яку кнопка надсилає на розбір)
+RECIPE_SUGGESTIONS = [
+    ("🍲 Борщ", "рецепт борщу"),
+    ("🥟 Вареники", "рецепт вареників"),
+    ("🥗 Салат", "рецепт салату"),
+]
+
+# Фрази з кнопок і прикладів: їх розбір кешуємо ще до першого повідомлення
+WARMUP_PHRASES = tuple(dict.fromkeys(
+    [phrase for _, phrase in RECIPE_SUGGESTIONS]
+    + DEFAULT_SUGGESTIONS
+    + re.findall(r'• "([^"]+)"', WELCOME_MESSAGE + EXAMPLES_MESSAGE)
+))
+
+class KitchenBot:
+    def __init__(self):
+        self.db = Database()
+        # Назви страв для розбору повідомлень беремо з рецептів у базі
+        self.dish_resolver = DishResolver(self.db)
+        self.nlp = NLPProcessor(self.dish_resolver)
+        self.recipe_manager = RecipeManager(self.db)
+        self.nutrition = NutritionCalculator(self.db)
+        self.meal_planner = MealPlanner(self.db)
+        
+        # Запити до бази виконуються в пулі потоків, щоб не блокувати цикл подій
+        self.db_executor = create_db_executor()
+        self.async_db = AsyncFacade(self.db, self.db_executor)
+        self.async_recipes = AsyncFacade(self.recipe_manager, self.db_executor)
+        self.async_nutrition = AsyncFacade(self.nutrition, self.db_executor)
+        self.async_planner = AsyncFacade(self.meal_planner, self.db_executor)
+        # Розбір повідомлень шукає страви в індексі, який може саме оновлюватись
+        self.async_nlp = AsyncFacade(self.nlp, self.db_executor)
+        # Розв'язувач планів харчування працює в окремому процесі
+        self.planner_pool = create_planner_pool()
+        self.reminders = ReminderScheduler(self.db, self.db_executor)
+    
+    def shutdown(self):
+        """Звільняє пул потоків і з'єднання з базою"""
+        self.planner_pool.shutdown(wait=True)
+        self.db_executor.shutdown(wait=True)
+        self.db.close()
+        
+    async def refresh_dishes(self, context: ContextTypes.DEFAULT_TYPE):
+        """Періодично підтягує змінені рецепти в індекс назв страв і чистить журнал змін"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.db_executor, self.dish_resolver.refresh)
+        await loop.run_in_executor(self.db_executor, self.dish_resolver.prune)
+        
+    async def compact_sheets(self, context: ContextTypes.DEFAULT_TYPE):
+        """Щоденне стискання аркушів Google Sheets у тихі години"""
+        loop = asyncio.get_running_loop()
+        removed = await loop.run_in_executor(self.db_executor, kitchen_core.compact_sheets)
+        logger.info(f"Стискання аркушів: прибрано рядків {removed}")
+    
+    async def send_expiry_alerts(self, context: ContextTypes.DEFAULT_TYPE):
+        """Щоденне сповіщення: одне повідомлення на чат з усіма продуктами, що скоро зіпсуються"""
+        loop = asyncio.get_running_loop()
+        expiring = await loop.run_in_executor(self.db_executor, kitchen_core.get_all_expiring_products)
+        for user_id, products in expiring.items():
+            message = "⚠️ **Скоро зіпсуються:**\n"
+            for product in products:
+                days_left = product["days_left"]
+                if days_left < 0:
+                    when = "вже зіпсувався"
+                elif days_left == 0:
+                    when = "сьогодні"
+                else:
+                    when = f"через {days_left} дн."
+                message += f"• {product['product_name']} - {product['quantity']} {product['unit']} ({when})\n"
+            try:
+                await context.bot.send_message(int(user_id), message, parse_mode='Markdown')
+            except Exception as e:
+                logger.error(f"Не вдалося надіслати сповіщення користувачу {user_id}: {e}")
+    
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /start"""
         # Кнопки швидкого доступу
         keyboard = [
             [InlineKeyboardButton("🍲 Випадковий рецепт", callback_data="random_recipe")],
@@ -61,14 +163,43 @@ class KitchenBot:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(welcome_message, reply_markup=reply_markup, parse_mode='Markdown')
+        await update.message.reply_text(WELCOME_MESSAGE, reply_markup=reply_markup, parse_mode='Markdown')
+    
+    async def remind(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /remind [РРРР-ММ-ДД] ГГ:ХХ текст"""
+        args = context.args or []
+        due = None
+        text_start = 0
+        try:
+            if len(args) >= 2 and '-' in args[0]:
+                due = datetime.strptime(f"{args[0]} {args[1]}", "%Y-%m-%d %H:%M")
+                text_start = 2
+            elif args:
+                time_of_day = datetime.strptime(args[0], "%H:%M").time()
+                due = datetime.combine(date.today(), time_of_day)
+                if due <= datetime.now():
+                    due += timedelta(days=1)
+                text_start = 1
+        except ValueError:
+            due = None
+        
+        text = " ".join(args[text_start:])
+        if due is None or not text:
+            await update.message.reply_text(
+                "❓ Формат: /remind 18:00 дістати м'ясо з морозилки\n"
+                "або: /remind 2025-01-31 09:00 купити молоко"
+            )
+            return
+        
+        await self.reminders.schedule(update.effective_chat.id, text, due)
+        await update.message.reply_text(f"⏰ Нагадаю {due.strftime('%d.%m о %H:%M')}: {text}")
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обробка звичайних повідомлень"""
         user_message = update.message.text
         
         # Обробляємо повідомлення через NLP
-        processed = self.nlp.process_message(user_message)
+        processed = await self.async_nlp.process_message(user_message)
         intent = processed['intent']
         params = processed['parameters']
         
@@ -86,7 +217,7 @@ class KitchenBot:
         elif intent == 'inventory':
             await self.handle_inventory_request(update)
         elif intent == 'meal_plan':
-            await self.handle_meal_plan_request(update)
+            await self.handle_meal_plan_request(update, params)
         else:
             await self.handle_unknown_request(update, user_message)
     
@@ -99,7 +230,7 @@ class KitchenBot:
         
         if dish:
             # Шукаємо конкретну страву
-            recipe = self.recipe_manager.get_recipe_by_name(dish, servings)
+            recipe = await self.async_recipes.get_recipe_by_name(dish, servings)
             if recipe:
                 message = self.recipe_manager.format_recipe_message(recipe)
                 
@@ -114,7 +245,7 @@ class KitchenBot:
                 await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
             else:
                 # Пропонуємо схожі рецепти
-                similar_recipes = self.recipe_manager.find_recipes(dish)
+                similar_recipes = await self.async_recipes.find_recipes(dish)
                 if similar_recipes:
                     message = self.recipe_manager.format_recipe_list(similar_recipes, f"Схожі рецепти на '{dish}'")
                     await update.message.reply_text(message, parse_mode='Markdown')
@@ -123,7 +254,7 @@ class KitchenBot:
                     await self.send_recipe_suggestions(update)
         else:
             # Випадковий рецепт з фільтрами
-            recipe = self.recipe_manager.get_random_recipe(category, difficulty)
+            recipe = await self.async_recipes.get_random_recipe(category, difficulty)
             if recipe:
                 message = "🎲 **Випадковий рецепт для тебе:**\n\n"
                 message += self.recipe_manager.format_recipe_message(recipe)
@@ -136,7 +267,7 @@ class KitchenBot:
         ingredient = params.get('ingredient')
         
         if ingredient:
-            substitutions = self.db.get_substitutions(ingredient)
+            substitutions = await self.async_recipes.get_substitutions(ingredient)
             if substitutions:
                 message = f"🔄 **Чим можна замінити {ingredient}:**\n\n"
                 for i, (substitute, ratio, notes) in enumerate(substitutions, 1):
@@ -160,17 +291,34 @@ class KitchenBot:
         item = params.get('item')
         
         if item:
-            # Тут можна додати логіку для отримання харчової цінності
-            message = f"📊 **Харчова цінність {item} (на 100г):**\n\n"
-            message += "⚠️ Функція в розробці. Скоро буде доступна!"
+            # Спочатку шукаємо окремий інгредієнт, потім рецепт
+            values = await self.async_nutrition.get_ingredient_nutrition(item)
+            if values:
+                message = self.nutrition.format_ingredient_nutrition(item, values)
+            else:
+                recipe = await self.async_recipes.get_recipe_by_name(item)
+                nutrition = None
+                if recipe:
+                    nutrition = await self.async_nutrition.get_recipe_nutrition(recipe['id'])
+                if nutrition and nutrition['matched_ingredients']:
+                    message = self.nutrition.format_recipe_nutrition(recipe['name'], nutrition)
+                else:
+                    message = f"❌ Не знайшов даних про харчову цінність для '{item}'"
         else:
             message = "❓ Не зрозумів для якого продукту показати харчову цінність"
         
         await update.message.reply_text(message, parse_mode='Markdown')
     
+    async def get_user_products(self, user_id):
+        """Запаси користувача з того ж сховища, куди пише kitchen_core"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.db_executor, lambda: kitchen_core.get_store().list_products(user_id)
+        )
+    
     async def handle_inventory_request(self, update: Update):
         """Обробка запитів запасів"""
-        products = self.db.get_products()
+        products = await self.get_user_products(update.effective_user.id)
         
         if products:
             message = "🛒 **Твої запаси:**\n\n"
@@ -178,7 +326,7 @@ class KitchenBot:
             # Групуємо за категоріями
             categories = {}
             for product in products:
-                category = product[5] or 'інше'
+                category = product["category"] or 'інше'
                 if category not in categories:
                     categories[category] = []
                 categories[category].append(product)
@@ -198,7 +346,7 @@ class KitchenBot:
                 message += f"{emoji} **{category.title()}:**\n"
                 
                 for product in items:
-                    name, quantity, unit = product[1], product[2], product[3]
+                    name, quantity, unit = product["product_name"], product["quantity"], product["unit"]
                     if quantity > 0:
                         message += f"• {name} - {quantity} {unit}\n"
                     else:
@@ -221,14 +369,22 @@ class KitchenBot:
         
         await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
     
-    async def handle_meal_plan_request(self, update: Update):
+    async def handle_meal_plan_request(self, update: Update, params: dict):
         """Обробка запитів планування харчування"""
-        message = "📅 **Планування харчування**\n\n"
-        message += "⚠️ Функція в розробці. Скоро буде доступна!\n\n"
-        message += "Поки що можеш:\n"
-        message += "• Отримати випадковий рецепт\n"
-        message += "• Переглянути всі рецепти\n"
-        message += "• Перевірити свої запаси"
+        user_id = update.effective_user.id
+        start = date.today()
+        
+        inputs = await self.async_planner.load_inputs(user_id, params.get('category'), params.get('difficulty'))
+        loop = asyncio.get_running_loop()
+        plan = await loop.run_in_executor(
+            self.planner_pool, solve_meal_plan,
+            inputs['candidates'], inputs['stock'], inputs['expiring']
+        )
+        await self.async_planner.save_plan(user_id, start, plan)
+        
+        saved_plan = await self.async_planner.get_plan(user_id, start)
+        ingredients = await self.async_planner.get_week_ingredients(user_id, start)
+        message = self.meal_planner.format_plan(saved_plan, ingredients)
         
         keyboard = [
             [InlineKeyboardButton("🎲 Випадковий рецепт", callback_data="random_recipe")],
@@ -240,7 +396,7 @@ class KitchenBot:
     
     async def handle_unknown_request(self, update: Update, user_message: str):
         """Обробка незрозумілих запитів"""
-        suggestions = self.nlp.get_suggestions(user_message)
+        suggestions = await self.async_nlp.get_suggestions(user_message)
         
         message = "🤔 **Не зовсім зрозумів що ти хочеш**\n\n"
         message += "Можливо, ти мав на увазі:\n"
@@ -262,7 +418,7 @@ class KitchenBot:
         data = query.data
         
         if data == "random_recipe":
-            recipe = self.recipe_manager.get_random_recipe()
+            recipe = await self.async_recipes.get_random_recipe()
             if recipe:
                 message = "🎲 **Випадковий рецепт:**\n\n"
                 message += self.recipe_manager.format_recipe_message(recipe)
@@ -272,8 +428,9 @@ class KitchenBot:
             await self.handle_inventory_request_callback(query)
         
         elif data == "all_recipes":
-            recipes = self.recipe_manager.find_recipes("")
-            message = self.recipe_manager.format_recipe_list(recipes, "Всі доступні рецепти")
+            recipes = await self.async_recipes.find_recipes("", limit=5)
+            total = await self.async_recipes.count_recipes("")
+            message = self.recipe_manager.format_recipe_list(recipes, "Всі доступні рецепти", total)
             await query.edit_message_text(message, parse_mode='Markdown')
         
         elif data == "cooking_suggestions":
@@ -281,30 +438,17 @@ class KitchenBot:
         
         elif data.startswith("check_ingredients_"):
             recipe_id = int(data.split("_")[2])
-            recipe = self.db.get_recipe_by_id(recipe_id)
+            recipe = await self.async_recipes.get_recipe_by_id(recipe_id)
             if recipe:
-                recipe_dict = {
-                    'id': recipe[0], 'name': recipe[1], 'description': recipe[2],
-                    'instructions': recipe[3], 'prep_time': recipe[4], 'cook_time': recipe[5],
-                    'servings': recipe[6], 'difficulty': recipe[7], 'category': recipe[8]
-                }
-                ingredients = self.db.get_recipe_ingredients(recipe_id)
-                recipe_dict['ingredients'] = [
-                    {'name': ing[0], 'quantity': ing[1], 'unit': ing[2]} 
-                    for ing in ingredients
-                ]
-                message = self.recipe_manager.format_ingredient_check(recipe_dict)
+                products = await self.get_user_products(query.from_user.id)
+                message = await self.async_recipes.format_ingredient_check(recipe, products)
                 await query.edit_message_text(message, parse_mode='Markdown')
         
         elif data.startswith("cooking_tips_"):
             recipe_id = int(data.split("_")[2])
-            recipe = self.db.get_recipe_by_id(recipe_id)
+            recipe = await self.async_recipes.get_recipe_by_id(recipe_id)
             if recipe:
-                recipe_dict = {
-                    'name': recipe[1], 'difficulty': recipe[7], 'category': recipe[8],
-                    'prep_time': recipe[4], 'cook_time': recipe[5]
-                }
-                message = self.recipe_manager.get_cooking_tips(recipe_dict)
+                message = self.recipe_manager.get_cooking_tips(recipe)
                 await query.edit_message_text(message, parse_mode='Markdown')
         
         elif data == "show_examples":
@@ -313,18 +457,18 @@ class KitchenBot:
         elif data.startswith("suggest_"):
             suggestion = data[8:]  # Прибираємо "suggest_"
             # Обробляємо пропозицію як звичайне повідомлення
-            processed = self.nlp.process_message(suggestion)
+            processed = await self.async_nlp.process_message(suggestion)
             # Тут можна додати логіку обробки пропозиції
             await query.edit_message_text(f"Обробляю: {suggestion}")
     
     async def handle_inventory_request_callback(self, query):
         """Обробка запиту запасів через callback"""
-        products = self.db.get_products()
+        products = await self.get_user_products(query.from_user.id)
         
         if products:
             message = "🛒 **Твої запаси:**\n\n"
             for product in products[:10]:  # Показуємо перші 10
-                name, quantity, unit = product[1], product[2], product[3]
+                name, quantity, unit = product["product_name"], product["quantity"], product["unit"]
                 if quantity > 0:
                     message += f"• {name} - {quantity} {unit}\n"
                 else:
@@ -340,11 +484,10 @@ class KitchenBot:
     async def send_recipe_suggestions(self, update: Update):
         """Відправляє пропозиції рецептів"""
         keyboard = [
-            [InlineKeyboardButton("🍲 Борщ", callback_data="suggest_рецепт борщу")],
-            [InlineKeyboardButton("🥟 Вареники", callback_data="suggest_рецепт вареників")],
-            [InlineKeyboardButton("🥗 Салат", callback_data="suggest_рецепт салату")],
-            [InlineKeyboardButton("🎲 Випадковий", callback_data="random_recipe")]
+            [InlineKeyboardButton(label, callback_data=f"suggest_{phrase}")]
+            for label, phrase in RECIPE_SUGGESTIONS
         ]
+        keyboard.append([InlineKeyboardButton("🎲 Випадковий", callback_data="random_recipe")])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await update.message.reply_text(
@@ -367,30 +510,7 @@ class KitchenBot:
     
     async def send_examples(self, query):
         """Відправляє приклади команд"""
-        message = """
-💡 **Приклади команд:**
-
-🔍 **Рецепти:**
-• "рецепт борщу"
-• "борщ на 8 порцій"
-• "що приготувати з курки"
-• "випадковий рецепт"
-
-🛒 **Продукти:**
-• "мої запаси"
-• "що є вдома"
-• "додай молоко 2 літри"
-
-🔄 **Заміни:**
-• "чим замінити молоко"
-• "немає цукру"
-
-📊 **Харчування:**
-• "калорії борщу"
-• "поживність м'яса"
-
-Пиши природною мовою! 😊
-        """
+        message = EXAMPLES_MESSAGE
         
         await query.edit_message_text(message, parse_mode='Markdown')
     
@@ -414,11 +534,34 @@ def main():
     # Створюємо бота
     bot = KitchenBot()
     
+    async def post_init(application: Application):
+        # Запускаємо планувальник нагадувань
+        await bot.reminders.start(application.job_queue)
+        # Індекс назв страв будуємо до першого повідомлення, далі його оновлює фонове завдання
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(bot.db_executor, bot.dish_resolver.refresh)
+        application.job_queue.run_repeating(
+            bot.refresh_dishes, DISH_REFRESH_SECONDS, first=DISH_REFRESH_SECONDS, name='refresh_dishes'
+        )
+        # Фрази з кнопок і прикладів розбираємо заздалегідь
+        warmed = await loop.run_in_executor(bot.db_executor, bot.nlp.warm_up, WARMUP_PHRASES)
+        logger.info("Кеш розбору повідомлень: %d фраз заздалегідь", warmed)
+        # Терміни придатності зберігаються в SQLite, тож сповіщення не залежать від Google Sheets
+        application.job_queue.run_daily(
+            bot.send_expiry_alerts, time(hour=kitchen_core.EXPIRY_ALERT_HOUR), name='expiry_alerts'
+        )
+        # Видалені рядки аркушів прибираємо раз на добу
+        if kitchen_core.is_sheets_configured():
+            application.job_queue.run_daily(
+                bot.compact_sheets, time(hour=kitchen_core.SHEETS_COMPACT_HOUR), name='compact_sheets'
+            )
+    
     # Створюємо додаток
-    application = Application.builder().token(TOKEN).build()
+    application = Application.builder().token(TOKEN).post_init(post_init).build()
     
     # Додаємо обробники
     application.add_handler(CommandHandler("start", bot.start))
+    application.add_handler(CommandHandler("remind", bot.remind))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
     application.add_handler(CallbackQueryHandler(bot.handle_callback))
     
@@ -428,6 +571,7 @@ def main():
     # Запускаємо бота
     print("🤖 Кухонний бот запущено!")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
+    bot.shutdown()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,223 @@
+import json
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import ua_stemmer
+from database import Database
+
+PLAN_DAYS = 7
+DEFAULT_MEAL_TYPES = ('обід', 'вечеря')
+# Скільки найкращих за запасами рецептів передаємо розв'язувачу
+CANDIDATE_LIMIT = 200
+# Продукти, що псуються в ці дні, отримують пріоритет
+EXPIRY_HORIZON_DAYS = 5
+REPEAT_PENALTY = 0.6
+
+
+def create_planner_pool(max_workers: int = 1) -> ProcessPoolExecutor:
+    """Пул процесів для розв'язувача планів, щоб не блокувати цикл подій бота"""
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def solve_meal_plan(candidates: Sequence[Tuple[int, Tuple[str, ...]]],
+                    stock: Sequence[str],
+                    expiring: Dict[str, int],
+                    days: int = PLAN_DAYS,
+                    meal_types: Sequence[str] = DEFAULT_MEAL_TYPES,
+                    seed: Optional[int] = None) -> List[Tuple[int, str, int]]:
+    """Жадібно обирає рецепти, що найкраще використовують запаси та продукти, які псуються
+
+    Повертає список (номер дня, прийом їжі, recipe_id). Функція чиста і
+    серіалізовна, тому виконується в окремому процесі.
+    """
+    rng = random.Random(seed)
+    stock = set(stock)
+    # Бонус за продукт, що псується, тим більший, чим менше днів лишилось
+    expiry_bonus = {name: 1.0 / (1 + max(days_left, 0)) for name, days_left in expiring.items()}
+    ingredients_by_id = dict(candidates)
+    used = Counter()
+    plan = []
+
+    for day in range(days):
+        for meal_type in meal_types:
+            best_id = None
+            best_score = None
+            for recipe_id, ingredients in candidates:
+                if ingredients:
+                    coverage = sum(1 for name in ingredients if name in stock) / len(ingredients)
+                else:
+                    coverage = 0.0
+                bonus = sum(expiry_bonus.get(name, 0.0) for name in set(ingredients))
+                score = coverage + bonus - REPEAT_PENALTY * used[recipe_id] + rng.random() * 0.01
+                if best_score is None or score > best_score:
+                    best_id, best_score = recipe_id, score
+            if best_id is None:
+                return plan
+
+            plan.append((day, meal_type, best_id))
+            used[best_id] += 1
+            # Продукт, що псується, вже використано - далі він не дає бонусу
+            for name in ingredients_by_id[best_id]:
+                expiry_bonus.pop(name, None)
+
+    return plan
+
+
+class MealPlanner:
+    """Тижневий план харчування на основі запасів і таблиці meal_plans
+
+    Продукти й інгредієнти зіставляються за нормальними формами назв
+    (ua_stemmer.lemma): «Морква» в рецепті і «моркви» в запасах - один продукт.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def _stock(self, user_id: int) -> Dict[str, Tuple[float, Optional[str]]]:
+        """Запаси користувача за нормальною формою назви: {лема: (кількість, найближчий термін)}"""
+        stock = {}
+        for name, quantity, expiry_date in self.db.get_connection().execute('''
+            SELECT name_norm, SUM(quantity), MIN(NULLIF(expiry_date, ''))
+            FROM products
+            WHERE user_id = ?
+            GROUP BY name_norm
+        ''', (str(user_id),)):
+            key = ua_stemmer.lemma(name)
+            total, earliest = stock.get(key, (0.0, None))
+            if expiry_date and (earliest is None or expiry_date < earliest):
+                earliest = expiry_date
+            stock[key] = (total + (quantity or 0), earliest)
+        return stock
+
+    def load_inputs(self, user_id: int, category: Optional[str] = None, difficulty: Optional[str] = None,
+                    limit: int = CANDIDATE_LIMIT) -> Dict:
+        """Дані для розв'язувача: рецепти-кандидати, запаси користувача та його продукти, що псуються"""
+        conn = self.db.get_connection()
+        stock = self._stock(user_id)
+        in_stock = [name for name, (quantity, _) in stock.items() if quantity > 0]
+
+        conditions = []
+        args = []
+        if category:
+            conditions.append('r.category = ?')
+            args.append(category)
+        if difficulty:
+            conditions.append('r.difficulty = ?')
+            args.append(difficulty)
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+        # Кандидатів ранжуємо за кількістю інгредієнтів у запасах користувача одним запитом
+        rows = conn.execute(f'''
+            WITH stock (lemma) AS (SELECT value FROM json_each(?))
+            SELECT r.id
+            FROM recipes r
+            LEFT JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+            LEFT JOIN stock p ON p.lemma = ri.ingredient_lemma
+            {where}
+            GROUP BY r.id
+            ORDER BY COUNT(p.lemma) DESC, RANDOM()
+            LIMIT ?
+        ''', [json.dumps(in_stock)] + args + [limit]).fetchall()
+
+        candidates = [
+            (recipe[0], tuple(ua_stemmer.lemma(name) for name, _, _ in ingredients))
+            for recipe, ingredients in self.db.get_recipes_with_ingredients(
+                recipe_ids=[row[0] for row in rows]
+            )
+        ]
+
+        expiring = {}
+        today = date.today()
+        for name, (_, expiry_date) in stock.items():
+            if expiry_date:
+                try:
+                    days_left = (datetime.strptime(expiry_date, '%Y-%m-%d').date() - today).days
+                except ValueError:
+                    continue
+                if days_left <= EXPIRY_HORIZON_DAYS:
+                    expiring[name] = days_left
+
+        return {'candidates': candidates, 'stock': in_stock, 'expiring': expiring}
+
+    def save_plan(self, user_id: int, start: date, plan: List[Tuple[int, str, int]]):
+        """Замінює план користувача на тиждень однією транзакцією"""
+        end = start + timedelta(days=PLAN_DAYS - 1)
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute(
+                'DELETE FROM meal_plans WHERE user_id = ? AND date BETWEEN ? AND ?',
+                (user_id, start.isoformat(), end.isoformat())
+            )
+            cursor.executemany('''
+                INSERT INTO meal_plans (user_id, date, meal_type, recipe_id, servings)
+                SELECT ?, ?, ?, id, servings FROM recipes WHERE id = ?
+            ''', [
+                (user_id, (start + timedelta(days=day)).isoformat(), meal_type, recipe_id)
+                for day, meal_type, recipe_id in plan
+            ])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_plan(self, user_id: int, start: date) -> List[Tuple]:
+        """План на тиждень: (дата, прийом їжі, назва рецепта, порції)"""
+        end = start + timedelta(days=PLAN_DAYS - 1)
+        return self.db.get_connection().execute('''
+            SELECT mp.date, mp.meal_type, r.name, mp.servings
+            FROM meal_plans mp
+            JOIN recipes r ON r.id = mp.recipe_id
+            WHERE mp.user_id = ? AND mp.date BETWEEN ? AND ?
+            ORDER BY mp.date, mp.id
+        ''', (user_id, start.isoformat(), end.isoformat())).fetchall()
+
+    def get_week_ingredients(self, user_id: int, start: date) -> List[Tuple]:
+        """Сумарні інгредієнти на тиждень одним запитом: (назва, одиниця, кількість, скільки є в запасах)"""
+        end = start + timedelta(days=PLAN_DAYS - 1)
+        # Запаси лише цього користувача, по одному рядку на лему, щоб з'єднання не множило суми
+        stock = [[name, quantity] for name, (quantity, _) in self._stock(user_id).items()]
+        return self.db.get_connection().execute('''
+            WITH stock (lemma, quantity) AS (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+            )
+            SELECT ri.ingredient_name,
+                   ri.unit,
+                   SUM(ri.quantity * mp.servings * 1.0 / MAX(r.servings, 1)) AS total,
+                   MAX(p.quantity) AS in_stock
+            FROM meal_plans mp
+            JOIN recipes r ON r.id = mp.recipe_id
+            JOIN recipe_ingredients ri ON ri.recipe_id = mp.recipe_id
+            LEFT JOIN stock p ON p.lemma = ri.ingredient_lemma
+            WHERE mp.user_id = ? AND mp.date BETWEEN ? AND ?
+            GROUP BY ri.ingredient_name, ri.unit
+            ORDER BY ri.ingredient_name
+        ''', (json.dumps(stock), user_id, start.isoformat(), end.isoformat())).fetchall()
+
+    def format_plan(self, plan: List[Tuple], ingredients: List[Tuple]) -> str:
+        """Форматує план і список інгредієнтів на тиждень"""
+        if not plan:
+            return "❌ Не вдалося скласти план: немає підходящих рецептів"
+
+        message = "📅 **План харчування на тиждень:**\n"
+        current_date = None
+        for plan_date, meal_type, recipe_name, _ in plan:
+            if plan_date != current_date:
+                current_date = plan_date
+                message += f"\n🗓️ **{datetime.strptime(plan_date, '%Y-%m-%d').strftime('%d.%m')}**\n"
+            message += f"• {meal_type}: {recipe_name}\n"
+
+        if ingredients:
+            message += "\n🛒 **Інгредієнти на тиждень:**\n"
+            for name, unit, total, in_stock in ingredients:
+                total = round(total, 2)
+                if total == int(total):
+                    total = int(total)
+                mark = "✅" if in_stock else "❌"
+                message += f"{mark} {name} - {total} {unit}\n"
+
+        return message
@@ -0,0 +1,621 @@
+"""Версійні міграції схеми SQLite (версія зберігається в PRAGMA user_version)"""
+import re
+
+import ua_stemmer
+
+
+def _create_base_tables(cursor):
+    """Базові таблиці бота"""
+    # Таблиця продуктів
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            quantity REAL DEFAULT 0,
+            unit TEXT DEFAULT 'шт',
+            expiry_date TEXT,
+            category TEXT DEFAULT 'інше',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Таблиця рецептів
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            instructions TEXT NOT NULL,
+            prep_time INTEGER DEFAULT 0,
+            cook_time INTEGER DEFAULT 0,
+            servings INTEGER DEFAULT 1,
+            difficulty TEXT DEFAULT 'легко',
+            category TEXT DEFAULT 'основні страви',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Таблиця інгредієнтів для рецептів
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER,
+            ingredient_name TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit TEXT NOT NULL,
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        )
+    ''')
+
+    # Таблиця замін інгредієнтів
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS substitutions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_ingredient TEXT NOT NULL,
+            substitute TEXT NOT NULL,
+            ratio REAL DEFAULT 1.0,
+            notes TEXT
+        )
+    ''')
+
+    # Таблиця планів харчування
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meal_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            meal_type TEXT NOT NULL,
+            recipe_id INTEGER,
+            servings INTEGER DEFAULT 1,
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        )
+    ''')
+
+    # Таблиця нагадувань
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message TEXT NOT NULL,
+            reminder_date TEXT NOT NULL,
+            is_completed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Таблиця харчової цінності
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS nutrition (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ingredient_name TEXT NOT NULL UNIQUE,
+            calories_per_100g REAL DEFAULT 0,
+            protein_per_100g REAL DEFAULT 0,
+            carbs_per_100g REAL DEFAULT 0,
+            fat_per_100g REAL DEFAULT 0,
+            fiber_per_100g REAL DEFAULT 0
+        )
+    ''')
+
+
+def _fts_text(expr):
+    """SQL-вираз, що зводить усі види апострофа до українського ʼ"""
+    return f"replace(replace(replace({expr}, '''', 'ʼ'), '’', 'ʼ'), '`', 'ʼ')"
+
+
+# Повнотекстовий індекс рецептів (rowid = recipes.id)
+FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        name, category, description, instructions, ingredients,
+        tokenize = 'unicode61 remove_diacritics 0'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts (rowid, name, category, description, instructions, ingredients)
+        VALUES (new.id, {_fts_text('new.name')}, {_fts_text('new.category')},
+                {_fts_text('new.description')}, {_fts_text('new.instructions')}, '');
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE ON recipes BEGIN
+        UPDATE recipes_fts SET
+            name = {_fts_text('new.name')},
+            category = {_fts_text('new.category')},
+            description = {_fts_text('new.description')},
+            instructions = {_fts_text('new.instructions')}
+        WHERE rowid = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipes_fts WHERE rowid = old.id;
+    END
+    ''',
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS recipe_ingredients_fts_{suffix} AFTER {event} ON recipe_ingredients BEGIN
+        UPDATE recipes_fts SET ingredients = (
+            SELECT {_fts_text("coalesce(group_concat(ingredient_name, ' '), '')")}
+            FROM recipe_ingredients WHERE recipe_id = {row}.recipe_id
+        ) WHERE rowid = {row}.recipe_id;
+    END
+    '''
+    for suffix, event, row in (('ai', 'INSERT', 'new'), ('au', 'UPDATE', 'new'), ('ad', 'DELETE', 'old'))
+]
+
+FTS_REBUILD = [
+    'DELETE FROM recipes_fts',
+    f'''
+    INSERT INTO recipes_fts (rowid, name, category, description, instructions, ingredients)
+    SELECT r.id, {_fts_text('r.name')}, {_fts_text('r.category')},
+           {_fts_text('r.description')}, {_fts_text('r.instructions')},
+           {_fts_text("coalesce((SELECT group_concat(ingredient_name, ' ') FROM recipe_ingredients ri WHERE ri.recipe_id = r.id), '')")}
+    FROM recipes r
+    ''',
+]
+
+
+
+def _create_search_index(cursor):
+    """Повнотекстовий пошук по рецептах"""
+    for statement in FTS_SCHEMA:
+        cursor.execute(statement)
+    for statement in FTS_REBUILD:
+        cursor.execute(statement)
+
+
+# Вторинні індекси для частих вибірок
+BASE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe_id ON recipe_ingredients (recipe_id)',
+    'CREATE INDEX IF NOT EXISTS idx_substitutions_original ON substitutions (original_ingredient)',
+    'CREATE INDEX IF NOT EXISTS idx_meal_plans_date ON meal_plans (date)',
+    'CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (is_completed, reminder_date)',
+    'CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes (category, difficulty)',
+]
+NUTRITION_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_name ON recipe_ingredients (ingredient_name)',
+]
+MEAL_PLAN_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_meal_plans_user_date ON meal_plans (user_id, date)',
+]
+INVENTORY_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_products_user_name ON products (user_id, name_norm)',
+    'CREATE INDEX IF NOT EXISTS idx_products_user_expiry ON products (user_id, expiry_date)',
+    'CREATE INDEX IF NOT EXISTS idx_products_expiry ON products (expiry_date)',
+    'CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)',
+    'CREATE INDEX IF NOT EXISTS idx_shopping_items_user ON shopping_items (user_id)',
+]
+DISH_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_recipe_aliases_recipe ON recipe_aliases (recipe_id)',
+]
+LEMMA_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_recipes_name_lemma ON recipes (name_lemma)',
+    'CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_lemma ON recipe_ingredients (ingredient_lemma)',
+    'CREATE INDEX IF NOT EXISTS idx_substitutions_lemma ON substitutions (original_lemma)',
+    'CREATE INDEX IF NOT EXISTS idx_nutrition_lemma ON nutrition (ingredient_lemma)',
+]
+INDEXES = (BASE_INDEXES + NUTRITION_INDEXES + MEAL_PLAN_INDEXES + INVENTORY_INDEXES
+           + DISH_INDEXES + LEMMA_INDEXES)
+
+
+def _execute_all(cursor, statements):
+    for statement in statements:
+        cursor.execute(statement)
+
+
+def _create_indexes(cursor):
+    """Індекси для зовнішніх ключів і фільтрів"""
+    _execute_all(cursor, BASE_INDEXES)
+
+
+def _create_import_progress(cursor):
+    """Стан потокового імпорту, щоб продовжити після збою"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            records INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+# Вага одиниць виміру в грамах (для штучних одиниць - типова)
+UNIT_WEIGHTS = [
+    ('г', 1), ('гр', 1), ('кг', 1000), ('мл', 1), ('л', 1000),
+    ('ст.л.', 15), ('ч.л.', 5), ('склянка', 200), ('зубчики', 5), ('зубчик', 5),
+    ('шт', 100),
+]
+
+# Вага одиниці для конкретного інгредієнта, якщо вона відрізняється від типової
+INGREDIENT_WEIGHTS = [
+    ('буряк', 'шт', 250), ('морква', 'шт', 80), ('цибуля', 'шт', 90),
+    ('картопля', 'шт', 100), ('яйце', 'шт', 55), ('яйця', 'шт', 55),
+    ('часник', 'зубчики', 5), ('томатна паста', 'ст.л.', 25),
+    ('цукор', 'ст.л.', 20), ('борошно', 'ст.л.', 10), ('олія', 'ст.л.', 17),
+]
+
+
+NUTRITION_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS recipe_ingredients_nutrition_{suffix} AFTER {event} ON recipe_ingredients BEGIN
+        INSERT OR IGNORE INTO recipe_nutrition_dirty (recipe_id) VALUES ({row}.recipe_id);
+    END
+    '''
+    for suffix, event, row in (('ai', 'INSERT', 'new'), ('au', 'UPDATE', 'new'), ('ad', 'DELETE', 'old'))
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {table}_nutrition_{suffix} AFTER {event} ON {table} BEGIN
+        INSERT OR IGNORE INTO recipe_nutrition_dirty (recipe_id)
+        SELECT DISTINCT recipe_id FROM recipe_ingredients
+        WHERE ingredient_name = {row}.ingredient_name AND recipe_id IS NOT NULL;
+    END
+    '''
+    for table in ('nutrition', 'ingredient_weights')
+    for suffix, event, row in (('ai', 'INSERT', 'new'), ('au', 'UPDATE', 'new'), ('ad', 'DELETE', 'old'))
+] + [
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_nutrition_ai AFTER INSERT ON recipes BEGIN
+        INSERT OR IGNORE INTO recipe_nutrition_dirty (recipe_id) VALUES (new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_nutrition_au AFTER UPDATE OF servings ON recipes BEGIN
+        INSERT OR IGNORE INTO recipe_nutrition_dirty (recipe_id) VALUES (new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_nutrition_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipe_nutrition WHERE recipe_id = old.id;
+        DELETE FROM recipe_nutrition_dirty WHERE recipe_id = old.id;
+    END
+    ''',
+]
+
+
+def _create_nutrition_totals(cursor):
+    """Ваги одиниць і збережені підсумки харчової цінності рецептів"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS unit_weights (
+            unit TEXT PRIMARY KEY,
+            grams REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingredient_weights (
+            ingredient_name TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            grams REAL NOT NULL,
+            PRIMARY KEY (ingredient_name, unit)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_nutrition (
+            recipe_id INTEGER PRIMARY KEY,
+            servings INTEGER NOT NULL DEFAULT 1,
+            calories REAL NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            carbs REAL NOT NULL DEFAULT 0,
+            fat REAL NOT NULL DEFAULT 0,
+            fiber REAL NOT NULL DEFAULT 0,
+            matched_ingredients INTEGER NOT NULL DEFAULT 0,
+            total_ingredients INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Рецепти, чиї підсумки треба перерахувати
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_nutrition_dirty (
+            recipe_id INTEGER PRIMARY KEY
+        )
+    ''')
+    cursor.executemany('INSERT OR IGNORE INTO unit_weights (unit, grams) VALUES (?, ?)', UNIT_WEIGHTS)
+    cursor.executemany(
+        'INSERT OR IGNORE INTO ingredient_weights (ingredient_name, unit, grams) VALUES (?, ?, ?)',
+        INGREDIENT_WEIGHTS
+    )
+    _execute_all(cursor, NUTRITION_INDEXES)
+    for statement in NUTRITION_TRIGGERS:
+        cursor.execute(statement)
+    cursor.execute('INSERT OR IGNORE INTO recipe_nutrition_dirty (recipe_id) SELECT id FROM recipes')
+
+
+def _add_meal_plan_owner(cursor):
+    """Плани харчування належать конкретному користувачу"""
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(meal_plans)')]
+    if 'user_id' not in columns:
+        cursor.execute('ALTER TABLE meal_plans ADD COLUMN user_id INTEGER')
+    _execute_all(cursor, MEAL_PLAN_INDEXES)
+
+
+def _add_reminder_chat(cursor):
+    """Нагадування надсилаються в конкретний чат"""
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(reminders)')]
+    if 'chat_id' not in columns:
+        cursor.execute('ALTER TABLE reminders ADD COLUMN chat_id INTEGER')
+
+
+def _create_consumption_daily(cursor):
+    """Денні суми доданого і спожитого по користувачу та продукту"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS consumption_daily (
+            user_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            added REAL NOT NULL DEFAULT 0,
+            consumed REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, product_name)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _create_sheet_journal(cursor):
+    """Журнал змін аркушів Google Sheets, які ще не записано"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sheet_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sheet TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_number INTEGER,
+            col INTEGER,
+            payload TEXT NOT NULL,
+            sent INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _create_inventory_store(cursor):
+    """Запаси користувачів і список покупок у SQLite; Google Sheets - лише дзеркало"""
+    # Перебудовуємо products: унікальність назви тепер у межах користувача,
+    # тож обмеження UNIQUE(name) треба прибрати. Порядок перших колонок
+    # лишається тим самим для SELECT *
+    cursor.execute('''
+        CREATE TABLE products_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            quantity REAL DEFAULT 0,
+            unit TEXT DEFAULT 'шт',
+            expiry_date TEXT,
+            category TEXT DEFAULT 'інше',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id TEXT NOT NULL DEFAULT '',
+            name_norm TEXT NOT NULL DEFAULT '',
+            added_date TEXT,
+            sheet_row INTEGER
+        )
+    ''')
+    # database імпортує migrations, тому функцію беремо тут, коли обидва модулі вже завантажені
+    from database import normalize_product_name
+    rows = cursor.execute(
+        'SELECT id, name, quantity, unit, expiry_date, category, created_at FROM products'
+    ).fetchall()
+    cursor.executemany('''
+        INSERT INTO products_new (id, name, quantity, unit, expiry_date, category, created_at,
+                                  name_norm, added_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [row + (normalize_product_name(row[1]), str(row[6] or '')[:10]) for row in rows])
+    cursor.execute('DROP TABLE products')
+    cursor.execute('ALTER TABLE products_new RENAME TO products')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shopping_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            item TEXT NOT NULL,
+            quantity REAL DEFAULT 0,
+            unit TEXT DEFAULT 'шт',
+            note TEXT DEFAULT '',
+            added_date TEXT,
+            sheet_row INTEGER
+        )
+    ''')
+
+    # Наступний вільний рядок кожного аркуша-дзеркала
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sheet_mirror (
+            sheet TEXT PRIMARY KEY,
+            next_row INTEGER NOT NULL
+        )
+    ''')
+    _execute_all(cursor, INVENTORY_INDEXES)
+
+
+# Журнал змінених рецептів для інкрементального оновлення індексу назв страв
+DISH_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_dishes_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipe_changes (recipe_id) VALUES (new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_dishes_au AFTER UPDATE OF name ON recipes BEGIN
+        INSERT INTO recipe_changes (recipe_id) VALUES (new.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_dishes_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipe_aliases WHERE recipe_id = old.id;
+        INSERT INTO recipe_changes (recipe_id) VALUES (old.id);
+    END
+    ''',
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS recipe_aliases_dishes_{suffix} AFTER {event} ON recipe_aliases BEGIN
+        INSERT INTO recipe_changes (recipe_id) VALUES ({row}.recipe_id);
+    END
+    '''
+    for suffix, event, row in (('ai', 'INSERT', 'new'), ('au', 'UPDATE', 'new'), ('ad', 'DELETE', 'old'))
+]
+
+
+def _create_dish_index(cursor):
+    """Альтернативні назви страв і журнал змін для нечіткого пошуку страв"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_aliases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL,
+            alias TEXT NOT NULL,
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER NOT NULL
+        )
+    ''')
+    _execute_all(cursor, DISH_TRIGGERS)
+    _execute_all(cursor, DISH_INDEXES)
+
+
+# Нормальні форми назв: (таблиця, колонка назви, колонка нормальної форми)
+LEMMA_COLUMNS = [
+    ('recipes', 'name', 'name_lemma'),
+    ('recipe_ingredients', 'ingredient_name', 'ingredient_lemma'),
+    ('substitutions', 'original_ingredient', 'original_lemma'),
+    ('nutrition', 'ingredient_name', 'ingredient_lemma'),
+]
+
+def _set_lemmas(cursor, missing_only=False):
+    """Обчислює нормальні форми назв; missing_only - лише там, де їх ще немає"""
+    changed = 0
+    for table, column, lemma_column in LEMMA_COLUMNS:
+        where = f' WHERE {lemma_column} IS NULL' if missing_only else ''
+        rows = cursor.execute(f'SELECT id, {column} FROM {table}{where}').fetchall()
+        if not rows:
+            # Порожній executemany все одно відкрив би транзакцію, яку ніхто не завершить
+            continue
+        cursor.executemany(
+            f'UPDATE {table} SET {lemma_column} = ? WHERE id = ?',
+            [(ua_stemmer.lemma(name), row_id) for row_id, name in rows]
+        )
+        changed += len(rows)
+    return changed
+
+
+def _add_lemma_columns(cursor):
+    """Нормальні форми назв для точного пошуку по індексу замість LIKE"""
+    for table, column, lemma_column in LEMMA_COLUMNS:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {lemma_column} TEXT')
+    _set_lemmas(cursor)
+    _execute_all(cursor, LEMMA_INDEXES)
+
+
+def fill_missing_lemmas(conn):
+    """Дописує нормальні форми рядкам, вставленим без них; повертає кількість рядків"""
+    changed = _set_lemmas(conn.cursor(), missing_only=True)
+    if changed:
+        conn.commit()
+    return changed
+
+
+def _object_name(statement):
+    return re.search(r'IF NOT EXISTS (\w+)', statement).group(1)
+
+
+def suspend_search_index(cursor):
+    """Вимикає тригери FTS на час масового імпорту"""
+    for statement in FTS_SCHEMA[1:]:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {_object_name(statement)}')
+
+
+def restore_search_index(cursor):
+    """Повертає тригери FTS і перебудовує індекс одним проходом"""
+    for statement in FTS_SCHEMA:
+        cursor.execute(statement)
+    for statement in FTS_REBUILD:
+        cursor.execute(statement)
+
+
+# Позначка в import_progress: індекси цього типу даних вимкнено на час імпорту
+SUSPENDED_INDEXES = 'indexes_suspended:'
+
+
+def mark_indexes_suspended(cursor, kind, suspended=True):
+    """Ставить або знімає позначку в тій самій транзакції, що прибирає чи повертає індекси"""
+    if suspended:
+        cursor.execute('''
+            INSERT OR REPLACE INTO import_progress (source, records, completed, updated_at)
+            VALUES (?, 0, 0, CURRENT_TIMESTAMP)
+        ''', (SUSPENDED_INDEXES + kind,))
+    else:
+        cursor.execute('DELETE FROM import_progress WHERE source = ?', (SUSPENDED_INDEXES + kind,))
+
+
+def restore_suspended_indexes(conn):
+    """Повертає індекси й тригери FTS, що лишились вимкненими після перерваного імпорту
+
+    Повертає типи даних, для яких їх відновлено.
+    """
+    kinds = [source[len(SUSPENDED_INDEXES):] for (source,) in conn.execute(
+        'SELECT source FROM import_progress WHERE source LIKE ?', (SUSPENDED_INDEXES + '%',)
+    )]
+    if not kinds:
+        return kinds
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        create_indexes(cursor)
+        if 'recipes' in kinds:
+            restore_search_index(cursor)
+        for kind in kinds:
+            mark_indexes_suspended(cursor, kind, suspended=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return kinds
+
+
+def drop_indexes(cursor, table):
+    """Прибирає вторинні індекси таблиці перед масовою вставкою"""
+    for statement in INDEXES:
+        if f' ON {table} ' in statement:
+            cursor.execute(f'DROP INDEX IF EXISTS {_object_name(statement)}')
+
+
+def create_indexes(cursor):
+    """Створює відсутні вторинні індекси"""
+    _execute_all(cursor, INDEXES)
+
+
+# Кроки міграції по порядку; версія схеми = кількість застосованих кроків.
+# Нові кроки додаються лише в кінець списку.
+MIGRATIONS = [
+    _create_base_tables,
+    _create_search_index,
+    _create_indexes,
+    _create_import_progress,
+    _create_nutrition_totals,
+    _add_meal_plan_owner,
+    _add_reminder_chat,
+    _create_consumption_daily,
+    _create_sheet_journal,
+    _create_inventory_store,
+    _create_dish_index,
+    _add_lemma_columns,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Застосовує відсутні міграції, повертає True якщо схема змінилась"""
+    version = get_version(conn)
+    if version >= SCHEMA_VERSION:
+        return False
+    
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            step(cursor)
+            cursor.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return True
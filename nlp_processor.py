@@ -1,8 +1,60 @@
+import os
 import re
-from typing import Dict, List, Tuple, Optional
+import threading
+from typing import Dict, Iterable, List, Tuple, Optional
+
+from cache import LRUCache
+from dish_resolver import DishResolver, TrigramIndex, dish_keys
+from intent_classifier import INTENT_MODEL_PATH, load_model
+from keyword_matcher import KeywordMatcher, Match
+
+# Порядок перевірки намірів: якщо збіглися ключові слова кількох, перемагає раніший
+INTENT_PRIORITY = ('recipe', 'ingredients', 'substitution', 'nutrition', 'inventory', 'meal_plan')
+DISH_LABEL = 'dish'
+# Слова запиту коротші за це не шукаються окремо серед назв страв
+MIN_DISH_WORD = 3
+# Українське слово разом з і, ї, є, ґ та апострофом («м'ясо», «яйця»)
+UA_WORD = r"[а-яёіїєґʼ'’]+"
+# Скільки розібраних повідомлень тримати в кеші
+PARSE_CACHE_ITEMS = int(os.getenv('NLP_CACHE_ITEMS', '2048'))
+# Нижче цієї ймовірності класифікатора намір визначають ключові слова
+INTENT_CONFIDENCE = float(os.getenv('INTENT_CONFIDENCE', '0.6'))
+# Наміри, для яких у боті є обробник; інші відповіді класифікатора перевіряють ключові слова
+HANDLED_INTENTS = ('recipe', 'substitution', 'nutrition', 'inventory', 'meal_plan', 'unknown')
+# Параметр, без якого обробник наміру нічого не зробить
+REQUIRED_PARAMETERS = {'substitution': 'ingredient', 'nutrition': 'item'}
+
+# Пропозиції, коли з повідомлення нічого не вдалося зрозуміти
+DEFAULT_SUGGESTIONS = [
+    "Покажи рецепт борщу",
+    "Що можна приготувати з курки?",
+    "Чим замінити молоко?",
+    "Мої запаси продуктів",
+    "План харчування на тиждень"
+]
+
+
+def normalize_message(message: str) -> str:
+    """Текст повідомлення, за яким його розбирають і кешують"""
+    return " ".join(message.lower().split())
 
 class NLPProcessor:
-    def __init__(self):
+    def __init__(self, dish_resolver: Optional[DishResolver] = None,
+                 cache_items: int = PARSE_CACHE_ITEMS,
+                 intent_model: Optional[str] = INTENT_MODEL_PATH,
+                 intent_confidence: float = INTENT_CONFIDENCE):
+        # Нечіткий пошук серед назв рецептів у базі (якщо передано)
+        self.dish_resolver = dish_resolver
+        # Статистичний класифікатор намірів завантажується з файлу при першому запиті
+        self.intent_model = intent_model
+        self.intent_classifier = None
+        self._intent_model_loaded = False
+        self.intent_confidence = intent_confidence
+        self._intent_lock = threading.Lock()
+        # Розібрані повідомлення: кнопки й підказки надсилають ті самі фрази знову і знову
+        self.cache = LRUCache(cache_items)
+        self._cache_generation = None
+        
         # Ключові слова для різних дій
         self.recipe_keywords = [
             'рецепт', 'приготувати', 'зварити', 'спекти', 'готувати', 
@@ -63,75 +115,185 @@ class NLPProcessor:
             'млинці', 'пельмені', 'піца', 'паста', 'рис', 'гречка',
             'картопля', 'м\'ясо', 'курка', 'риба', 'овочі'
         ]
+        
+        self.compile()
+    
+    def compile(self):
+        """Компілює всі словники в один автомат; викликати після зміни списків"""
+        self.cache.clear()
+        self.intent_keywords = {
+            'recipe': self.recipe_keywords,
+            'ingredients': self.ingredient_keywords,
+            'substitution': self.substitution_keywords,
+            'nutrition': self.nutrition_keywords,
+            'inventory': self.inventory_keywords,
+            'meal_plan': self.meal_plan_keywords,
+        }
+        matcher = KeywordMatcher()
+        for intent, keywords in self.intent_keywords.items():
+            for keyword in keywords:
+                matcher.add(keyword, intent)
+        
+        # Ранг страви - її місце у списку: при кількох збігах перемагає раніша
+        self._dish_rank = {}
+        for rank, dish in enumerate(self.dishes):
+            self._dish_rank.setdefault(dish, rank)
+            matcher.add(dish, DISH_LABEL)
+        matcher.build()
+        self.matcher = matcher
+        
+        # Нечіткий пошук серед популярних страв, коли бази рецептів немає або там не знайшлось
+        self.dish_index = TrigramIndex()
+        for dish, rank in self._dish_rank.items():
+            self.dish_index.add(rank, dish, dish_keys(dish))
+    
+    def match(self, message: str) -> Tuple[List[Match], Dict[str, float]]:
+        """Усі збіги ключових слів і страв за один прохід та сумарні оцінки міток"""
+        # Страва рахується лише з початку слова: «рис» у «барбарис» - не рис
+        matches = [
+            match for match in self.matcher.find(message)
+            if match.label != DISH_LABEL or match.start == 0 or not message[match.start - 1].isalpha()
+        ]
+        return matches, KeywordMatcher.scores(matches)
     
     def process_message(self, message: str) -> Dict:
         """Основна функція обробки повідомлення"""
-        message = message.lower().strip()
+        message = normalize_message(message)
+        self._validate_cache()
+        result = self.cache.get(message)
+        if result is None:
+            result = self._parse(message)
+            self.cache.put(message, result)
+        # Словник параметрів копіюємо, щоб зміни викликача не потрапили в кеш
+        return dict(result, parameters=dict(result['parameters']), probabilities=dict(result['probabilities']))
+    
+    def warm_up(self, phrases: Iterable[str]) -> int:
+        """Заздалегідь розбирає відомі фрази (кнопки, приклади), повертає кількість нових"""
+        self._validate_cache()
+        messages = list(dict.fromkeys(
+            message for message in map(normalize_message, phrases) if message not in self.cache
+        ))
+        # Наміри всіх фраз класифікатор оцінює одним пакетом
+        for message, probabilities in zip(messages, self.intent_probabilities_batch(messages)):
+            self.cache.put(message, self._parse(message, probabilities))
+        return len(messages)
+    
+    def cache_stats(self) -> Dict:
+        return self.cache.stats()
+    
+    def _classifier(self):
+        """Класифікатор намірів або None, якщо моделі немає"""
+        if not self._intent_model_loaded:
+            with self._intent_lock:
+                if not self._intent_model_loaded:
+                    if self.intent_classifier is None and self.intent_model:
+                        self.intent_classifier = load_model(self.intent_model)
+                    self._intent_model_loaded = True
+        return self.intent_classifier
+    
+    def intent_probabilities(self, message: str) -> Dict[str, float]:
+        """Ймовірності намірів за класифікатором; порожній словник, якщо моделі немає"""
+        return self.intent_probabilities_batch([message])[0]
+    
+    def intent_probabilities_batch(self, messages: List[str]) -> List[Dict[str, float]]:
+        """Ймовірності намірів для пакета повідомлень одним множенням матриць"""
+        classifier = self._classifier()
+        if classifier is None or not messages:
+            return [{} for _ in messages]
+        return classifier.classify(messages)
+    
+    def _validate_cache(self):
+        """Скидає кеш, якщо змінився індекс назв страв, від якого залежать результати
+
+        Лише порівнює покоління в пам'яті: індекс оновлює фонове завдання бота,
+        тож розбір повідомлення не звертається до бази.
+        """
+        if self.dish_resolver is None:
+            return
+        if self.dish_resolver.generation != self._cache_generation:
+            self.cache.clear()
+            self._cache_generation = self.dish_resolver.generation
+    
+    def _parse(self, message: str, probabilities: Optional[Dict[str, float]] = None) -> Dict:
+        """Розбирає нормалізоване повідомлення"""
+        # Усі ключові слова і страви шукаємо одним проходом
+        matches, scores = self.match(message)
+        if probabilities is None:
+            probabilities = self.intent_probabilities(message)
         
         # Визначаємо тип запиту
-        intent = self._detect_intent(message)
+        intent = self._detect_intent(message, scores, probabilities)
         
         # Витягуємо параметри
-        params = self._extract_parameters(message, intent)
+        params = self._extract_parameters(message, intent, matches)
+        if not self._is_actionable(intent, params):
+            # Класифікатор назвав намір, з яким бот нічого не зробить - вирішують ключові слова
+            intent = self._keyword_intent(scores)
+            params = self._extract_parameters(message, intent, matches)
         
         return {
             'intent': intent,
             'parameters': params,
-            'original_message': message
+            'original_message': message,
+            'matches': matches,
+            'scores': scores,
+            'probabilities': probabilities
         }
     
-    def _detect_intent(self, message: str) -> str:
+    def _detect_intent(self, message: str, scores: Optional[Dict[str, float]] = None,
+                       probabilities: Optional[Dict[str, float]] = None) -> str:
         """Визначає намір користувача"""
-        
-        # Перевіряємо рецепти
-        if any(keyword in message for keyword in self.recipe_keywords):
-            return 'recipe'
-        
-        # Перевіряємо інгредієнти
-        if any(keyword in message for keyword in self.ingredient_keywords):
-            return 'ingredients'
-        
-        # Перевіряємо заміни
-        if any(keyword in message for keyword in self.substitution_keywords):
-            return 'substitution'
-        
-        # Перевіряємо харчову цінність
-        if any(keyword in message for keyword in self.nutrition_keywords):
-            return 'nutrition'
-        
-        # Перевіряємо запаси
-        if any(keyword in message for keyword in self.inventory_keywords):
-            return 'inventory'
-        
-        # Перевіряємо план харчування
-        if any(keyword in message for keyword in self.meal_plan_keywords):
-            return 'meal_plan'
+        if probabilities is None:
+            probabilities = self.intent_probabilities(message)
+        if probabilities:
+            intent, confidence = max(probabilities.items(), key=lambda item: item[1])
+            if confidence >= self.intent_confidence:
+                return intent
+        
+        # Класифікатор не впевнений або його немає - вирішують ключові слова
+        if scores is None:
+            _, scores = self.match(message)
+        return self._keyword_intent(scores)
+    
+    @staticmethod
+    def _is_actionable(intent: str, params: Dict) -> bool:
+        """Чи є в бота обробник наміру і всі потрібні йому параметри"""
+        required = REQUIRED_PARAMETERS.get(intent)
+        return intent in HANDLED_INTENTS and (required is None or required in params)
+    
+    def _keyword_intent(self, scores: Dict[str, float]) -> str:
+        """Намір за збігами ключових слів"""
+        for intent in INTENT_PRIORITY:
+            if scores.get(intent):
+                return intent
         
         # Якщо згадується страва без ключових слів - припускаємо рецепт
-        if any(dish in message for dish in self.dishes):
+        if scores.get(DISH_LABEL):
             return 'recipe'
         
         return 'unknown'
     
-    def _extract_parameters(self, message: str, intent: str) -> Dict:
+    def _extract_parameters(self, message: str, intent: str, matches: Optional[List[Match]] = None) -> Dict:
         """Витягує параметри з повідомлення"""
         params = {}
         
         if intent == 'recipe':
-            params.update(self._extract_recipe_params(message))
+            params.update(self._extract_recipe_params(message, matches))
         elif intent == 'substitution':
             params.update(self._extract_substitution_params(message))
         elif intent == 'nutrition':
-            params.update(self._extract_nutrition_params(message))
+            params.update(self._extract_nutrition_params(message, matches))
+        elif intent == 'meal_plan':
+            params.update(self._extract_preferences(message))
         
         return params
     
-    def _extract_recipe_params(self, message: str) -> Dict:
+    def _extract_recipe_params(self, message: str, matches: Optional[List[Match]] = None) -> Dict:
         """Витягує параметри для рецептів"""
         params = {}
         
         # Шукаємо назву страви
-        dish_name = self._find_dish_name(message)
+        dish_name = self._find_dish_name(message, matches)
         if dish_name:
             params['dish'] = dish_name
         
@@ -140,6 +302,14 @@ class NLPProcessor:
         if servings:
             params['servings'] = servings
         
+        params.update(self._extract_preferences(message))
+        
+        return params
+    
+    def _extract_preferences(self, message: str) -> Dict:
+        """Витягує бажану складність і категорію страв"""
+        params = {}
+        
         # Шукаємо складність
         if 'легко' in message or 'простий' in message:
             params['difficulty'] = 'легко'
@@ -164,11 +334,11 @@ class NLPProcessor:
         
         # Шукаємо що замінити
         substitution_patterns = [
-            r'замінити\s+([а-яё]+)',
-            r'чим замінити\s+([а-яё]+)',
-            r'немає\s+([а-яё]+)',
-            r'не маю\s+([а-яё]+)',
-            r'замість\s+([а-яё]+)'
+            rf'замінити\s+({UA_WORD})',
+            rf'чим замінити\s+({UA_WORD})',
+            rf'немає\s+({UA_WORD})',
+            rf'не маю\s+({UA_WORD})',
+            rf'замість\s+({UA_WORD})'
         ]
         
         for pattern in substitution_patterns:
@@ -179,30 +349,40 @@ class NLPProcessor:
         
         return params
     
-    def _extract_nutrition_params(self, message: str) -> Dict:
+    def _extract_nutrition_params(self, message: str, matches: Optional[List[Match]] = None) -> Dict:
         """Витягує параметри для харчової цінності"""
         params = {}
         
         # Шукаємо назву продукту
-        dish_name = self._find_dish_name(message)
+        dish_name = self._find_dish_name(message, matches)
         if dish_name:
             params['item'] = dish_name
         
         return params
     
-    def _find_dish_name(self, message: str) -> Optional[str]:
+    def _find_dish_name(self, message: str, matches: Optional[List[Match]] = None) -> Optional[str]:
         """Знаходить назву страви в повідомленні"""
-        # Спочатку шукаємо точні збіги
-        for dish in self.dishes:
-            if dish in message:
-                return dish
+        if matches is None:
+            matches, _ = self.match(message)
         
-        # Потім шукаємо часткові збіги
-        words = message.split()
-        for word in words:
-            for dish in self.dishes:
-                if word in dish or dish in word:
-                    return dish
+        # Спочатку шукаємо точні збіги
+        dishes = [match.term for match in matches if match.label == DISH_LABEL]
+        if dishes:
+            return min(dishes, key=self._dish_rank.__getitem__)
+        
+        # Потім нечітко: решта повідомлення без ключових слів цілком і кожне слово окремо
+        rest = list(message)
+        for match in matches:
+            rest[match.start:match.end] = ' ' * (match.end - match.start)
+        rest = ''.join(rest)
+        queries = [rest] + [word for word in rest.split() if len(word) >= MIN_DISH_WORD and not word.isdigit()]
+        
+        searches = [self.dish_resolver.resolve] if self.dish_resolver else []
+        searches.append(self.dish_index.search)
+        for search in searches:
+            candidates = [candidate for query in queries for candidate in search(query, k=1)]
+            if candidates:
+                return max(candidates, key=lambda candidate: candidate[0])[2]
         
         return None
     
@@ -254,8 +434,8 @@ class NLPProcessor:
         """Дає пропозиції якщо не зрозумів запит"""
         suggestions = []
         
-        if any(dish in message for dish in self.dishes):
-            dish = next(dish for dish in self.dishes if dish in message)
+        dish = self._find_dish_name(message.lower().strip())
+        if dish:
             suggestions.extend([
                 f"Рецепт {dish}",
                 f"Інгредієнти для {dish}",
@@ -263,12 +443,6 @@ class NLPProcessor:
             ])
         
         if not suggestions:
-            suggestions = [
-                "Покажи рецепт борщу",
-                "Що можна приготувати з курки?",
-                "Чим замінити молоко?",
-                "Мої запаси продуктів",
-                "План харчування на тиждень"
-            ]
+            suggestions = list(DEFAULT_SUGGESTIONS)
         
         return suggestions[:3]  # Максимум 3 пропозиції
@@ -0,0 +1,147 @@
+import ua_stemmer
+from database import Database
+from typing import Dict, Optional
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+# Перерахунок підсумків одним запитом; {where} обмежує набір рецептів
+_REFRESH_SQL = '''
+    INSERT OR REPLACE INTO recipe_nutrition (
+        recipe_id, servings, calories, protein, carbs, fat, fiber,
+        matched_ingredients, total_ingredients, updated_at
+    )
+    SELECT r.id,
+           r.servings,
+           COALESCE(SUM(w.grams * n.calories_per_100g), 0) / 100,
+           COALESCE(SUM(w.grams * n.protein_per_100g), 0) / 100,
+           COALESCE(SUM(w.grams * n.carbs_per_100g), 0) / 100,
+           COALESCE(SUM(w.grams * n.fat_per_100g), 0) / 100,
+           COALESCE(SUM(w.grams * n.fiber_per_100g), 0) / 100,
+           COUNT(CASE WHEN w.grams IS NOT NULL AND n.id IS NOT NULL THEN 1 END),
+           COUNT(w.ingredient_id),
+           CURRENT_TIMESTAMP
+    FROM recipes r
+    LEFT JOIN (
+        SELECT ri.id AS ingredient_id,
+               ri.recipe_id,
+               ri.ingredient_name,
+               ri.quantity * COALESCE(iw.grams, uw.grams) AS grams
+        FROM recipe_ingredients ri
+        LEFT JOIN ingredient_weights iw
+               ON iw.ingredient_name = ri.ingredient_name AND iw.unit = ri.unit
+        LEFT JOIN unit_weights uw ON uw.unit = ri.unit
+    ) w ON w.recipe_id = r.id
+    LEFT JOIN nutrition n ON n.ingredient_name = w.ingredient_name
+    {where}
+    GROUP BY r.id
+'''
+
+
+class NutritionCalculator:
+    """Харчова цінність рецептів: переводить інгредієнти в грами і зберігає підсумки"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def refresh_dirty(self) -> int:
+        """Перераховує лише рецепти, позначені тригерами як змінені"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute(_REFRESH_SQL.format(
+                where='WHERE r.id IN (SELECT recipe_id FROM recipe_nutrition_dirty)'
+            ))
+            updated = cursor.rowcount
+            cursor.execute('DELETE FROM recipe_nutrition_dirty')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return updated
+
+    def refresh_all(self) -> int:
+        """Перераховує харчову цінність усього каталогу одним пакетом"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute(_REFRESH_SQL.format(where=''))
+            updated = cursor.rowcount
+            cursor.execute('DELETE FROM recipe_nutrition_dirty')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return updated
+
+    def _is_dirty(self, recipe_id: int) -> bool:
+        row = self.db.get_connection().execute(
+            'SELECT 1 FROM recipe_nutrition_dirty WHERE recipe_id = ?', (recipe_id,)
+        ).fetchone()
+        return row is not None
+
+    def get_recipe_nutrition(self, recipe_id: int) -> Optional[Dict]:
+        """Підсумки для рецепта на всю страву та на порцію"""
+        if self._is_dirty(recipe_id):
+            self.refresh_dirty()
+
+        row = self.db.get_connection().execute('''
+            SELECT servings, calories, protein, carbs, fat, fiber,
+                   matched_ingredients, total_ingredients
+            FROM recipe_nutrition WHERE recipe_id = ?
+        ''', (recipe_id,)).fetchone()
+        if row is None:
+            return None
+
+        servings = row[0] or 1
+        total = dict(zip(NUTRIENTS, row[1:6]))
+        return {
+            'servings': servings,
+            'total': total,
+            'per_serving': {key: value / servings for key, value in total.items()},
+            'matched_ingredients': row[6],
+            'total_ingredients': row[7],
+        }
+
+    def get_ingredient_nutrition(self, name: str) -> Optional[Dict]:
+        """Харчова цінність інгредієнта на 100 г; назва шукається за нормальною формою"""
+        name = name.lower().strip()
+        # Точний збіг назви має перевагу над іншими словами з тією ж нормальною формою
+        row = self.db.get_connection().execute('''
+            SELECT calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g
+            FROM nutrition WHERE ingredient_lemma = ?
+            ORDER BY ingredient_name = ? DESC, id
+            LIMIT 1
+        ''', (ua_stemmer.lemma(name), name)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(NUTRIENTS, row))
+
+    def format_nutrition(self, values: Dict) -> str:
+        return (
+            f"🔥 Калорії: {values['calories']:.0f} ккал\n"
+            f"🥩 Білки: {values['protein']:.1f} г\n"
+            f"🍞 Вуглеводи: {values['carbs']:.1f} г\n"
+            f"🧈 Жири: {values['fat']:.1f} г\n"
+            f"🌾 Клітковина: {values['fiber']:.1f} г\n"
+        )
+
+    def format_recipe_nutrition(self, recipe_name: str, nutrition: Dict) -> str:
+        """Форматує харчову цінність рецепта"""
+        message = f"📊 **Харчова цінність: {recipe_name}**\n\n"
+        message += f"🍽️ **На порцію** (всього {nutrition['servings']} порцій):\n"
+        message += self.format_nutrition(nutrition['per_serving'])
+        message += "\n📦 **Уся страва:**\n"
+        message += self.format_nutrition(nutrition['total'])
+
+        missing = nutrition['total_ingredients'] - nutrition['matched_ingredients']
+        if missing > 0:
+            message += f"\n⚠️ Немає даних для {missing} з {nutrition['total_ingredients']} інгредієнтів"
+        return message
+
+    def format_ingredient_nutrition(self, name: str, values: Dict) -> str:
+        """Форматує харчову цінність інгредієнта"""
+        message = f"📊 **Харчова цінність {name} (на 100г):**\n\n"
+        message += self.format_nutrition(values)
+        return message
@@ -0,0 +1,406 @@
+"""Потоковий імпорт та експорт рецептів, замін і харчової цінності (JSONL/CSV)
+
+Приклади:
+    python recipe_io.py import recipes catalog.jsonl
+    python recipe_io.py import nutrition nutrition.csv --chunk-size 5000
+    python recipe_io.py import recipes catalog.jsonl --force
+    python recipe_io.py export recipes backup.jsonl
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import migrations
+import ua_stemmer
+from database import Database
+from nutrition import NutritionCalculator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+
+RECIPE_FIELDS = ['name', 'description', 'instructions', 'prep_time', 'cook_time',
+                 'servings', 'difficulty', 'category', 'ingredients', 'aliases']
+SUBSTITUTION_FIELDS = ['original_ingredient', 'substitute', 'ratio', 'notes']
+NUTRITION_FIELDS = ['ingredient_name', 'calories_per_100g', 'protein_per_100g',
+                    'carbs_per_100g', 'fat_per_100g', 'fiber_per_100g']
+
+# Поля-списки, які в CSV кодуються як JSON
+JSON_FIELDS = ('ingredients', 'aliases')
+
+FIELDS = {
+    'recipes': RECIPE_FIELDS,
+    'substitutions': SUBSTITUTION_FIELDS,
+    'nutrition': NUTRITION_FIELDS,
+}
+
+# Таблиці, які заповнює кожен тип імпорту (їхні індекси будуємо в кінці)
+KIND_TABLES = {
+    'recipes': ['recipes', 'recipe_ingredients', 'recipe_aliases'],
+    'substitutions': ['substitutions'],
+    'nutrition': [],
+}
+
+
+def _file_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    raise ValueError(f"Непідтримуваний формат файлу: {path}")
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """Читає записи з JSONL або CSV по одному, не завантажуючи файл цілком"""
+    file_format = _file_format(path)
+    with open(path, encoding='utf-8', newline='') as f:
+        if file_format == 'jsonl':
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(f):
+                # Інгредієнти й псевдоніми в CSV зберігаються як JSON-масиви в одній колонці
+                for field in JSON_FIELDS:
+                    if row.get(field):
+                        row[field] = json.loads(row[field])
+                yield row
+
+
+def write_records(path: str, fields: List[str], records: Iterable[Dict]) -> int:
+    """Записує записи в JSONL або CSV потоково, повертає їх кількість"""
+    file_format = _file_format(path)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if file_format == 'jsonl':
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        else:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for record in records:
+                record = dict(record, **{
+                    field: json.dumps(record[field], ensure_ascii=False)
+                    for field in JSON_FIELDS if field in record
+                })
+                writer.writerow(record)
+                count += 1
+    return count
+
+
+def chunked(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _number(value, default, cast=float):
+    if value in (None, ''):
+        return default
+    return cast(value)
+
+
+class CatalogImporter:
+    """Масово завантажує каталог пакетами executemany в окремих транзакціях"""
+
+    def __init__(self, db: Database, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def import_file(self, kind: str, path: str, force: bool = False) -> Dict:
+        """Імпортує файл; після збою повторний запуск продовжує з останнього пакета
+
+        Вже завершений імпорт того самого файлу пропускається, щоб не
+        задвоїти рецепти; force=True імпортує файл ще раз з початку.
+        """
+        if kind not in FIELDS:
+            raise ValueError(f"Невідомий тип даних: {kind}")
+        conn = self.db.get_connection()
+        source = f"{kind}:{os.path.abspath(path)}"
+        skip, completed = self._progress(conn, source)
+        if completed and not force:
+            logger.info("%s вже імпортовано (%d записів), пропускаю; --force імпортує ще раз", path, skip)
+            return {
+                'source': path,
+                'kind': kind,
+                'records': 0,
+                'resumed_from': 0,
+                'skipped': True,
+                'seconds': 0.0,
+                'records_per_second': 0,
+            }
+        if completed:
+            skip = 0
+        elif skip:
+            logger.info("Продовжую імпорт %s з запису %d", path, skip)
+
+        insert_chunk = getattr(self, f'_insert_{kind}')
+        imported = 0
+        started = time.perf_counter()
+
+        # Індекси та FTS перебудовуємо один раз у кінці, а не на кожен рядок
+        self._suspend_indexes(conn, kind)
+        try:
+            for chunk in chunked(islice(read_records(path), skip, None), self.chunk_size):
+                cursor = conn.cursor()
+                cursor.execute('BEGIN')
+                try:
+                    insert_chunk(cursor, chunk)
+                    imported += len(chunk)
+                    self._save_progress(cursor, source, skip + imported, completed=False)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                elapsed = time.perf_counter() - started
+                logger.info("%s: %d записів, %.0f записів/с", path, skip + imported,
+                            imported / elapsed if elapsed else 0)
+        finally:
+            self._restore_indexes(conn, kind)
+
+        self._save_progress(conn.cursor(), source, skip + imported, completed=True)
+        conn.commit()
+        # Підсумки харчової цінності для змінених рецептів рахуємо одним пакетом
+        if kind in ('recipes', 'nutrition'):
+            NutritionCalculator(self.db).refresh_dirty()
+        self.db.data_changed()
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            'source': path,
+            'kind': kind,
+            'records': imported,
+            'resumed_from': skip,
+            'skipped': False,
+            'seconds': round(elapsed, 3),
+            'records_per_second': round(imported / elapsed) if elapsed else imported,
+        }
+        logger.info("Імпорт завершено: %s", stats)
+        return stats
+
+    def _progress(self, conn, source: str) -> Tuple[int, bool]:
+        """(скільки записів закомічено, чи імпорт завершено)"""
+        row = conn.execute(
+            'SELECT records, completed FROM import_progress WHERE source = ?', (source,)
+        ).fetchone()
+        if row is None:
+            return 0, False
+        return row[0], bool(row[1])
+
+    def _save_progress(self, cursor, source: str, records: int, completed: bool):
+        cursor.execute('''
+            INSERT INTO import_progress (source, records, completed, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (source) DO UPDATE SET
+                records = excluded.records,
+                completed = excluded.completed,
+                updated_at = excluded.updated_at
+        ''', (source, records, int(completed)))
+
+    def _suspend_indexes(self, conn, kind: str):
+        """Прибирає індекси й тригери FTS; за позначкою їх поверне init_database, якщо процес упаде"""
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        if kind == 'recipes':
+            migrations.suspend_search_index(cursor)
+        for table in KIND_TABLES[kind]:
+            migrations.drop_indexes(cursor, table)
+        migrations.mark_indexes_suspended(cursor, kind)
+        conn.commit()
+
+    def _restore_indexes(self, conn, kind: str):
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        migrations.create_indexes(cursor)
+        if kind == 'recipes':
+            migrations.restore_search_index(cursor)
+        migrations.mark_indexes_suspended(cursor, kind, suspended=False)
+        conn.commit()
+
+    def _insert_recipes(self, cursor, chunk: List[Dict]):
+        # Ідентифікатори призначаємо самі, щоб вставити інгредієнти тим самим пакетом
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM recipes')
+        next_id = cursor.fetchone()[0] + 1
+
+        recipes = []
+        ingredients = []
+        aliases = []
+        for recipe_id, record in enumerate(chunk, start=next_id):
+            recipes.append((
+                recipe_id,
+                record['name'],
+                record.get('description') or '',
+                record.get('instructions') or '',
+                _number(record.get('prep_time'), 0, int),
+                _number(record.get('cook_time'), 0, int),
+                _number(record.get('servings'), 1, int),
+                record.get('difficulty') or 'легко',
+                record.get('category') or 'основні страви',
+                ua_stemmer.lemma(record['name']),
+            ))
+            for ingredient in record.get('ingredients') or []:
+                ingredients.append((
+                    recipe_id,
+                    ingredient['name'],
+                    _number(ingredient.get('quantity'), 0),
+                    ingredient.get('unit') or 'шт',
+                    ua_stemmer.lemma(ingredient['name']),
+                ))
+            aliases.extend((recipe_id, alias) for alias in record.get('aliases') or [] if alias)
+
+        cursor.executemany('''
+            INSERT INTO recipes (id, name, description, instructions, prep_time, cook_time, servings, difficulty, category,
+                                 name_lemma)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', recipes)
+        cursor.executemany('''
+            INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity, unit, ingredient_lemma)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ingredients)
+        cursor.executemany('INSERT INTO recipe_aliases (recipe_id, alias) VALUES (?, ?)', aliases)
+
+    def _insert_substitutions(self, cursor, chunk: List[Dict]):
+        cursor.executemany('''
+            INSERT INTO substitutions (original_ingredient, substitute, ratio, notes, original_lemma)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (record['original_ingredient'], record['substitute'],
+             _number(record.get('ratio'), 1.0), record.get('notes') or None,
+             ua_stemmer.lemma(record['original_ingredient']))
+            for record in chunk
+        ])
+
+    def _insert_nutrition(self, cursor, chunk: List[Dict]):
+        cursor.executemany('''
+            INSERT INTO nutrition (ingredient_name, calories_per_100g, protein_per_100g, carbs_per_100g, fat_per_100g, fiber_per_100g,
+                                   ingredient_lemma)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (ingredient_name) DO UPDATE SET
+                calories_per_100g = excluded.calories_per_100g,
+                protein_per_100g = excluded.protein_per_100g,
+                carbs_per_100g = excluded.carbs_per_100g,
+                fat_per_100g = excluded.fat_per_100g,
+                fiber_per_100g = excluded.fiber_per_100g
+        ''', [
+            (record['ingredient_name'],) + tuple(_number(record.get(field), 0) for field in NUTRITION_FIELDS[1:])
+            + (ua_stemmer.lemma(record['ingredient_name']),)
+            for record in chunk
+        ])
+
+
+class CatalogExporter:
+    """Вивантажує каталог потоково, пакетами з бази"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def export_file(self, kind: str, path: str) -> Dict:
+        if kind not in FIELDS:
+            raise ValueError(f"Невідомий тип даних: {kind}")
+        started = time.perf_counter()
+        count = write_records(path, FIELDS[kind], getattr(self, f'_iter_{kind}')())
+        elapsed = time.perf_counter() - started
+        stats = {
+            'target': path,
+            'kind': kind,
+            'records': count,
+            'seconds': round(elapsed, 3),
+            'records_per_second': round(count / elapsed) if elapsed else count,
+        }
+        logger.info("Експорт завершено: %s", stats)
+        return stats
+
+    def _iter_recipes(self) -> Iterator[Dict]:
+        conn = self.db.get_connection()
+        last_id = 0
+        while True:
+            ids = [row[0] for row in conn.execute(
+                'SELECT id FROM recipes WHERE id > ? ORDER BY id LIMIT ?', (last_id, EXPORT_BATCH_SIZE)
+            )]
+            if not ids:
+                return
+            last_id = ids[-1]
+            rows = self.db.get_recipes_with_ingredients(recipe_ids=ids)
+            aliases = {recipe_id: [] for recipe_id in ids}
+            for recipe_id, alias in conn.execute(
+                f"SELECT recipe_id, alias FROM recipe_aliases WHERE recipe_id IN ({','.join('?' * len(ids))}) ORDER BY id",
+                ids
+            ):
+                aliases[recipe_id].append(alias)
+            for recipe, ingredients in sorted(rows, key=lambda row: row[0][0]):
+                yield {
+                    'name': recipe[1],
+                    'description': recipe[2],
+                    'instructions': recipe[3],
+                    'prep_time': recipe[4],
+                    'cook_time': recipe[5],
+                    'servings': recipe[6],
+                    'difficulty': recipe[7],
+                    'category': recipe[8],
+                    'ingredients': [
+                        {'name': name, 'quantity': quantity, 'unit': unit}
+                        for name, quantity, unit in ingredients
+                    ],
+                    'aliases': aliases[recipe[0]],
+                }
+
+    def _iter_table(self, table: str, fields: List[str]) -> Iterator[Dict]:
+        cursor = self.db.get_connection().execute(f"SELECT {', '.join(fields)} FROM {table} ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(fields, row))
+
+    def _iter_substitutions(self) -> Iterator[Dict]:
+        return self._iter_table('substitutions', SUBSTITUTION_FIELDS)
+
+    def _iter_nutrition(self) -> Iterator[Dict]:
+        return self._iter_table('nutrition', NUTRITION_FIELDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Імпорт та експорт каталогу рецептів")
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('kind', choices=sorted(FIELDS))
+    parser.add_argument('path', help="Файл .jsonl або .csv")
+    parser.add_argument('--db', default='kitchen_bot.db')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--force', action='store_true', help="Імпортувати вже імпортований файл ще раз")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    db = Database(args.db)
+    try:
+        if args.action == 'import':
+            stats = CatalogImporter(db, args.chunk_size).import_file(args.kind, args.path, args.force)
+            if stats['skipped']:
+                print(f"⏭️ {args.path} вже імпортовано, нічого не змінено (--force імпортує ще раз)")
+                return
+        else:
+            stats = CatalogExporter(db).export_file(args.kind, args.path)
+        print(f"✅ {stats['records']} записів за {stats['seconds']} с "
+              f"({stats['records_per_second']} записів/с)")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
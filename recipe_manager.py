@@ -1,117 +1,187 @@
 from database import Database
+from cache import LRUCache
+import ua_stemmer
 from typing import List, Dict, Optional, Tuple
+import os
 import random
 
+# Обмеження кешу рецептів
+RECIPE_CACHE_ITEMS = int(os.getenv('RECIPE_CACHE_ITEMS', '5000'))
+RECIPE_CACHE_BYTES = int(os.getenv('RECIPE_CACHE_MB', '32')) * 1024 * 1024
+
+
+class RecipeCache:
+    """Кеш рецептів, результатів пошуку та замін; скидається при зміні даних у базі"""
+
+    def __init__(self, db: Database, max_items: int = RECIPE_CACHE_ITEMS,
+                 max_bytes: int = RECIPE_CACHE_BYTES):
+        self.db = db
+        self.entries = LRUCache(max_items, max_bytes)
+        self._version = None
+
+    def validate(self):
+        """Очищає кеш, якщо після попередньої перевірки в базі був коміт"""
+        version = self.db.data_version()
+        if version != self._version:
+            self.entries.clear()
+            self._version = version
+
+    def get_recipes(self, recipe_ids: List[int]) -> Dict[int, Tuple]:
+        """Рецепти з інгредієнтами за id; відсутні в кеші довантажує одним запитом"""
+        found = {}
+        missing = []
+        for recipe_id in recipe_ids:
+            row = self.entries.get(('recipe', recipe_id))
+            if row is None:
+                missing.append(recipe_id)
+            else:
+                found[recipe_id] = row
+        if missing:
+            for row in self.db.get_recipes_with_ingredients(recipe_ids=missing):
+                self.put_recipe(row)
+                found[row[0][0]] = row
+        return found
+
+    def put_recipe(self, row: Tuple):
+        self.entries.put(('recipe', row[0][0]), row)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, value):
+        self.entries.put(key, value)
+
+    def stats(self) -> Dict:
+        return self.entries.stats()
+
+
+def _normalize_query(query: Optional[str]) -> str:
+    return " ".join((query or "").lower().split())
+
+
 class RecipeManager:
     def __init__(self, db: Database):
         self.db = db
+        self.cache = RecipeCache(db)
     
-    def find_recipes(self, query: str, servings: Optional[int] = None) -> List[Dict]:
-        """Знаходить рецепти за запитом"""
-        recipes = self.db.get_recipes(query)
-        
-        result = []
-        for recipe in recipes:
-            recipe_dict = {
-                'id': recipe[0],
-                'name': recipe[1],
-                'description': recipe[2],
-                'instructions': recipe[3],
-                'prep_time': recipe[4],
-                'cook_time': recipe[5],
-                'servings': recipe[6],
-                'difficulty': recipe[7],
-                'category': recipe[8],
-                'created_at': recipe[9]
+    def _build_recipe_dict(self, recipe: Tuple, ingredients: List[Tuple],
+                           servings: Optional[int] = None) -> Dict:
+        """Перетворює рядок рецепта та його інгредієнти на словник"""
+        recipe_dict = {
+            'id': recipe[0],
+            'name': recipe[1],
+            'description': recipe[2],
+            'instructions': recipe[3],
+            'prep_time': recipe[4],
+            'cook_time': recipe[5],
+            'servings': recipe[6],
+            'difficulty': recipe[7],
+            'category': recipe[8],
+            'created_at': recipe[9]
+        }
+        
+        recipe_dict['ingredients'] = []
+        for ingredient in ingredients:
+            ing_dict = {
+                'name': ingredient[0],
+                'quantity': ingredient[1],
+                'unit': ingredient[2]
             }
             
-            # Додаємо інгредієнти
-            ingredients = self.db.get_recipe_ingredients(recipe[0])
-            recipe_dict['ingredients'] = []
-            
-            for ingredient in ingredients:
-                ing_dict = {
-                    'name': ingredient[0],
-                    'quantity': ingredient[1],
-                    'unit': ingredient[2]
-                }
-                
-                # Якщо потрібно перерахувати на іншу кількість порцій
-                if servings and servings != recipe[6]:
-                    multiplier = servings / recipe[6]
-                    ing_dict['quantity'] = round(ingredient[1] * multiplier, 2)
-                
-                recipe_dict['ingredients'].append(ing_dict)
+            # Якщо потрібно перерахувати на іншу кількість порцій
+            if servings and servings != recipe[6]:
+                multiplier = servings / recipe[6]
+                ing_dict['quantity'] = round(ingredient[1] * multiplier, 2)
             
-            # Оновлюємо кількість порцій якщо потрібно
-            if servings:
-                recipe_dict['servings'] = servings
-                # Перерахуємо час приготування (може трохи збільшитись)
-                if servings > recipe[6]:
-                    multiplier = servings / recipe[6]
-                    recipe_dict['cook_time'] = int(recipe[5] * (1 + (multiplier - 1) * 0.3))
-            
-            result.append(recipe_dict)
+            recipe_dict['ingredients'].append(ing_dict)
+        
+        # Оновлюємо кількість порцій якщо потрібно
+        if servings:
+            recipe_dict['servings'] = servings
+            # Перерахуємо час приготування (може трохи збільшитись)
+            if servings > recipe[6]:
+                multiplier = servings / recipe[6]
+                recipe_dict['cook_time'] = int(recipe[5] * (1 + (multiplier - 1) * 0.3))
+        
+        return recipe_dict
+    
+    def find_recipes(self, query: str, servings: Optional[int] = None,
+                     limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Знаходить рецепти за запитом"""
+        self.cache.validate()
+        key = ('search', _normalize_query(query), limit, offset)
+        recipe_ids = self.cache.get(key)
+        
+        if recipe_ids is None:
+            rows = self.db.get_recipes_with_ingredients(query, limit=limit, offset=offset)
+            for row in rows:
+                self.cache.put_recipe(row)
+            recipe_ids = [recipe[0] for recipe, _ in rows]
+            self.cache.put(key, recipe_ids)
+            by_id = {recipe[0]: (recipe, ingredients) for recipe, ingredients in rows}
+        else:
+            by_id = self.cache.get_recipes(recipe_ids)
         
-        return result
+        return [self._build_recipe_dict(*by_id[recipe_id], servings)
+                for recipe_id in recipe_ids if recipe_id in by_id]
+    
+    def count_recipes(self, query: str = "") -> int:
+        """Кількість рецептів за запитом"""
+        self.cache.validate()
+        key = ('count', _normalize_query(query))
+        count = self.cache.get(key)
+        if count is None:
+            count = self.db.count_recipes(query)
+            self.cache.put(key, count)
+        return count
+    
+    def get_recipe_by_id(self, recipe_id: int, servings: Optional[int] = None) -> Optional[Dict]:
+        """Отримує рецепт за ідентифікатором"""
+        self.cache.validate()
+        row = self.cache.get_recipes([recipe_id]).get(recipe_id)
+        if row is None:
+            return None
+        recipe, ingredients = row
+        return self._build_recipe_dict(recipe, ingredients, servings)
+    
+    def get_substitutions(self, ingredient: str) -> List[Tuple]:
+        """Заміни для інгредієнта"""
+        self.cache.validate()
+        key = ('substitutions', ua_stemmer.lemma(ingredient))
+        substitutions = self.cache.get(key)
+        if substitutions is None:
+            substitutions = self.db.get_substitutions(ingredient)
+            self.cache.put(key, substitutions)
+        return substitutions
     
     def get_recipe_by_name(self, name: str, servings: Optional[int] = None) -> Optional[Dict]:
         """Отримує рецепт за назвою"""
-        recipes = self.find_recipes(name, servings)
-        
-        # Шукаємо точний збіг
-        for recipe in recipes:
-            if recipe['name'].lower() == name.lower():
+        # Спочатку точний збіг нормальної форми назви по індексу: 'борщу' - це 'Борщ'
+        self.cache.validate()
+        key = ('name', ua_stemmer.lemma(name))
+        recipe_id = self.cache.get(key)
+        if recipe_id is None:
+            recipe_id = self.db.find_recipe_id_by_name(name) or 0
+            self.cache.put(key, recipe_id)
+        if recipe_id:
+            recipe = self.get_recipe_by_id(recipe_id, servings)
+            if recipe:
                 return recipe
         
-        # Якщо точного збігу немає, повертаємо перший результат
+        # Якщо точного збігу немає, повертаємо найрелевантніший результат
+        recipes = self.find_recipes(name, servings, limit=1)
         return recipes[0] if recipes else None
     
     def get_random_recipe(self, category: Optional[str] = None, difficulty: Optional[str] = None) -> Optional[Dict]:
         """Повертає випадковий рецепт"""
-        all_recipes = self.db.get_recipes()
-        
-        # Фільтруємо за категорією та складністю
-        filtered_recipes = []
-        for recipe in all_recipes:
-            if category and recipe[8] != category:
-                continue
-            if difficulty and recipe[7] != difficulty:
-                continue
-            filtered_recipes.append(recipe)
-        
-        if not filtered_recipes:
+        rows = self.db.get_recipes_with_ingredients(
+            category=category, difficulty=difficulty, limit=1, random_order=True
+        )
+        if not rows:
             return None
         
-        # Вибираємо випадковий
-        random_recipe = random.choice(filtered_recipes)
-        
-        # Конвертуємо в словник
-        recipe_dict = {
-            'id': random_recipe[0],
-            'name': random_recipe[1],
-            'description': random_recipe[2],
-            'instructions': random_recipe[3],
-            'prep_time': random_recipe[4],
-            'cook_time': random_recipe[5],
-            'servings': random_recipe[6],
-            'difficulty': random_recipe[7],
-            'category': random_recipe[8],
-            'created_at': random_recipe[9]
-        }
-        
-        # Додаємо інгредієнти
-        ingredients = self.db.get_recipe_ingredients(random_recipe[0])
-        recipe_dict['ingredients'] = []
-        
-        for ingredient in ingredients:
-            recipe_dict['ingredients'].append({
-                'name': ingredient[0],
-                'quantity': ingredient[1],
-                'unit': ingredient[2]
-            })
-        
-        return recipe_dict
+        recipe, ingredients = rows[0]
+        return self._build_recipe_dict(recipe, ingredients)
     
     def format_recipe_message(self, recipe: Dict) -> str:
         """Форматує рецепт для відправки користувачу"""
@@ -168,7 +238,8 @@ class RecipeManager:
         
         return message
     
-    def format_recipe_list(self, recipes: List[Dict], title: str = "Знайдені рецепти") -> str:
+    def format_recipe_list(self, recipes: List[Dict], title: str = "Знайдені рецепти",
+                           total: Optional[int] = None) -> str:
         """Форматує список рецептів"""
         if not recipes:
             return "❌ Рецепти не знайдено"
@@ -206,20 +277,26 @@ class RecipeManager:
             
             message += "\n"
         
-        if len(recipes) > 5:
-            message += f"... та ще {len(recipes) - 5} рецептів\n"
+        if total is None:
+            total = len(recipes)
+        if total > 5:
+            message += f"... та ще {total - 5} рецептів\n"
         
         message += "\n💡 Напиши назву рецепту щоб отримати повну інформацію"
         
         return message
     
-    def check_available_ingredients(self, recipe: Dict) -> Dict:
-        """Перевіряє які інгредієнти є в наявності"""
+    def check_available_ingredients(self, recipe: Dict, products: List[Dict]) -> Dict:
+        """Перевіряє які інгредієнти є в запасах користувача
+
+        products - запаси користувача з InventoryStore.list_products().
+        """
         if not recipe.get('ingredients'):
             return {'available': [], 'missing': [], 'substitutions': []}
         
-        available_products = self.db.get_products()
-        product_names = [product[1].lower() for product in available_products]
+        # Порівнюємо нормальні форми назв без префіксів категорій:
+        # 'яйця' в рецепті - це 'яйце' в запасах, '[МОРОЗИЛКА] м'ясо' - це 'м'ясо'
+        product_names = {ua_stemmer.lemma(product['name_norm']) for product in products}
         
         available = []
         missing = []
@@ -228,12 +305,12 @@ class RecipeManager:
         for ingredient in recipe['ingredients']:
             ingredient_name = ingredient['name'].lower()
             
-            if ingredient_name in product_names:
+            if ua_stemmer.lemma(ingredient_name) in product_names:
                 available.append(ingredient)
             else:
                 missing.append(ingredient)
                 # Шукаємо заміни
-                subs = self.db.get_substitutions(ingredient_name)
+                subs = self.get_substitutions(ingredient_name)
                 if subs:
                     for sub in subs:
                         substitutions.append({
@@ -249,11 +326,11 @@ class RecipeManager:
             'substitutions': substitutions
         }
     
-    def format_ingredient_check(self, recipe: Dict) -> str:
+    def format_ingredient_check(self, recipe: Dict, products: List[Dict]) -> str:
         """Форматує перевірку інгредієнтів"""
-        check_result = self.check_available_ingredients(recipe)
+        check_result = self.check_available_ingredients(recipe, products)
         
-        message = f"🔍 **Перевірка інгредієнтів для "{recipe['name']}"**\n\n"
+        message = f"🔍 **Перевірка інгредієнтів для \"{recipe['name']}\"**\n\n"
         
         # Доступні інгредієнти
         if check_result['available']:
@@ -0,0 +1,160 @@
+import asyncio
+import heapq
+import logging
+import threading
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+REMINDER_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Скільки найближчих нагадувань тримаємо в пам'яті
+HEAP_SIZE = 100
+JOB_NAME = 'due_reminders'
+
+
+class ReminderScheduler:
+    """Надсилає нагадування точно в строк через JobQueue
+
+    У пам'яті тримається лише купа з найближчих HEAP_SIZE невиконаних
+    нагадувань; коли вона спорожніє, її доповнює індексований запит по
+    reminder_date. Нагадування позначаються виконаними до відправки, тому
+    після перезапуску вони не надсилаються вдруге.
+    """
+
+    def __init__(self, db: Database, executor: Executor, heap_size: int = HEAP_SIZE):
+        self.db = db
+        self.executor = executor
+        self.heap_size = heap_size
+        self._heap: List[Tuple[datetime, int, int, str]] = []
+        # Найпізніший строк у купі, якщо в базі можуть бути ще пізніші нагадування
+        self._horizon: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._job_queue = None
+
+    # Синхронна частина: виконується в пулі потоків бази
+
+    def refill(self):
+        """Завантажує найближчі невиконані нагадування
+
+        Нагадування з датою, яку не вдається розібрати, позначаються
+        виконаними: інакше вони назавжди займали б місця в LIMIT і
+        затуляли б пізніші нагадування.
+        """
+        conn = self.db.get_connection()
+        while True:
+            rows = conn.execute('''
+                SELECT reminder_date, id, chat_id, message
+                FROM reminders
+                WHERE is_completed = 0 AND chat_id IS NOT NULL
+                ORDER BY reminder_date, id
+                LIMIT ?
+            ''', (self.heap_size,)).fetchall()
+
+            heap = []
+            invalid = []
+            for reminder_date, reminder_id, chat_id, message in rows:
+                try:
+                    due = datetime.strptime(reminder_date, REMINDER_DATE_FORMAT)
+                except (TypeError, ValueError):
+                    logger.warning("Нагадування %s має некоректну дату %r, пропускаю його",
+                                   reminder_id, reminder_date)
+                    invalid.append((reminder_id,))
+                    continue
+                heap.append((due, reminder_id, chat_id, message))
+            if invalid:
+                conn.executemany('UPDATE reminders SET is_completed = 1 WHERE id = ?', invalid)
+                conn.commit()
+            # Уся сторінка виявилась некоректною - за нею можуть бути справжні нагадування
+            if heap or len(rows) < self.heap_size:
+                break
+        heapq.heapify(heap)
+
+        with self._lock:
+            self._heap = heap
+            self._horizon = max(item[0] for item in heap) if heap and len(rows) >= self.heap_size else None
+
+    def add(self, chat_id: int, message: str, due: datetime) -> int:
+        """Зберігає нагадування і додає його в купу, якщо воно серед найближчих"""
+        conn = self.db.get_connection()
+        cursor = conn.execute(
+            'INSERT INTO reminders (message, reminder_date, chat_id) VALUES (?, ?, ?)',
+            (message, due.strftime(REMINDER_DATE_FORMAT), chat_id)
+        )
+        conn.commit()
+        reminder_id = cursor.lastrowid
+
+        with self._lock:
+            if self._horizon is None or due <= self._horizon:
+                heapq.heappush(self._heap, (due, reminder_id, chat_id, message))
+        return reminder_id
+
+    def claim_due(self, now: datetime) -> List[Tuple[int, int, str]]:
+        """Забирає з купи всі нагадування, строк яких настав, і одним запитом позначає їх виконаними"""
+        with self._lock:
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        if not due:
+            return []
+
+        ids = [item[1] for item in due]
+        conn = self.db.get_connection()
+        claimed = {row[0] for row in conn.execute(f'''
+            UPDATE reminders SET is_completed = 1
+            WHERE is_completed = 0 AND id IN ({','.join('?' * len(ids))})
+            RETURNING id
+        ''', ids).fetchall()}
+        conn.commit()
+        return [(reminder_id, chat_id, message)
+                for _, reminder_id, chat_id, message in due if reminder_id in claimed]
+
+    def next_due(self) -> Optional[datetime]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def needs_refill(self) -> bool:
+        with self._lock:
+            return not self._heap and self._horizon is not None
+
+    # Асинхронна частина: працює в циклі подій бота
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def start(self, job_queue):
+        """Завантажує нагадування і планує перше спрацювання"""
+        self._job_queue = job_queue
+        await self._run(self.refill)
+        self._arm()
+
+    async def schedule(self, chat_id: int, message: str, due: datetime) -> int:
+        reminder_id = await self._run(self.add, chat_id, message, due)
+        self._arm()
+        return reminder_id
+
+    def _arm(self):
+        """Переплановує єдину задачу JobQueue на найближчий строк"""
+        if self._job_queue is None:
+            return
+        for job in self._job_queue.get_jobs_by_name(JOB_NAME):
+            job.schedule_removal()
+        due = self.next_due()
+        if due is not None:
+            delay = max((due - datetime.now()).total_seconds(), 0)
+            self._job_queue.run_once(self._fire, delay, name=JOB_NAME)
+
+    async def _fire(self, context):
+        reminders = await self._run(self.claim_due, datetime.now())
+        for reminder_id, chat_id, message in reminders:
+            try:
+                await context.bot.send_message(chat_id, f"⏰ **Нагадування:** {message}", parse_mode='Markdown')
+            except Exception as e:
+                logger.error(f"Не вдалося надіслати нагадування {reminder_id}: {e}")
+        if self.needs_refill():
+            await self._run(self.refill)
+        self._arm()
@@ -0,0 +1,66 @@
+import json
+from collections import namedtuple
+from typing import Iterable, List, Optional
+
+from database import Database
+
+JournalEntry = namedtuple('JournalEntry', 'id sheet op row col value sent')
+
+
+class SheetJournal:
+    """Журнал змін аркушів у SQLite, що веде запис наперед (write-ahead)
+
+    Кожна зміна спершу комітиться сюди, і лише потім іде в Google Sheets.
+    Записи відтворюються строго в порядку id і видаляються після успішної
+    відправки, тож після збою чи перезапуску нічого не губиться.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def append(self, sheet: str, op: str, row: Optional[int], col: Optional[int], value,
+               commit: bool = True) -> int:
+        conn = self.db.get_connection()
+        cursor = conn.execute(
+            'INSERT INTO sheet_journal (sheet, op, row_number, col, payload) VALUES (?, ?, ?, ?, ?)',
+            (sheet, op, row, col, json.dumps(value, ensure_ascii=False))
+        )
+        if commit:
+            conn.commit()
+        return cursor.lastrowid
+
+    def commit(self):
+        self.db.get_connection().commit()
+
+    def rollback(self):
+        self.db.get_connection().rollback()
+
+    def pending(self, sheet: Optional[str] = None) -> List[JournalEntry]:
+        """Невідправлені зміни в порядку запису"""
+        query = 'SELECT id, sheet, op, row_number, col, payload, sent FROM sheet_journal'
+        args = ()
+        if sheet is not None:
+            query += ' WHERE sheet = ?'
+            args = (sheet,)
+        rows = self.db.get_connection().execute(query + ' ORDER BY id', args).fetchall()
+        return [JournalEntry(id, sheet, op, row, col, json.loads(payload), bool(sent))
+                for id, sheet, op, row, col, payload, sent in rows]
+
+    def count(self, sheet: Optional[str] = None) -> int:
+        if sheet is None:
+            return self.db.get_connection().execute('SELECT COUNT(*) FROM sheet_journal').fetchone()[0]
+        return self.db.get_connection().execute(
+            'SELECT COUNT(*) FROM sheet_journal WHERE sheet = ?', (sheet,)
+        ).fetchone()[0]
+
+    def mark_sent(self, ids: Iterable[int]):
+        """Позначає зміни, відправка яких почалась, але ще не підтверджена"""
+        conn = self.db.get_connection()
+        conn.executemany('UPDATE sheet_journal SET sent = 1 WHERE id = ?', [(id,) for id in ids])
+        conn.commit()
+
+    def remove(self, ids: Iterable[int]):
+        """Прибирає відправлені зміни"""
+        conn = self.db.get_connection()
+        conn.executemany('DELETE FROM sheet_journal WHERE id = ?', [(id,) for id in ids])
+        conn.commit()
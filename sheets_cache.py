@@ -0,0 +1,260 @@
+import os
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import sheets_client
+from sheet_journal import JournalEntry, SheetJournal
+
+logger = logging.getLogger(__name__)
+
+# Скільки чекати на інші записи перед відправкою пакета (секунди)
+SHEETS_FLUSH_WINDOW = float(os.getenv('SHEETS_FLUSH_WINDOW', '0.5'))
+# Після стількох операцій пакет відправляється, не чекаючи кінця вікна
+SHEETS_MAX_BATCH = int(os.getenv('SHEETS_MAX_BATCH', '500'))
+# На скільки рядків розширювати сітку аркуша, коли нові рядки в неї не вміщаються
+SHEETS_GRID_GROWTH = 1000
+# Через скільки секунд повторити відправку журналу після невдачі
+SHEETS_REPLAY_RETRY = float(os.getenv('SHEETS_REPLAY_RETRY', '30'))
+
+# Перший рядок аркуша - заголовки, дані починаються з другого
+FIRST_DATA_ROW = 2
+
+
+def _a1(row: int, col: int) -> str:
+    """Адреса клітинки у форматі A1"""
+    letters = ''
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return f"{letters}{row}"
+
+
+class SheetWriter:
+    """Відкладений запис у Google Sheets через журнал SheetJournal
+
+    Кожна зміна спершу комітиться в журнал, тому користувачу не треба
+    чекати на Google. Протягом flush_window секунд зміни накопичуються, а
+    потім для кожного аркуша йдуть одним batch_update. Записи прив'язані
+    до конкретних клітинок і рядків (нові рядки теж), тому повторна
+    відправка після збою нічого не дублює. Рядки журналів, що лише
+    дописуються в кінець (append_end), йдуть одним append_rows; перед
+    ним вони позначаються відправленими, і після збою посеред відправки
+    спершу перевіряється, чи вони вже є в аркуші. Якщо відправка не
+    вдалася, зміни лишаються в журналі й повторюються через retry_delay
+    секунд, зокрема після перезапуску бота.
+    """
+
+    def __init__(self, journal: SheetJournal, flush_window: float = SHEETS_FLUSH_WINDOW,
+                 max_batch: int = SHEETS_MAX_BATCH, retry_delay: float = SHEETS_REPLAY_RETRY):
+        self.journal = journal
+        self.flush_window = flush_window
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self._sheets: Dict[str, Callable] = {}
+        self._futures: Dict[int, Future] = {}
+        self._unsent = 0
+        self._lock = threading.Lock()
+        # Відправки виконуються по черзі, щоб зміни одного аркуша не перемішались
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+        self._local = threading.local()
+        self.stats = {'operations': 0, 'api_calls': 0, 'failed_flushes': 0}
+
+    def register(self, sheet: str, worksheet_getter: Callable):
+        self._sheets[sheet] = worksheet_getter
+
+    def start(self):
+        """Планує відтворення змін, що лишились у журналі з минулого запуску"""
+        if self.journal.count():
+            self._schedule(0)
+
+    def _schedule(self, delay: float):
+        with self._lock:
+            if self._timer is None and not self._closed:
+                self._timer = threading.Timer(delay, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    @contextmanager
+    def atomic(self):
+        """Зміни в цьому блоці (у поточному потоці) потрапляють у журнал однією транзакцією"""
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        try:
+            yield
+        except Exception:
+            if depth == 0:
+                self.journal.rollback()
+            raise
+        else:
+            if depth == 0:
+                self.journal.commit()
+                self._after_record()
+        finally:
+            self._local.depth = depth
+
+    def _record(self, sheet: str, op: str, row: Optional[int], col: Optional[int], value) -> Future:
+        in_transaction = getattr(self._local, 'depth', 0) > 0
+        entry_id = self.journal.append(sheet, op, row, col, value, commit=not in_transaction)
+        future = Future()
+        with self._lock:
+            self._futures[entry_id] = future
+            self._unsent += 1
+            self.stats['operations'] += 1
+        if not in_transaction:
+            self._after_record()
+        return future
+
+    def _after_record(self):
+        with self._lock:
+            full = self._unsent >= self.max_batch
+        if full:
+            self.flush()
+        else:
+            self._schedule(self.flush_window)
+
+    def update_cell(self, sheet: str, row: int, col: int, value) -> Future:
+        return self._record(sheet, 'update', row, col, value)
+
+    def append_row(self, sheet: str, row_number: int, values: List) -> Future:
+        return self._record(sheet, 'append', row_number, None, list(values))
+
+    def append_end(self, sheet: str, values: List) -> Future:
+        """Дописує рядок у кінець аркуша, не знаючи його номера (для журналів)"""
+        return self._record(sheet, 'append_end', None, None, list(values))
+
+    def rewrite(self, sheet: str, rows: List[List]) -> Future:
+        """Переписує аркуш цілком, від заголовків; рядки нижче rows прибираються"""
+        return self._record(sheet, 'rewrite', None, None, [list(values) for values in rows])
+
+    def has_pending(self, sheet: str) -> bool:
+        return self.journal.count(sheet) > 0
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        # Відкладений запис не повинен випереджати запити користувачів
+        with sheets_client.priority(sheets_client.BACKGROUND):
+            self.flush()
+
+    def flush(self, sheet: Optional[str] = None) -> bool:
+        """Відправляє зміни з журналу; повертає False, якщо щось лишилось невідправленим"""
+        with self._flush_lock:
+            entries = self.journal.pending(sheet)
+            by_sheet: Dict[str, List[JournalEntry]] = {}
+            for entry in entries:
+                by_sheet.setdefault(entry.sheet, []).append(entry)
+
+            done = True
+            for name, sheet_entries in by_sheet.items():
+                if name not in self._sheets:
+                    continue
+                try:
+                    self._send(self._sheets[name](), sheet_entries)
+                except Exception as e:
+                    logger.error(f"Не вдалося записати {len(sheet_entries)} змін в аркуш {name}: {e}")
+                    self.stats['failed_flushes'] += 1
+                    done = False
+                    continue
+                ids = [entry.id for entry in sheet_entries]
+                self.journal.remove(ids)
+                with self._lock:
+                    self._unsent = max(self._unsent - len(ids), 0)
+                    futures = [self._futures.pop(entry_id, None) for entry_id in ids]
+                for future in futures:
+                    if future is not None:
+                        future.set_result(None)
+
+        if not done:
+            self._schedule(self.retry_delay)
+        return done
+
+    def _send(self, worksheet, entries: List[JournalEntry]):
+        # Нові рядки цілком і окремі клітинки; пізніша зміна перекриває ранішу
+        rewrite: Optional[List[List]] = None
+        rows: Dict[int, List] = {}
+        cells: Dict[int, Dict[int, object]] = {}
+        tail: List[JournalEntry] = []
+        for entry in entries:
+            if entry.op == 'rewrite':
+                # Новий вміст аркуша вже містить усі попередні зміни
+                rewrite = entry.value
+                rows.clear()
+                cells.clear()
+            elif entry.op == 'append_end':
+                tail.append(entry)
+            elif entry.op == 'append':
+                rows[entry.row] = list(entry.value)
+                cells.pop(entry.row, None)
+            elif entry.row in rows:
+                values = rows[entry.row]
+                values.extend([''] * (entry.col - len(values)))
+                values[entry.col - 1] = entry.value
+            else:
+                cells.setdefault(entry.row, {})[entry.col] = entry.value
+
+        if rewrite is not None:
+            # Порожній рядок затирає перший рядок даних: аркуш не стискається до самих заголовків
+            width = max((len(values) for values in rewrite), default=0)
+            rewrite = rewrite + [[''] * width] * max(FIRST_DATA_ROW - len(rewrite), 0)
+            worksheet.batch_update([{'range': _a1(1, 1), 'values': rewrite}],
+                                   value_input_option='USER_ENTERED')
+            worksheet.resize(rows=len(rewrite))
+            self.stats['api_calls'] += 2
+
+        # Нові рядки пишуться за номерами, тож сітку аркуша треба розширити заздалегідь
+        last_row = max(rows, default=0)
+        if last_row > worksheet.row_count:
+            worksheet.add_rows(last_row - worksheet.row_count + SHEETS_GRID_GROWTH)
+            self.stats['api_calls'] += 1
+
+        data = [{'range': _a1(row, 1), 'values': [values]} for row, values in sorted(rows.items())]
+        data += [{'range': _a1(row, col), 'values': [[value]]}
+                 for row in sorted(cells) for col, value in sorted(cells[row].items())]
+        if data:
+            worksheet.batch_update(data, value_input_option='USER_ENTERED')
+            self.stats['api_calls'] += 1
+
+        if tail:
+            if any(entry.sent for entry in tail):
+                tail = self._unconfirmed(worksheet, tail)
+            if tail:
+                self.journal.mark_sent(entry.id for entry in tail)
+                worksheet.append_rows([entry.value for entry in tail])
+                self.stats['api_calls'] += 1
+
+    def _unconfirmed(self, worksheet, tail: List[JournalEntry]) -> List[JournalEntry]:
+        """Відкидає рядки, які перервана відправка вже встигла дописати в аркуш"""
+        sent = [entry for entry in tail if entry.sent]
+        existing = worksheet.get_all_values()
+        self.stats['api_calls'] += 1
+
+        # Порівнюємо лише текстові колонки (час, користувач, назва): їх Sheets не переформатовує
+        def text_key(cells, values):
+            return tuple(str(cell) for cell, value in zip(cells, values) if isinstance(value, str))
+
+        written = Counter(text_key(row, sent[0].value) for row in existing[-len(sent):])
+        result = []
+        for entry in tail:
+            key = text_key(entry.value, entry.value)
+            if entry.sent and written[key] > 0:
+                written[key] -= 1
+            else:
+                result.append(entry)
+        return result
+
+    def close(self):
+        """Зупиняє таймер і відправляє все, що лишилось у журналі"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.flush()
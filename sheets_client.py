@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Квота проєкту на запити до Sheets API за хвилину і допустимий сплеск
+SHEETS_QUOTA_PER_MINUTE = int(os.getenv('SHEETS_QUOTA_PER_MINUTE', '60'))
+SHEETS_BURST = int(os.getenv('SHEETS_BURST', '10'))
+SHEETS_MAX_RETRIES = int(os.getenv('SHEETS_MAX_RETRIES', '5'))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 32.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Пріоритети: менше число обслуговується раніше
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+_context = threading.local()
+
+
+@contextmanager
+def priority(level: int):
+    """Виклики API в цьому блоці (у поточному потоці) йдуть з заданим пріоритетом"""
+    previous = getattr(_context, 'priority', INTERACTIVE)
+    _context.priority = level
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+def current_priority() -> int:
+    return getattr(_context, 'priority', INTERACTIVE)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+class SheetsClient:
+    """Прошарок між kitchen_core і gspread, що тримається в межах квоти
+
+    Кожен виклик API спершу бере токен із відра, яке наповнюється зі
+    швидкістю квоти. Коли токенів бракує, першими їх отримують
+    інтерактивні запити, а фонові записи та синхронізації чекають. На 429
+    та 5xx виклик повторюється з експоненційною затримкою і випадковим
+    розкидом, а відро спорожнюється, щоб пригальмували всі потоки.
+    """
+
+    def __init__(self, quota_per_minute: Optional[int] = SHEETS_QUOTA_PER_MINUTE,
+                 burst: int = SHEETS_BURST, max_retries: int = SHEETS_MAX_RETRIES):
+        self.rate = quota_per_minute / 60.0 if quota_per_minute else None
+        self.capacity = max(burst, 1)
+        self.max_retries = max_retries
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._random = random.Random()
+        self.metrics = {
+            'calls': 0,
+            'retries': 0,
+            'failures': 0,
+            'max_queue_depth': 0,
+            'wait_seconds': {name: 0.0 for name in PRIORITY_NAMES.values()},
+            'waits': {name: 0 for name in PRIORITY_NAMES.values()},
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, level: int) -> float:
+        """Чекає на токен; повертає час очікування в секундах"""
+        if self.rate is None:
+            return 0.0
+        started = time.monotonic()
+        with self._condition:
+            ticket = (level, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], len(self._waiters))
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket:
+                    if self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        # Наступний у черзі перевіряє, чи лишились токени
+                        self._condition.notify_all()
+                        break
+                    self._condition.wait((1 - self._tokens) / self.rate)
+                else:
+                    self._condition.wait()
+
+        waited = time.monotonic() - started
+        name = PRIORITY_NAMES.get(level, str(level))
+        self.metrics['wait_seconds'][name] = self.metrics['wait_seconds'].get(name, 0.0) + waited
+        self.metrics['waits'][name] = self.metrics['waits'].get(name, 0) + 1
+        return waited
+
+    def _throttle(self):
+        """Після 429 спорожнює відро: квота вичерпана для всіх"""
+        if self.rate is None:
+            return
+        with self._condition:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Виконує виклик API з урахуванням квоти, пріоритету і повторів"""
+        level = current_priority()
+        for attempt in range(self.max_retries + 1):
+            self.acquire(level)
+            self.metrics['calls'] += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                status = _status_code(e)
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    self.metrics['failures'] += 1
+                    raise
+                if status == 429:
+                    self._throttle()
+                delay = self._random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                self.metrics['retries'] += 1
+                logger.warning(f"Sheets API відповів {status}, повтор через {delay:.1f} с")
+                time.sleep(delay)
+
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._waiters)
+
+    def stats(self) -> Dict:
+        """Метрики: виклики, повтори, глибина черги і середнє очікування за пріоритетами"""
+        stats = dict(self.metrics)
+        stats['queue_depth'] = self.queue_depth()
+        stats['avg_wait_seconds'] = {
+            name: round(self.metrics['wait_seconds'][name] / count, 4) if count else 0.0
+            for name, count in self.metrics['waits'].items()
+        }
+        return stats
+
+    def wrap(self, target):
+        return LimitedProxy(target, self)
+
+
+class LimitedProxy:
+    """Проксі для таблиці чи аркуша: кожен метод викликається через SheetsClient"""
+
+    def __init__(self, target, client: SheetsClient):
+        self._target = target
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._client.call(attr, *args, **kwargs)
+
+        return call
@@ -0,0 +1,51 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumption import ConsumptionLog  # noqa: E402
+from database import SHEET_HEADERS, Database, KitchenDatabase  # noqa: E402
+from fake_sheets import FakeClient  # noqa: E402
+from inventory_store import InventoryStore  # noqa: E402
+from sheet_journal import SheetJournal  # noqa: E402
+from sheets_cache import SheetWriter  # noqa: E402
+from sheets_client import SheetsClient  # noqa: E402
+
+SPREADSHEET_ID = 'tests'
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Чиста база з базовими рецептами у тимчасовому каталозі"""
+    database = Database(str(tmp_path / 'kitchen.db'))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def mirror(tmp_path, db):
+    """InventoryStore з дзеркалом у fake_sheets; таймер запису вимкнено, flush() викликає тест"""
+    client = FakeClient(seed=1)
+    spreadsheet = client.open_by_key(SPREADSHEET_ID)
+    for name, headers in SHEET_HEADERS.items():
+        spreadsheet.seed_worksheet(name, [headers])
+    # Без квоти й повторів: відмова fake_sheets одразу стає відмовою flush()
+    sheets = KitchenDatabase(SPREADSHEET_ID, client=client, sheets=SheetsClient(quota_per_minute=None, max_retries=0))
+    writer = SheetWriter(SheetJournal(db), flush_window=3600, retry_delay=3600)
+    writer.register('products', sheets.get_products_sheet)
+    writer.register('shopping', sheets.get_shopping_sheet)
+    writer.register('logs', sheets.get_logs_sheet)
+    consumption_log = ConsumptionLog(db, str(tmp_path / 'segments'))
+    store = InventoryStore(db, consumption_log, writer)
+    consumption_log.backfill(sheets.get_logs_sheet().get_all_records())
+    store.import_mirror('products', sheets.get_products_sheet())
+    store.import_mirror('shopping', sheets.get_shopping_sheet())
+    writer.flush()
+    yield SimpleNamespace(client=client, spreadsheet=spreadsheet, writer=writer, store=store,
+                          consumption_log=consumption_log, journal=writer.journal)
+    client.error_rate = 0.0
+    writer.close()
+    consumption_log.close()
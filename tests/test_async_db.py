@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_db import AsyncFacade, create_db_executor
+
+
+class Target:
+    label = 'ціль'
+
+    def where(self, value, suffix=''):
+        return threading.current_thread().name, value + suffix
+
+    def fail(self):
+        raise LookupError('немає рецепта')
+
+
+@pytest.fixture
+def executor():
+    pool = create_db_executor(max_workers=2)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_calls_run_in_the_pool_off_the_loop(executor):
+    facade = AsyncFacade(Target(), executor)
+
+    async def main():
+        loop_thread = threading.current_thread().name
+        thread, value = await facade.where('борщ', suffix='у')
+        return loop_thread, thread, value
+
+    loop_thread, thread, value = asyncio.run(main())
+    assert value == 'борщу'
+    assert thread != loop_thread
+    assert thread.startswith('db')
+
+
+def test_loop_keeps_running_while_a_call_blocks(executor):
+    release = threading.Event()
+
+    class Slow:
+        def wait(self):
+            release.wait(5)
+            return 'готово'
+
+    facade = AsyncFacade(Slow(), executor)
+
+    async def main():
+        call = asyncio.ensure_future(facade.wait())
+        # Цикл подій не заблоковано: інша корутина виконується, поки виклик чекає
+        await asyncio.sleep(0.01)
+        assert not call.done()
+        release.set()
+        return await call
+
+    assert asyncio.run(main()) == 'готово'
+
+
+def test_exceptions_propagate_to_the_caller(executor):
+    facade = AsyncFacade(Target(), executor)
+
+    async def main():
+        with pytest.raises(LookupError, match='немає рецепта'):
+            await facade.fail()
+
+    asyncio.run(main())
+
+
+def test_plain_attributes_are_returned_as_is(executor):
+    facade = AsyncFacade(Target(), executor)
+    assert facade.label == 'ціль'
+    assert facade.where.__name__ == 'where'
+
+
+def test_database_calls_through_the_facade(db, executor):
+    facade = AsyncFacade(db, executor)
+    recipes = asyncio.run(facade.get_recipes('борщ'))
+    assert [recipe[1] for recipe in recipes] == ['Борщ']
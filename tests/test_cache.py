@@ -0,0 +1,62 @@
+from cache import LRUCache, estimate_size
+
+
+def _expected_bytes(cache):
+    return sum(estimate_size(cache.get(key)) for key in list(cache._data))
+
+
+def test_estimate_size_counts_nested_values():
+    flat = estimate_size([])
+    nested = estimate_size([{'a': 'борщ'}, ('x', 1)])
+    assert nested > flat + estimate_size('борщ')
+
+
+def test_bytes_follow_puts_replacements_and_clear():
+    cache = LRUCache(max_items=10)
+    cache.put('a', 'x' * 100)
+    cache.put('b', ['y'] * 10)
+    assert cache.bytes == estimate_size('x' * 100) + estimate_size(['y'] * 10)
+
+    cache.put('a', 'z')
+    assert cache.bytes == estimate_size('z') + estimate_size(['y'] * 10)
+    assert cache.bytes == _expected_bytes(cache)
+
+    cache.clear()
+    assert cache.bytes == 0
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used_by_bytes():
+    item = 'x' * 1000
+    size = estimate_size(item)
+    cache = LRUCache(max_items=100, max_bytes=size * 3)
+    for key in 'abc':
+        cache.put(key, item)
+    cache.get('a')
+    cache.put('d', item)
+
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.bytes == size * 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_by_item_count():
+    cache = LRUCache(max_items=2)
+    for key in range(5):
+        cache.put(key, key)
+    assert list(cache._data) == [3, 4]
+    assert cache.bytes == _expected_bytes(cache)
+
+
+def test_oversized_value_is_not_cached():
+    cache = LRUCache(max_items=10, max_bytes=100)
+    cache.put('small', 1)
+    cache.put('big', 'x' * 1000)
+    assert 'big' not in cache
+    assert cache.bytes == estimate_size(1)
+
+    # Заміна на завелике значення прибирає старе і не лишає його розміру
+    cache.put('small', 'x' * 1000)
+    assert 'small' not in cache
+    assert cache.bytes == 0
@@ -0,0 +1,132 @@
+import threading
+
+from dish_resolver import DishResolver, TrigramIndex, dish_keys
+
+
+def _add_recipe(db, name, aliases=()):
+    conn = db.get_connection()
+    recipe_id = conn.execute(
+        "INSERT INTO recipes (name, instructions) VALUES (?, 'Приготувати')", (name,)
+    ).lastrowid
+    conn.executemany('INSERT INTO recipe_aliases (recipe_id, alias) VALUES (?, ?)',
+                     [(recipe_id, alias) for alias in aliases])
+    conn.commit()
+    return recipe_id
+
+
+def _changes(db):
+    return db.get_connection().execute('SELECT COUNT(*) FROM recipe_changes').fetchone()[0]
+
+
+def _top(resolver, text):
+    found = resolver.resolve(text, k=1)
+    return found[0][2] if found else None
+
+
+def test_refresh_applies_only_new_changes(db):
+    resolver = DishResolver(db)
+    resolver.refresh()
+    generation = resolver.generation
+    assert _top(resolver, 'борщ') == 'Борщ'
+
+    # Без змін оновлення нічого не робить
+    resolver.refresh()
+    assert resolver.generation == generation
+
+    recipe_id = _add_recipe(db, 'Деруни', aliases=['картопляні млинці'])
+    # Пошук не звертається до бази: до оновлення нового рецепта немає
+    assert _top(resolver, 'деруни') is None
+    resolver.refresh()
+    assert resolver.generation == generation + 1
+    assert _top(resolver, 'деруни') == 'Деруни'
+    assert _top(resolver, 'картопляні млинці') == 'Деруни'
+
+    conn = db.get_connection()
+    conn.execute("UPDATE recipes SET name = 'Деруни зі сметаною' WHERE id = ?", (recipe_id,))
+    conn.commit()
+    resolver.refresh()
+    assert _top(resolver, 'деруни зі сметаною') == 'Деруни зі сметаною'
+
+    conn.execute('DELETE FROM recipe_aliases WHERE recipe_id = ?', (recipe_id,))
+    conn.execute('DELETE FROM recipes WHERE id = ?', (recipe_id,))
+    conn.commit()
+    resolver.refresh()
+    assert _top(resolver, 'деруни зі сметаною') is None
+
+
+def test_incremental_index_matches_full_rebuild(db):
+    resolver = DishResolver(db)
+    resolver.refresh()
+    ids = [_add_recipe(db, f'Салат номер {i}', aliases=[f'салатик {i}']) for i in range(20)]
+    conn = db.get_connection()
+    conn.executemany('DELETE FROM recipes WHERE id = ?', [(recipe_id,) for recipe_id in ids[::3]])
+    conn.execute("UPDATE recipes SET name = 'Олівʼє святковий' WHERE id = ?", (ids[1],))
+    conn.commit()
+    resolver.refresh()
+
+    rebuilt = DishResolver(db)
+    rebuilt.refresh()
+    for query in ('салат номер 4', 'салатик 7', 'олівʼє', 'святковий', 'вареники', 'борщ'):
+        assert resolver.resolve(query) == rebuilt.resolve(query)
+
+
+def test_refresh_only_reads_and_prune_keeps_the_last_change(db):
+    resolver = DishResolver(db)
+    resolver.refresh()
+    for name in ('Юшка', 'Банош', 'Капусняк'):
+        _add_recipe(db, name)
+    before = _changes(db)
+    resolver.refresh()
+    assert _changes(db) == before
+
+    assert resolver.prune() == before - 1
+    assert _changes(db) == 1
+    # Останній запис - позначка: наступне оновлення бачить, що нового немає
+    generation = resolver.generation
+    resolver.refresh()
+    assert resolver.generation == generation
+    assert _top(resolver, 'капусняк') == 'Капусняк'
+
+
+def test_trigram_index_remove_forgets_shared_keys():
+    index = TrigramIndex()
+    index.add(1, 'Вареники з вишнями', dish_keys('Вареники з вишнями'))
+    index.add(2, 'Вареники з картоплею', dish_keys('Вареники з картоплею'))
+    index.remove(1)
+    assert [item for _, item, _ in index.search('вареники з вишнями')] == [2]
+    index.remove(2)
+    assert index.search('вареники') == []
+    assert len(index) == 0
+
+
+def test_search_is_not_blocked_by_a_full_rebuild(db, monkeypatch):
+    resolver = DishResolver(db)
+    resolver.refresh()
+    for i in range(3):
+        _add_recipe(db, f'Юшка {i}')
+    monkeypatch.setattr('dish_resolver.REBUILD_THRESHOLD', 0)
+
+    loading = threading.Event()
+    release = threading.Event()
+    load = resolver._load
+
+    def slow_load(recipe_ids=None):
+        loading.set()
+        release.wait(5)
+        return load(recipe_ids)
+
+    monkeypatch.setattr(resolver, '_load', slow_load)
+    worker = threading.Thread(target=resolver.refresh)
+    worker.start()
+    try:
+        assert loading.wait(5)
+        # Поки новий індекс будується, пошук іде по старому індексу
+        searched = []
+        searcher = threading.Thread(target=lambda: searched.append(_top(resolver, 'борщ')))
+        searcher.start()
+        searcher.join(1)
+        assert searched == ['Борщ']
+    finally:
+        release.set()
+        worker.join(5)
+    assert _top(resolver, 'юшка 2') == 'Юшка 2'
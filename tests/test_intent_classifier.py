@@ -0,0 +1,125 @@
+import ast
+import os
+import re
+
+import pytest
+
+from dish_resolver import DishResolver
+from nlp_processor import DEFAULT_SUGGESTIONS, NLPProcessor
+
+np = pytest.importorskip('numpy')
+
+from intent_classifier import IntentClassifier  # noqa: E402
+
+CORPUS = [
+    ('рецепт борщу', 'recipe'), ('як приготувати вареники', 'recipe'), ('рецепт млинців', 'recipe'),
+    ('як зварити суп', 'recipe'), ('дай рецепт плову', 'recipe'),
+    ('чим замінити молоко', 'substitution'), ('заміна для цукру', 'substitution'),
+    ('немає яєць', 'substitution'), ('чим замінити масло', 'substitution'), ('замість сметани', 'substitution'),
+    ('привіт', 'unknown'), ('дякую', 'unknown'), ('як справи', 'unknown'), ('хто ти', 'unknown'),
+    ('добре', 'unknown'),
+]
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    texts, labels = zip(*CORPUS)
+    return IntentClassifier.train(texts, labels)
+
+
+def _processor(classifier, threshold):
+    processor = NLPProcessor(intent_model=None, intent_confidence=threshold)
+    processor.intent_classifier = classifier
+    return processor
+
+
+def test_probabilities_are_calibrated(classifier):
+    assert classifier.temperature > 0
+    (intent, confident), = classifier.predict(['рецепт борщу'])
+    assert intent == 'recipe'
+    # Повідомлення без знайомих n-грам не отримує впевненої відповіді
+    (_, unsure), = classifier.predict(['ґґґ ххх'])
+    assert unsure < confident
+    assert unsure < 0.6
+
+
+def test_classifier_decides_above_the_threshold(classifier):
+    # Ключові слова кажуть «рецепт», класифікатор - «заміна»
+    processor = _processor(classifier, 0.5)
+    probabilities = {'recipe': 0.1, 'substitution': 0.8, 'unknown': 0.1}
+    assert processor._detect_intent('рецепт без молока', probabilities=probabilities) == 'substitution'
+
+
+def test_keywords_decide_below_the_threshold(classifier):
+    processor = _processor(classifier, 0.9)
+    probabilities = {'recipe': 0.1, 'substitution': 0.8, 'unknown': 0.1}
+    assert processor._detect_intent('рецепт без молока', probabilities=probabilities) == 'recipe'
+    assert processor._detect_intent('ґґґ ххх', probabilities=probabilities) == 'unknown'
+
+
+def test_threshold_applies_to_trained_model(classifier):
+    message = 'як приготувати вареники'
+    (intent, confidence), = classifier.predict([message])
+    assert intent == 'recipe'
+
+    assert _processor(classifier, confidence)._detect_intent(message, scores={}) == 'recipe'
+    # Той самий текст без збігів ключових слів нижче порогу стає unknown
+    assert _processor(classifier, confidence + 0.01)._detect_intent(message, scores={}) == 'unknown'
+
+
+def test_save_and_load_keep_temperature(classifier, tmp_path):
+    path = str(tmp_path / 'model.npz')
+    classifier.save(path)
+    loaded = IntentClassifier.load(path)
+    assert loaded.temperature == pytest.approx(classifier.temperature)
+    assert loaded.labels == classifier.labels
+    np.testing.assert_allclose(loaded.predict_proba(['рецепт борщу']), classifier.predict_proba(['рецепт борщу']))
+
+
+def _bot_phrases():
+    """Фрази кнопок і прикладів з main.py; сам main.py імпортує telegram, тож читаємо його текст"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+    with open(path, encoding='utf-8') as f:
+        module = ast.parse(f.read())
+    constants = {
+        node.targets[0].id: ast.literal_eval(node.value)
+        for node in module.body
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name)
+        and node.targets[0].id in ('WELCOME_MESSAGE', 'EXAMPLES_MESSAGE', 'RECIPE_SUGGESTIONS')
+    }
+    return list(dict.fromkeys(
+        [phrase for _, phrase in constants['RECIPE_SUGGESTIONS']]
+        + DEFAULT_SUGGESTIONS
+        + re.findall(r'• "([^"]+)"', constants['WELCOME_MESSAGE'] + constants['EXAMPLES_MESSAGE'])
+    ))
+
+
+@pytest.fixture
+def shipped(db):
+    resolver = DishResolver(db)
+    resolver.refresh()
+    processor = NLPProcessor(resolver)
+    if processor._classifier() is None:
+        pytest.skip('intent_model.npz не знайдено')
+    return processor, NLPProcessor(resolver, intent_model=None)
+
+
+@pytest.mark.parametrize('phrase', _bot_phrases() + ['рис'])
+def test_shipped_model_agrees_with_keywords_on_bot_phrases(shipped, phrase):
+    processor, keywords = shipped
+    result = processor.process_message(phrase)
+    expected = keywords.process_message(phrase)
+    if expected['intent'] == 'unknown':
+        # Тут ключові слова безсилі, класифікатор може лише покращити відповідь
+        assert processor._is_actionable(result['intent'], result['parameters'])
+    else:
+        assert (result['intent'], result['parameters']) == (expected['intent'], expected['parameters'])
+
+
+def test_intent_without_handler_falls_back_to_keywords(classifier):
+    processor = _processor(classifier, 0.5)
+    assert processor._parse('поради для борщу', {'ingredients': 1.0})['intent'] == 'recipe'
+    # Заміна без інгредієнта нічого не дасть
+    result = processor._parse('рис', {'substitution': 0.99, 'recipe': 0.01})
+    assert result['intent'] == 'recipe'
+    assert result['parameters']['dish'] == 'рис'
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+import kitchen_core
+from consumption import ConsumptionLog
+from database import SHEET_HEADERS, Database, KitchenDatabase
+from fake_sheets import FakeClient
+from sheets_client import SheetsClient
+
+
+def _rows(mirror, sheet):
+    """Рядки даних аркуша без заголовка"""
+    return mirror.spreadsheet._worksheets[sheet].values[1:]
+
+
+def _live(mirror, sheet):
+    return [row for row in _rows(mirror, sheet) if row and row[0]]
+
+
+def test_changes_reach_the_sheet_in_one_batch(mirror):
+    with mirror.store.transaction():
+        mirror.store.add_product(1, 'молоко', 1000, 'мл', '2030-01-01', '2030-01-01')
+        mirror.store.add_product(1, 'хліб', 1, 'шт', '', '2030-01-01')
+    mirror.client.reset_counters()
+
+    assert mirror.writer.flush()
+    assert mirror.client.calls['batch_update'] == 1
+    assert [row[1] for row in _live(mirror, 'products')] == ['молоко', 'хліб']
+    assert mirror.journal.count() == 0
+
+
+def test_journal_is_replayed_after_failure(mirror):
+    product_id = mirror.store.add_product(1, 'молоко', 1000, 'мл', '', '2030-01-01')
+    mirror.store.update_product_quantity(product_id, 500)
+    mirror.store.log_action(1, 'молоко', -500, 'мл', 'remove')
+
+    mirror.client.error_rate = 1.0
+    mirror.client.error_status = 503
+    assert not mirror.writer.flush()
+    assert _rows(mirror, 'products') == []
+    assert mirror.journal.count() == 3
+
+    mirror.client.error_rate = 0.0
+    assert mirror.writer.flush()
+    assert mirror.journal.count() == 0
+    assert _live(mirror, 'products') == [['1', 'молоко', '500', 'мл', '', '2030-01-01']]
+    assert [row[2] for row in _rows(mirror, 'logs')] == ['молоко']
+
+
+def test_delete_leaves_a_tombstone_and_keeps_row_numbers(mirror):
+    ids = [mirror.store.add_product(1, name, 1, 'шт', '', '2030-01-01') for name in ('а', 'б', 'в')]
+    assert mirror.writer.flush()
+
+    mirror.store.delete_product(ids[1])
+    mirror.store.update_product_quantity(ids[2], 7)
+    assert mirror.writer.flush()
+
+    rows = _rows(mirror, 'products')
+    assert len(rows) == 3
+    assert rows[1][0] == ''
+    assert rows[2][:3] == ['1', 'в', '7']
+    assert [product['product_name'] for product in mirror.store.list_products(1)] == ['а', 'в']
+
+
+def test_compact_mirror_drops_tombstones(mirror):
+    ids = [mirror.store.add_product(1, f'продукт{i}', 1, 'шт', '', '2030-01-01') for i in range(5)]
+    for product_id in ids[:3]:
+        mirror.store.delete_product(product_id)
+    assert mirror.writer.flush()
+
+    assert mirror.store.compact_mirror('products') == 3
+    assert _rows(mirror, 'products') == _live(mirror, 'products')
+    assert [row[1] for row in _rows(mirror, 'products')] == ['продукт3', 'продукт4']
+    assert mirror.spreadsheet._worksheets['products'].values[0] == SHEET_HEADERS['products']
+
+    # Після стискання зміни йдуть у нові номери рядків
+    mirror.store.update_product_quantity(ids[4], 9)
+    mirror.store.add_product(1, 'новий', 1, 'шт', '', '2030-01-01')
+    assert mirror.writer.flush()
+    assert [(row[1], float(row[2])) for row in _rows(mirror, 'products')] == [
+        ('продукт3', 1.0), ('продукт4', 9.0), ('новий', 1.0)
+    ]
+    assert mirror.store.compact_mirror('products') == 0
+
+
+def test_rolled_back_action_leaves_no_trace(mirror):
+    with pytest.raises(RuntimeError):
+        with mirror.store.transaction():
+            mirror.store.add_product(1, 'хліб', 1, 'шт', '', '2030-01-01')
+            mirror.store.log_action(1, 'хліб', 1, 'шт', 'add')
+            raise RuntimeError
+    with mirror.store.transaction():
+        mirror.store.log_action(1, 'молоко', 2, 'л', 'add')
+
+    assert mirror.store.list_products(1) == []
+    assert mirror.journal.count() == 1
+    segments = mirror.consumption_log.segment_dir
+    logged = ''.join(open(os.path.join(segments, name), encoding='utf-8').read() for name in os.listdir(segments))
+    assert 'хліб' not in logged and 'молоко' in logged
+    assert mirror.store.consumption_stats(1)['added'] == [{'product': 'молоко', 'quantity': 2.0}]
+
+
+def test_store_works_while_sheets_are_down(tmp_path, monkeypatch):
+    client = FakeClient(seed=1, error_status=503)
+    spreadsheet = client.open_by_key('tests')
+    for name, headers in SHEET_HEADERS.items():
+        spreadsheet.seed_worksheet(name, [headers])
+    spreadsheet.seed_worksheet('products', [SHEET_HEADERS['products'], ['1', 'хліб', '1', 'шт', '', '2030-01-01']])
+    for name in ('db', 'local_db', 'writer', 'store', '_consumption_log', '_import_thread'):
+        monkeypatch.setattr(kitchen_core, name, None, raising=False)
+    monkeypatch.setattr(kitchen_core, 'SHEETS_IMPORT_RETRY', 0.01)
+    client.error_rate = 1.0
+    local = Database(str(tmp_path / 'kitchen.db'))
+    consumption_log = ConsumptionLog(local, str(tmp_path / 'segments'))
+    sheets = KitchenDatabase('tests', client=client, sheets=SheetsClient(quota_per_minute=None, max_retries=0))
+    kitchen_core.use_database(sheets, local, consumption_log)
+    try:
+        # Google недоступний, але запаси вже працюють локально
+        store = kitchen_core.get_store()
+        store.add_product(1, 'молоко', 1, 'л', '', '2030-01-01')
+        store.log_action(1, 'молоко', 1, 'л', 'add')
+        assert [product['product_name'] for product in store.list_products(1)] == ['молоко']
+        assert store.writer.journal.count() == 0
+
+        client.error_rate = 0.0
+        assert kitchen_core.wait_for_import(5)
+        assert kitchen_core.flush_writes()
+        # Локальний рядок дописано після перенесених, номери рядків не збіглися
+        assert [row[1] for row in spreadsheet._worksheets['products'].values[1:]] == ['хліб', 'молоко']
+        assert sorted(product['product_name'] for product in store.list_products(1)) == ['молоко', 'хліб']
+    finally:
+        kitchen_core.close()
+        consumption_log.close()
+        local.close()
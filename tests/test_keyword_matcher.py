@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from keyword_matcher import KeywordMatcher
+
+
+def _brute_force(terms, text):
+    result = []
+    for term, label in terms:
+        start = text.find(term)
+        while start != -1:
+            result.append((start, start + len(term), term, label))
+            start = text.find(term, start + 1)
+    return sorted(result)
+
+
+def _found(matcher, text):
+    return sorted((m.start, m.end, m.term, m.label) for m in matcher.find(text))
+
+
+def test_overlapping_and_nested_terms():
+    terms = [('замін', 'sub'), ('замінити', 'sub'), ('чим замінити', 'sub'), ('ити', 'x'), ('рецепт', 'recipe')]
+    matcher = KeywordMatcher()
+    for term, label in terms:
+        matcher.add(term, label)
+    text = 'чим замінити молоко в рецепті? замінити!'
+    assert _found(matcher, text) == _brute_force(terms, text)
+
+
+def test_term_with_several_labels_and_weights():
+    matcher = KeywordMatcher()
+    matcher.add('склад', 'ingredients')
+    matcher.add('склад', 'inventory', weight=1.5)
+    matches = matcher.find('склад борщу')
+    assert {(m.label, m.weight) for m in matches} == {('ingredients', 5.0), ('inventory', 1.5)}
+    assert KeywordMatcher.scores(matches) == {'ingredients': 5.0, 'inventory': 1.5}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_dictionaries_match_brute_force(seed):
+    rng = random.Random(seed)
+    alphabet = 'абвк '
+    terms = list({(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))).strip() or 'а',
+                   rng.choice('xyz')) for _ in range(60)})
+    matcher = KeywordMatcher()
+    for term, label in terms:
+        matcher.add(term, label)
+    for _ in range(30):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert _found(matcher, text) == _brute_force(terms, text)
+
+
+def test_terms_added_after_search_are_found():
+    matcher = KeywordMatcher()
+    matcher.add('борщ', 'dish')
+    assert [m.term for m in matcher.find('борщ і суп')] == ['борщ']
+    matcher.add('суп', 'dish')
+    assert [m.term for m in matcher.find('борщ і суп')] == ['борщ', 'суп']
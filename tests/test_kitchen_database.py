@@ -0,0 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from database import SHEET_HEADERS, KitchenDatabase
+from fake_sheets import FakeClient
+from sheets_client import SheetsClient
+
+
+def test_concurrent_callers_create_a_missing_sheet_once():
+    # Затримка API, щоб потоки перетнулись між перевіркою і створенням аркуша
+    client = FakeClient(latency=0.05, seed=1)
+    sheets = KitchenDatabase('tests', client=client, sheets=SheetsClient(quota_per_minute=None, max_retries=0))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        worksheets = list(executor.map(lambda _: sheets.get_logs_sheet(), range(4)))
+    assert client.calls['add_worksheet'] == 1
+    assert all(worksheet is worksheets[0] for worksheet in worksheets)
+    # Заголовки дописано один раз
+    assert sheets.get_spreadsheet()._worksheets['logs'].values == [SHEET_HEADERS['logs']]
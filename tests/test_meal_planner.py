@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+from consumption import ConsumptionLog
+from inventory_store import InventoryStore
+from meal_planner import MealPlanner, solve_meal_plan
+
+
+def _add_recipe(db, name, ingredients, servings=2):
+    conn = db.get_connection()
+    recipe_id = conn.execute(
+        "INSERT INTO recipes (name, instructions, servings, category) VALUES (?, 'Приготувати', ?, 'тест')",
+        (name, servings)
+    ).lastrowid
+    conn.executemany('''
+        INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity, unit, ingredient_lemma)
+        VALUES (?, ?, ?, ?, NULL)
+    ''', [(recipe_id, ingredient, quantity, 'г') for ingredient, quantity in ingredients])
+    conn.commit()
+    db.init_database()
+    return recipe_id
+
+
+def _store(db, tmp_path):
+    return InventoryStore(db, ConsumptionLog(db, str(tmp_path / 'segments')))
+
+
+def test_inflected_stock_counts_for_capitalized_ingredients(db, tmp_path):
+    recipe_id = _add_recipe(db, 'Рагу тестове', [('Морква', 200), ('Курка', 500)])
+    store = _store(db, tmp_path)
+    soon = (date.today() + timedelta(days=1)).isoformat()
+    store.add_product(1, 'моркви', 300, 'г', soon)
+    store.add_product(1, '[МОРОЗИЛКА] курки', 1000, 'г')
+    # Запаси іншого користувача не враховуються
+    store.add_product(2, 'картопля', 1000, 'г')
+
+    planner = MealPlanner(db)
+    inputs = planner.load_inputs(1, category='тест')
+    assert [recipe for recipe, _ in inputs['candidates']] == [recipe_id]
+    ingredients = dict(inputs['candidates'])[recipe_id]
+    assert set(ingredients) <= set(inputs['stock'])
+    assert set(inputs['expiring']) == {ingredients[0]}
+
+    start = date.today()
+    plan = solve_meal_plan(inputs['candidates'], inputs['stock'], inputs['expiring'], days=1, seed=1)
+    planner.save_plan(1, start, plan)
+    week = {name: in_stock for name, _, _, in_stock in planner.get_week_ingredients(1, start)}
+    assert week == {'Морква': 300, 'Курка': 1000}
+
+
+def test_recipes_with_more_stocked_ingredients_rank_first(db, tmp_path):
+    full = _add_recipe(db, 'Салат з буряка', [('Буряк', 1), ('Часник', 1)])
+    half = _add_recipe(db, 'Салат з капусти', [('Капуста', 1), ('Часник', 1)])
+    none = _add_recipe(db, 'Салат з редьки', [('Редька', 1)])
+    store = _store(db, tmp_path)
+    store.add_product(1, 'буряки', 2, 'шт')
+    store.add_product(1, 'часнику', 1, 'шт')
+
+    candidates = MealPlanner(db).load_inputs(1, category='тест')['candidates']
+    assert [recipe for recipe, _ in candidates] == [full, half, none]
+    assert MealPlanner(db).load_inputs(1, category='тест', limit=1)['candidates'][0][0] == full
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+
+import migrations
+import ua_stemmer
+from database import Database
+
+
+def _schema(conn):
+    return sorted(conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+    ).fetchall())
+
+
+def _has_column(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def _migrate_to(conn, version):
+    """Застосовує перші version кроків так само, як migrations.migrate()"""
+    for number, step in enumerate(migrations.MIGRATIONS[:version], start=1):
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        step(cursor)
+        cursor.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
+
+
+def test_fresh_database_is_at_latest_version(db):
+    conn = db.get_connection()
+    assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+    assert db.get_recipes()
+    # Повторний запуск нічого не змінює
+    assert migrations.migrate(conn) is False
+
+
+def test_lemma_triggers_are_gone(db):
+    triggers = db.get_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%lemma%'"
+    ).fetchall()
+    assert triggers == []
+
+
+@pytest.mark.parametrize('version', range(1, migrations.SCHEMA_VERSION))
+def test_upgrade_from_each_version(tmp_path, version):
+    fresh = sqlite3.connect(str(tmp_path / 'fresh.db'))
+    migrations.migrate(fresh)
+
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    _migrate_to(conn, version)
+    assert migrations.get_version(conn) == version
+    # Дані, записані старою версією бота
+    conn.execute("INSERT INTO recipes (name, instructions, category) VALUES ('Борщ', 'Зварити', 'супи')")
+    recipe_id = conn.execute('SELECT id FROM recipes').fetchone()[0]
+    conn.execute("INSERT INTO recipe_ingredients (recipe_id, ingredient_name, quantity, unit) "
+                 "VALUES (?, 'буряк', 2, 'шт')", (recipe_id,))
+    conn.execute("INSERT INTO substitutions (original_ingredient, substitute, ratio) VALUES ('цукор', 'мед', 0.7)")
+    conn.execute("INSERT INTO products (name, quantity) VALUES ('[МОРОЗИЛКА]  М''ясо', 1)")
+    had_name_norm = _has_column(conn, 'products', 'name_norm')
+    conn.commit()
+
+    assert migrations.migrate(conn) is True
+    assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+    assert _schema(conn) == _schema(fresh)
+    if not had_name_norm:
+        assert conn.execute('SELECT name_norm FROM products').fetchone()[0] == "м'ясо"
+    assert conn.execute('SELECT name_lemma FROM recipes').fetchone()[0] == ua_stemmer.lemma('Борщ')
+    assert conn.execute('SELECT original_lemma FROM substitutions').fetchone()[0] == 'цукр'
+    assert conn.execute(
+        "SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH '\"бур\"*'"
+    ).fetchall() == [(recipe_id,)]
+    conn.close()
+    fresh.close()
+
+
+def test_rows_inserted_without_lemmas_are_filled_at_startup(tmp_path):
+    path = str(tmp_path / 'kitchen.db')
+    Database(path).close()
+    # Вставка з з'єднання без жодних функцій бота (як із консолі sqlite3)
+    raw = sqlite3.connect(path)
+    raw.execute("INSERT INTO substitutions (original_ingredient, substitute, ratio) "
+                "VALUES ('томатна паста', 'кетчуп', 1)")
+    raw.commit()
+    raw.close()
+
+    db = Database(path)
+    try:
+        assert db.get_connection().execute(
+            'SELECT COUNT(*) FROM substitutions WHERE original_lemma IS NULL'
+        ).fetchone()[0] == 0
+        assert [row[0] for row in db.get_substitutions('паста')] == ['кетчуп']
+        assert [row[0] for row in db.get_substitutions('цукру')] == ['мед']
+    finally:
+        db.close()
+
+
+def test_startup_leaves_no_open_transaction(tmp_path):
+    path = str(tmp_path / 'kitchen.db')
+    Database(path).close()
+    db = Database(path)
+    try:
+        conn = db.get_connection()
+        assert not conn.in_transaction
+        # Без відкритої транзакції з'єднання бачить свіжі записи інших з'єднань
+        other = sqlite3.connect(path)
+        other.execute("INSERT INTO products (name, name_norm, quantity) VALUES ('хліб', 'хліб', 1)")
+        other.commit()
+        other.close()
+        assert 'хліб' in [row[1] for row in db.get_products()]
+    finally:
+        db.close()
@@ -0,0 +1,29 @@
+import sqlite3
+
+from database import Database
+from nutrition import NutritionCalculator
+
+
+def test_ingredient_is_found_by_any_word_form(db):
+    calculator = NutritionCalculator(db)
+    carrot = calculator.get_ingredient_nutrition('морква')
+    assert carrot is not None
+    assert calculator.get_ingredient_nutrition('моркви') == carrot
+    assert calculator.get_ingredient_nutrition(' Морква ') == carrot
+    assert calculator.get_ingredient_nutrition('буряка')['calories'] == 43
+    assert calculator.get_ingredient_nutrition('ананас') is None
+
+
+def test_nutrition_inserted_without_lemma_is_found_after_restart(tmp_path):
+    path = str(tmp_path / 'kitchen.db')
+    Database(path).close()
+    raw = sqlite3.connect(path)
+    raw.execute("INSERT INTO nutrition (ingredient_name, calories_per_100g) VALUES ('квасоля', 298)")
+    raw.commit()
+    raw.close()
+
+    db = Database(path)
+    try:
+        assert NutritionCalculator(db).get_ingredient_nutrition('квасолі')['calories'] == 298
+    finally:
+        db.close()
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from database import Database
+from recipe_io import CatalogImporter
+
+
+def _write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def _recipes(count, start=0):
+    return [
+        {'name': f'Юшка рибна {i}', 'instructions': 'Зварити',
+         'ingredients': [{'name': 'риба', 'quantity': 1, 'unit': 'кг'}]}
+        for i in range(start, start + count)
+    ]
+
+
+def _objects(conn, kind):
+    return {row[0] for row in conn.execute('SELECT name FROM sqlite_master WHERE type = ?', (kind,))}
+
+
+def test_import_is_searchable_and_skipped_when_repeated(db, tmp_path):
+    path = str(tmp_path / 'recipes.jsonl')
+    _write_jsonl(path, _recipes(5))
+    importer = CatalogImporter(db, chunk_size=2)
+    assert importer.import_file('recipes', path)['records'] == 5
+    assert len(db.get_recipes('юшка')) == 5
+    assert importer.import_file('recipes', path)['skipped']
+
+
+def test_crashed_import_gets_indexes_back_on_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / 'kitchen.db')
+    catalog = str(tmp_path / 'recipes.jsonl')
+    _write_jsonl(catalog, _recipes(6))
+    db = Database(path)
+    conn = db.get_connection()
+    indexes, triggers = _objects(conn, 'index'), _objects(conn, 'trigger')
+
+    # Процес «падає» посеред імпорту: finally з відновленням індексів не виконується
+    importer = CatalogImporter(db, chunk_size=2)
+    monkeypatch.setattr(importer, '_restore_indexes', lambda conn, kind: None)
+    monkeypatch.setattr(importer, '_insert_recipes', _crash_after(importer._insert_recipes, chunks=2))
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_file('recipes', catalog)
+    assert _objects(conn, 'trigger') != triggers
+    db.close()
+
+    db = Database(path)
+    try:
+        conn = db.get_connection()
+        assert _objects(conn, 'index') == indexes
+        assert _objects(conn, 'trigger') == triggers
+        assert len(db.get_recipes('юшка')) == 4
+        # Продовження імпорту дописує решту, і пошук бачить усе
+        assert CatalogImporter(db, chunk_size=2).import_file('recipes', catalog)['resumed_from'] == 4
+        assert len(db.get_recipes('юшка')) == 6
+        assert _objects(conn, 'trigger') == triggers
+    finally:
+        db.close()
+
+
+def _crash_after(insert, chunks):
+    calls = []
+
+    def wrapper(cursor, chunk):
+        if len(calls) == chunks:
+            raise KeyboardInterrupt
+        calls.append(chunk)
+        return insert(cursor, chunk)
+
+    return wrapper
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from reminders import REMINDER_DATE_FORMAT, ReminderScheduler
+
+
+def _insert(db, reminder_date, message='нагадування', chat_id=1):
+    conn = db.get_connection()
+    conn.execute('INSERT INTO reminders (message, reminder_date, chat_id) VALUES (?, ?, ?)',
+                 (message, reminder_date, chat_id))
+    conn.commit()
+
+
+def _scheduler(db, heap_size):
+    return ReminderScheduler(db, ThreadPoolExecutor(max_workers=1), heap_size=heap_size)
+
+
+def test_heap_holds_only_the_nearest_reminders(db):
+    now = datetime(2030, 1, 1, 12, 0)
+    for minutes in (30, 10, 20, 40):
+        _insert(db, (now + timedelta(minutes=minutes)).strftime(REMINDER_DATE_FORMAT), f'через {minutes}')
+    scheduler = _scheduler(db, heap_size=2)
+    scheduler.refill()
+    assert scheduler.next_due() == now + timedelta(minutes=10)
+
+    assert [message for _, _, message in scheduler.claim_due(now + timedelta(minutes=25))] == ['через 10', 'через 20']
+    assert scheduler.needs_refill()
+    scheduler.refill()
+    assert [message for _, _, message in scheduler.claim_due(now + timedelta(hours=1))] == ['через 30', 'через 40']
+    scheduler.refill()
+    assert scheduler.next_due() is None
+    assert not scheduler.needs_refill()
+
+
+def test_unparseable_dates_do_not_block_later_reminders(db):
+    # Некоректні дати сортуються раніше за справжні й займають усю сторінку LIMIT
+    for bad in ('0000', '1-1-2030', '2030-13-45 99:99:99'):
+        _insert(db, bad, 'зламане')
+    due = datetime(2030, 1, 1, 9, 0)
+    _insert(db, due.strftime(REMINDER_DATE_FORMAT), 'справжнє')
+
+    scheduler = _scheduler(db, heap_size=2)
+    scheduler.refill()
+    assert scheduler.next_due() == due
+    assert [message for _, _, message in scheduler.claim_due(due)] == ['справжнє']
+    assert db.get_connection().execute(
+        "SELECT COUNT(*) FROM reminders WHERE message = 'зламане' AND is_completed = 0"
+    ).fetchone()[0] == 0
+
+
+def test_only_unparseable_dates_leave_an_empty_heap(db):
+    for bad in ('0000', '1111'):
+        _insert(db, bad)
+    scheduler = _scheduler(db, heap_size=2)
+    scheduler.refill()
+    assert scheduler.next_due() is None
+    assert not scheduler.needs_refill()
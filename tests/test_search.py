@@ -0,0 +1,35 @@
+from database import build_fts_query
+
+
+def _names(recipes):
+    return [recipe[1] for recipe in recipes]
+
+
+def test_fts_query_uses_stem_prefixes():
+    assert build_fts_query('Вареників з картоплею') == '"вареник"* "з"* "картопл"*'
+    assert build_fts_query('  ,.  ') == ''
+
+
+def test_search_by_inflected_name(db):
+    assert _names(db.get_recipes('борщу')) == ['Борщ']
+    assert _names(db.get_recipes('вареників')) == ['Вареники з картоплею']
+
+
+def test_search_by_prefix_and_ingredient(db):
+    assert _names(db.get_recipes('вар')) == ['Вареники з картоплею']
+    # Інгредієнти теж проіндексовано
+    assert _names(db.get_recipes('буряк')) == ['Борщ']
+
+
+def test_name_outranks_other_columns(db):
+    db.get_connection().execute('''
+        INSERT INTO recipes (name, description, instructions, category)
+        VALUES ('Пампушки', 'До борщу', 'Спекти', 'випічка')
+    ''')
+    db.get_connection().commit()
+    assert _names(db.get_recipes('борщ')) == ['Борщ', 'Пампушки']
+
+
+def test_search_without_matches(db):
+    assert db.get_recipes('піца') == []
+    assert db.get_recipes('!!!') == []
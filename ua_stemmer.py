@@ -0,0 +1,57 @@
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Типові відмінкові закінчення іменників і прикметників, довші - першими
+UA_ENDINGS = (
+    'ями', 'ами', 'ові', 'еві', 'ого', 'ому', 'ими', 'іми',
+    'ів', 'їв', 'ам', 'ах', 'ям', 'ях', 'ою', 'ею', 'єю', 'ей', 'ом', 'ем',
+    'ий', 'ій', 'ої', 'ії', 'им', 'ім',
+    'а', 'я', 'у', 'ю', 'і', 'ї', 'и', 'о', 'е', 'є', 'ь'
+)
+MIN_STEM_LENGTH = 3
+# Голосні, що випадають у непрямих відмінках: цукор - цукру, перець - перцю
+FLEETING_VOWELS = 'оеє'
+NOT_CONSONANTS = 'аеєиіїоуюяьʼ'
+LEMMA_CACHE_SIZE = 16384
+
+
+def normalize_apostrophes(text: str) -> str:
+    """Зводить усі види апострофа до українського ʼ"""
+    for apostrophe in ("'", "’", "`"):
+        text = text.replace(apostrophe, "ʼ")
+    return text
+
+
+def words(text: str):
+    """Слова тексту в нижньому регістрі"""
+    return re.findall(r"[\wʼ]+", normalize_apostrophes(text.lower()))
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def stem(word: str) -> str:
+    """Відкидає закінчення, щоб 'борщу' та 'вареників' давали 'борщ' та 'вареник'"""
+    for ending in UA_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def _is_consonant(char: str) -> bool:
+    return char.isalpha() and char not in NOT_CONSONANTS
+
+
+def _drop_fleeting_vowel(word_stem: str) -> str:
+    """Прибирає голосну, що випадає: 'цукор' і 'цукр' (з 'цукру') дають 'цукр'"""
+    if (len(word_stem) >= 4 and word_stem[-2] in FLEETING_VOWELS
+            and _is_consonant(word_stem[-1]) and _is_consonant(word_stem[-3])):
+        return word_stem[:-2] + word_stem[-1]
+    return word_stem
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemma(text: Optional[str]) -> Optional[str]:
+    """Нормальна форма назви для точного пошуку: 'цукру' і 'Цукор' дають 'цукр'"""
+    if text is None:
+        return None
+    return " ".join(_drop_fleeting_vowel(stem(word)) for word in words(text))